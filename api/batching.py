@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from api.metrics import microbatch_size, microbatch_latency, microbatch_rows
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one model call.
+
+    Requests are queued and a background task scores everything that
+    arrives within ``max_wait_ms`` of the first queued row (or until
+    ``max_batch_size`` rows are collected) as one feature matrix, then
+    resolves each caller's future with its own probability. Batches are
+    scored concurrently with the collection of the next one.
+    """
+    
+    def __init__(
+        self,
+        score_fn: Callable[[np.ndarray], Awaitable[np.ndarray]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0
+    ):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._in_flight = set()
+    
+    async def start(self):
+        """Start the background batching task on the running loop"""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the batching task and fail any requests still queued"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+    
+    async def submit(self, row: np.ndarray) -> float:
+        """Queue one feature row and wait for its churn probability"""
+        if self._worker is None:
+            raise RuntimeError("Micro-batcher not started")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future, time.perf_counter()))
+        return await future
+    
+    async def _collect(self):
+        """Wait for one request, then gather more until the window closes"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            task = asyncio.create_task(self._score(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+    
+    async def _score(self, batch):
+        # Callers that gave up (e.g. client disconnect) are dropped
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+        
+        try:
+            features = np.vstack([row for row, _, _ in batch])
+            probs = await self.score_fn(features)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        now = time.perf_counter()
+        microbatch_size.observe(len(batch))
+        microbatch_rows.inc(len(batch))
+        for (_, future, enqueued), prob in zip(batch, probs):
+            microbatch_latency.observe(now - enqueued)
+            if not future.done():
+                future.set_result(float(prob))
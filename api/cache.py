@@ -0,0 +1,83 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+import numpy as np
+
+from api.metrics import prediction_cache_hits, prediction_cache_misses, prediction_cache_evictions, prediction_cache_size
+
+# Rough per-entry cost of the OrderedDict node and value tuple, on top of the key
+ENTRY_OVERHEAD_BYTES = 200
+
+class PredictionCache:
+    """LRU cache of churn probabilities keyed on encoded feature rows.
+
+    Keys are the model version plus the raw bytes of the float64 feature
+    row, so customers with identical features share an entry and a new
+    model never sees the previous model's predictions. Entries expire
+    after ``ttl_seconds``; the least recently used entries are evicted
+    once the cache holds ``max_entries`` or roughly ``max_bytes``.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 300.0, max_bytes: int = 64 * 2**20):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(model_version: Hashable, row: np.ndarray) -> tuple:
+        return (model_version, np.ascontiguousarray(row, dtype=np.float64).tobytes())
+
+    def get_many(self, model_version: Hashable, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached probabilities for each row and a mask of the rows that missed"""
+        now = time.monotonic()
+        probs = np.zeros(len(features))
+        missing = np.ones(len(features), dtype=bool)
+        for i, row in enumerate(features):
+            key = self._key(model_version, row)
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry[1] <= now:
+                self._remove(key, 'ttl')
+                continue
+            self._entries.move_to_end(key)
+            probs[i] = entry[0]
+            missing[i] = False
+
+        hits = int(len(features) - missing.sum())
+        prediction_cache_hits.inc(hits)
+        prediction_cache_misses.inc(len(features) - hits)
+        return probs, missing
+
+    def put_many(self, model_version: Hashable, features: np.ndarray, probs: np.ndarray):
+        expires = time.monotonic() + self.ttl
+        for row, prob in zip(features, probs):
+            key = self._key(model_version, row)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self.nbytes += sys.getsizeof(key[1]) + ENTRY_OVERHEAD_BYTES
+            self._entries[key] = (float(prob), expires)
+
+        while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            self._remove(next(iter(self._entries)), 'lru')
+        prediction_cache_size.set(len(self._entries))
+
+    def _remove(self, key: tuple, reason: str):
+        del self._entries[key]
+        self.nbytes -= sys.getsizeof(key[1]) + ENTRY_OVERHEAD_BYTES
+        prediction_cache_evictions.labels(reason=reason).inc()
+        prediction_cache_size.set(len(self._entries))
+
+    def clear(self):
+        """Drop every entry, e.g. when the served model changes"""
+        self._entries.clear()
+        self.nbytes = 0
+        prediction_cache_size.set(0)
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from api.metrics import inference_queue_depth, inference_queue_wait
+
+class QueueFullError(Exception):
+    """Raised when the inference queue is at capacity"""
+
+# Model held by each worker process when running in process mode
+_worker_model = None
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+def _score(model, features: np.ndarray, submitted: float):
+    wait = time.time() - submitted
+    return wait, model.predict_proba(features)[:, 1]
+
+def _score_in_worker(features: np.ndarray, submitted: float):
+    return _score(_worker_model, features, submitted)
+
+class InferenceExecutor:
+    """Run model inference in a bounded worker pool off the event loop.
+
+    At most ``max_workers + max_queue`` scoring calls may be pending at
+    once; beyond that :class:`QueueFullError` is raised so the API can
+    shed load instead of queueing without bound. In ``process`` mode the
+    model is shipped to each worker once, when the pool is created.
+    """
+    
+    def __init__(self, kind: str = 'thread', max_workers: int = 4, max_queue: int = 256):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.model = None
+        self._pool = None
+        self._pending = 0
+    
+    def set_model(self, model):
+        """Use ``model`` for all subsequent scoring calls"""
+        old_pool = self._pool
+        self.model = model
+        if self.kind == 'process':
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(model,)
+            )
+        elif self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='inference'
+            )
+        # Calls already submitted to a replaced pool still complete
+        if old_pool is not None and old_pool is not self._pool:
+            old_pool.shutdown(wait=False)
+    
+    @property
+    def pending(self) -> int:
+        return self._pending
+    
+    async def score(self, features: np.ndarray) -> np.ndarray:
+        """Churn probability for each row, computed in the worker pool"""
+        if self._pool is None:
+            raise RuntimeError("Inference executor has no model")
+        if self._pending >= self.max_workers + self.max_queue:
+            raise QueueFullError(f"{self._pending} inference calls pending")
+        
+        self._pending += 1
+        inference_queue_depth.set(self._pending)
+        try:
+            loop = asyncio.get_running_loop()
+            if self.kind == 'process':
+                call = loop.run_in_executor(self._pool, _score_in_worker, features, time.time())
+            else:
+                call = loop.run_in_executor(self._pool, _score, self.model, features, time.time())
+            wait, probs = await call
+            inference_queue_wait.set(wait)
+            return probs
+        finally:
+            self._pending -= 1
+            inference_queue_depth.set(self._pending)
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -1,10 +1,30 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-import joblib
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from pydantic import BaseModel, Field, ValidationError
+import asyncio
+import json
 import numpy as np
 from datetime import datetime
 import os
-from typing import List
+import time
+from typing import List, Optional
+from api import payloads, profiling
+from api.batching import MicroBatcher
+from api.cache import PredictionCache
+from api.columnar import ColumnarSchema, parse_ndjson
+from api.executor import InferenceExecutor, QueueFullError
+from api.metrics import (
+    active_model_version, candidate_fallbacks, prediction_log_dropped, prediction_log_written, shadow_dropped,
+    track_prediction_metrics
+)
+from api.model_loader import LoadedModel, RegistryWatcher, find_model_path, load_artifacts, warm_up
+from api.traffic import CandidateModel, observe_disagreement, observe_inference, route, take, traffic_buckets
+from features import CATEGORICAL_FEATURES, NUMERIC_FEATURES, UnknownCategoryError
+from model_registry import ModelRegistry
+from monitoring.collect_predictions import AsyncPredictionLogger, ParquetPredictionLogger
 
 app = FastAPI(
     title="Customer Churn Prediction API",
@@ -12,29 +32,299 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Load model and encoders at startup
+# Responses above this size are gzip-compressed for clients that accept it
+RESPONSE_GZIP_MIN_SIZE = int(os.environ.get('RESPONSE_GZIP_MIN_SIZE', '1000'))
+if RESPONSE_GZIP_MIN_SIZE > 0:
+    # Level 5 gets most of the size reduction for much less CPU than 9
+    app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_GZIP_MIN_SIZE, compresslevel=5)
+
+# Per-stage latency of the prediction endpoints; added after gzip so that
+# compression counts as serialization
+app.add_middleware(profiling.StageTimingMiddleware, paths=['/predict', '/predict/batch', '/predict/columnar'])
+
+# Sampling profiler at /debug/profile; off by default as it exposes code paths
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '0') == '1'
+PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', '60'))
+profiler_lock = asyncio.Lock()
+
+# Load model and encoding tables at startup
 MODEL_PATH = os.environ.get('MODEL_PATH', 'models/churn_model_latest.pkl')
 model = None
-contract_encoder = None
-payment_encoder = None
+contract_table = None
+payment_table = None
+feature_pipeline = None
+model_path = None
+model_version = None
+
+# Production model changes in the registry are picked up without a restart
+MODEL_REGISTRY_PATH = os.environ.get('MODEL_REGISTRY_PATH', 'models/registry.json')
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '5'))
+registry_watcher = None
+
+# Serve the flat-array export of the forest when one exists next to the pickle
+USE_COMPILED_MODEL = os.environ.get('USE_COMPILED_MODEL', '1') == '1'
+# Map it read-only so all uvicorn workers share one copy
+MODEL_MMAP = os.environ.get('MODEL_MMAP', '1') == '1'
+
+# Optional micro-batching of concurrent /predict calls
+MICROBATCH_ENABLED = os.environ.get('MICROBATCH_ENABLED', '0') == '1'
+MICROBATCH_MAX_SIZE = int(os.environ.get('MICROBATCH_MAX_SIZE', '64'))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get('MICROBATCH_MAX_WAIT_MS', '2'))
+batcher = None
+
+# Inference runs in a bounded worker pool so the event loop stays free
+INFERENCE_EXECUTOR = os.environ.get('INFERENCE_EXECUTOR', 'thread')
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '4'))
+INFERENCE_MAX_QUEUE = int(os.environ.get('INFERENCE_MAX_QUEUE', '256'))
+INFERENCE_RETRY_AFTER = os.environ.get('INFERENCE_RETRY_AFTER', '1')
+executor = None
+
+# Predictions are logged for drift monitoring when a log directory is set
+PREDICTION_LOG_DIR = os.environ.get('PREDICTION_LOG_DIR', '')
+PREDICTION_LOG_MAX_QUEUE = int(os.environ.get('PREDICTION_LOG_MAX_QUEUE', '10000'))
+PREDICTION_LOG_OVERFLOW = os.environ.get('PREDICTION_LOG_OVERFLOW', 'drop')
+PREDICTION_LOG_FORMAT = os.environ.get('PREDICTION_LOG_FORMAT', 'jsonl')
+PREDICTION_LOG_PART_SECONDS = float(os.environ.get('PREDICTION_LOG_PART_SECONDS', '60'))
+prediction_logger = None
+
+# Optional cache of predictions for repeated feature vectors
+PREDICTION_CACHE_ENABLED = os.environ.get('PREDICTION_CACHE_ENABLED', '0') == '1'
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_MAX_ENTRIES', '100000'))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', '300'))
+PREDICTION_CACHE_MAX_MB = float(os.environ.get('PREDICTION_CACHE_MAX_MB', '64'))
+prediction_cache = PredictionCache(
+    PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_TTL, int(PREDICTION_CACHE_MAX_MB * 2**20)
+) if PREDICTION_CACHE_ENABLED else None
+
+# Canary and shadow models listed in the registry's traffic section are kept
+# loaded next to production, each with its own worker pool
+CANDIDATE_WORKERS = int(os.environ.get('CANDIDATE_WORKERS', '2'))
+CANDIDATE_MAX_QUEUE = int(os.environ.get('CANDIDATE_MAX_QUEUE', '64'))
+canaries = []
+shadows = []
+traffic = None
+shadow_tasks = set()
+
+def _swap_model(loaded: LoadedModel):
+    """Make ``loaded`` the served model.
+
+    Runs without awaiting, so no request sees a half-swapped state.
+    Requests already scoring on the previous model finish on it.
+    """
+    global model, contract_table, payment_table, feature_pipeline, model_path, model_version
+    model = loaded.model
+    contract_table = loaded.contract_table
+    payment_table = loaded.payment_table
+    feature_pipeline = loaded.features
+    model_path = loaded.path
+    model_version = loaded.version
+    if executor is not None:
+        executor.set_model(model)
+    if model_version is not None:
+        active_model_version.set(model_version)
+    if prediction_cache is not None:
+        prediction_cache.clear()
 
 @app.on_event("startup")
 async def load_model():
-    global model, contract_encoder, payment_encoder
     try:
-        # Find latest model
-        model_files = [f for f in os.listdir('models') if f.startswith('churn_model_') and f.endswith('.pkl')]
-        if model_files:
-            latest_model = sorted(model_files)[-1]
-            model = joblib.load(f'models/{latest_model}')
-            contract_encoder = joblib.load('models/contract_encoder.pkl')
-            payment_encoder = joblib.load('models/payment_encoder.pkl')
-            print(f"✓ Loaded model: {latest_model}")
+        path, version = find_model_path('models', MODEL_REGISTRY_PATH)
+        if path:
+            _swap_model(load_artifacts(path, version, use_compiled=USE_COMPILED_MODEL, mmap=MODEL_MMAP))
+            print(f"✓ Loaded model: {os.path.basename(model_path)}")
         else:
             print("⚠ No model found, using dummy model")
     except Exception as e:
         print(f"✗ Error loading model: {e}")
 
+async def reload_model(production: dict):
+    """Load a registry model in the background, warm it up and swap it in"""
+    print(f"↻ Loading production model v{production['version']}: {production['path']}")
+    loaded = await asyncio.to_thread(
+        load_artifacts, production['path'], production['version'], USE_COMPILED_MODEL, MODEL_MMAP
+    )
+    await asyncio.to_thread(warm_up, loaded)
+    _swap_model(loaded)
+    print(f"✓ Swapped in model v{model_version}: {os.path.basename(model_path)}")
+
+async def reload_traffic(new_traffic: dict):
+    """Load the registry's canary and shadow models and start routing to them.
+
+    Models that are already loaded are kept; the worker pools of models
+    taken out of the traffic section are shut down once their calls finish.
+    """
+    global canaries, shadows, traffic
+    resident = {c.version: (c.loaded, c.executor) for c in canaries + shadows}
+    started = []
+    new_canaries, new_shadows = [], []
+    try:
+        for role, entries, target in (('canary', new_traffic['canary'], new_canaries),
+                                      ('shadow', new_traffic['shadow'], new_shadows)):
+            for entry in entries:
+                if entry['version'] not in resident:
+                    print(f"↻ Loading {role} model v{entry['version']}: {entry['path']}")
+                    loaded = await asyncio.to_thread(
+                        load_artifacts, entry['path'], entry['version'], USE_COMPILED_MODEL, MODEL_MMAP
+                    )
+                    await asyncio.to_thread(warm_up, loaded)
+                    candidate_executor = InferenceExecutor(
+                        kind=INFERENCE_EXECUTOR,
+                        max_workers=CANDIDATE_WORKERS,
+                        max_queue=CANDIDATE_MAX_QUEUE
+                    )
+                    candidate_executor.set_model(loaded.model)
+                    started.append(candidate_executor)
+                    resident[entry['version']] = (loaded, candidate_executor)
+                loaded, candidate_executor = resident[entry['version']]
+                target.append(CandidateModel(loaded, role, entry.get('percent', 0.0), candidate_executor))
+    except Exception:
+        for candidate_executor in started:
+            candidate_executor.shutdown()
+        raise
+    
+    kept = {c.version for c in new_canaries + new_shadows}
+    retired = [c.executor for c in canaries + shadows if c.version not in kept]
+    canaries, shadows, traffic = new_canaries, new_shadows, new_traffic
+    for candidate_executor in retired:
+        await asyncio.to_thread(candidate_executor.shutdown)
+    
+    if canaries or shadows:
+        split = ', '.join([f"v{c.version} {c.percent}%" for c in canaries] + [f"v{c.version} shadow" for c in shadows])
+        print(f"✓ Serving candidate models: {split} (split by {traffic['split']})")
+
+@app.on_event("startup")
+async def load_traffic():
+    try:
+        await reload_traffic(ModelRegistry(MODEL_REGISTRY_PATH).get_traffic())
+    except Exception as e:
+        print(f"✗ Error loading canary/shadow models: {e}")
+
+@app.on_event("startup")
+async def start_registry_watcher():
+    global registry_watcher
+    if MODEL_RELOAD_INTERVAL > 0:
+        registry_watcher = RegistryWatcher(
+            MODEL_REGISTRY_PATH,
+            reload_model,
+            interval=MODEL_RELOAD_INTERVAL,
+            current_version=model_version,
+            on_traffic_change=reload_traffic,
+            current_traffic=traffic
+        )
+        registry_watcher.start()
+
+@app.on_event("shutdown")
+async def stop_registry_watcher():
+    global registry_watcher
+    if registry_watcher is not None:
+        await registry_watcher.stop()
+        registry_watcher = None
+
+async def _score_features(features: np.ndarray) -> np.ndarray:
+    """Churn probability for each row of a feature matrix"""
+    version, start = model_version, time.perf_counter()
+    probs = await executor.score(features)
+    observe_inference(version, 'production', len(features), time.perf_counter() - start)
+    return probs
+
+def _cache_version():
+    # Entries written by requests still scoring on a replaced model never match
+    return (model_version, model_path)
+
+async def _score_cached(features: np.ndarray) -> np.ndarray:
+    """Like ``_score_features``, but serves repeated rows from the prediction cache"""
+    if prediction_cache is None:
+        return await _score_features(features)
+    version = _cache_version()
+    probs, missing = prediction_cache.get_many(version, features)
+    if missing.any():
+        probs[missing] = await _score_features(features[missing])
+        prediction_cache.put_many(version, features[missing], probs[missing])
+    return probs
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Inference queue full, retry later",
+        headers={"Retry-After": INFERENCE_RETRY_AFTER}
+    )
+
+@app.on_event("startup")
+async def start_inference():
+    global batcher, executor
+    executor = InferenceExecutor(
+        kind=INFERENCE_EXECUTOR,
+        max_workers=INFERENCE_WORKERS,
+        max_queue=INFERENCE_MAX_QUEUE
+    )
+    if model is not None:
+        executor.set_model(model)
+    
+    if MICROBATCH_ENABLED:
+        batcher = MicroBatcher(
+            _score_features,
+            max_batch_size=MICROBATCH_MAX_SIZE,
+            max_wait_ms=MICROBATCH_MAX_WAIT_MS
+        )
+        await batcher.start()
+        print(f"✓ Micro-batching enabled (max {MICROBATCH_MAX_SIZE} rows / {MICROBATCH_MAX_WAIT_MS}ms)")
+
+@app.on_event("startup")
+async def start_prediction_logger():
+    global prediction_logger
+    if PREDICTION_LOG_DIR:
+        if PREDICTION_LOG_FORMAT == 'parquet':
+            logger_class = ParquetPredictionLogger
+            options = {'max_part_seconds': PREDICTION_LOG_PART_SECONDS}
+        else:
+            logger_class, options = AsyncPredictionLogger, {}
+        prediction_logger = logger_class(
+            PREDICTION_LOG_DIR,
+            max_queue=PREDICTION_LOG_MAX_QUEUE,
+            overflow=PREDICTION_LOG_OVERFLOW,
+            on_written=prediction_log_written.inc,
+            on_dropped=prediction_log_dropped.inc,
+            **options
+        )
+
+async def _log_predictions(records):
+    """Queue predictions for the log.
+
+    With the ``block`` overflow policy a full queue makes the caller wait,
+    so records are then handed over from a worker thread to keep the event
+    loop serving other requests.
+    """
+    if PREDICTION_LOG_OVERFLOW == 'block':
+        await asyncio.to_thread(prediction_logger.log_predictions, list(records))
+    else:
+        prediction_logger.log_predictions(records)
+
+@app.on_event("shutdown")
+async def stop_prediction_logger():
+    global prediction_logger
+    if prediction_logger is not None:
+        await asyncio.to_thread(prediction_logger.close)
+        prediction_logger = None
+
+@app.on_event("shutdown")
+async def stop_candidates():
+    global canaries, shadows
+    if shadow_tasks:
+        await asyncio.gather(*shadow_tasks, return_exceptions=True)
+    for candidate in canaries + shadows:
+        candidate.executor.shutdown()
+    canaries, shadows = [], []
+
+@app.on_event("shutdown")
+async def stop_inference():
+    global batcher, executor
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+    if executor is not None:
+        executor.shutdown()
+        executor = None
+
 class CustomerFeatures(BaseModel):
     customer_id: int = Field(..., description="Customer ID")
     account_age_days: int = Field(..., ge=1, le=3650, description="Days since account creation")
@@ -61,6 +351,12 @@ class CustomerFeatures(BaseModel):
             }
         }
 
+# Same field types and bounds, checked a whole column at a time
+customer_columns = ColumnarSchema.from_model(CustomerFeatures)
+
+# Request fields the feature pipeline and traffic split read
+INPUT_COLUMNS = ['customer_id'] + NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
 class PredictionResponse(BaseModel):
     customer_id: int
     churn_probability: float
@@ -92,75 +388,355 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+def _risk_level(churn_prob: float) -> str:
+    """Bucket a churn probability into a risk level"""
+    if churn_prob < 0.3:
+        return "low"
+    elif churn_prob < 0.7:
+        return "medium"
+    return "high"
+
+def _customer_columns(customers: List[CustomerFeatures]) -> dict:
+    return {name: [getattr(c, name) for c in customers] for name in INPUT_COLUMNS}
+
+def _build_feature_matrix(columns: dict):
+    """Build the production model's input for a ``{column: values}`` batch.
+
+    Returns the feature matrix, a mask of rows that could be encoded and
+    per row the UnknownCategoryError of rows that could not.
+    """
+    codes, valid, errors = feature_pipeline.encode(columns)
+    profiling.mark('encode')
+    features = feature_pipeline.build(columns, codes)
+    profiling.mark('features')
+    return features, valid, errors
+
+def _unknown_category(error: UnknownCategoryError) -> HTTPException:
+    """422 in the same shape as FastAPI's own validation errors"""
+    return HTTPException(status_code=422, detail=[{
+        "loc": ["body", error.field],
+        "msg": str(error),
+        "type": "value_error",
+        "ctx": {"allowed_values": error.allowed}
+    }])
+
+def _make_response(customer_id: int, churn_prob: float, timestamp: str) -> PredictionResponse:
+    return PredictionResponse(
+        customer_id=customer_id,
+        churn_probability=round(float(churn_prob), 4),
+        churn_prediction=bool(churn_prob >= 0.5),
+        risk_level=_risk_level(churn_prob),
+        timestamp=timestamp
+    )
+
+async def _score_valid(columns: dict, features: np.ndarray, valid: np.ndarray, single: bool = False):
+    """Churn probability of each valid row (0 for the others) and the
+    version of the model that scored it.
+
+    Rows the traffic split sends to a canary are scored by it. Rows the
+    canary can't encode, or can't score because its queue is full or it
+    failed, are scored by production instead. The models score
+    concurrently. Every scored row is also sent to each shadow model in the
+    background, after the response is on its way.
+    """
+    probs = np.zeros(len(valid))
+    versions = [model_version] * len(valid)
+    production_rows = valid.copy()
+    calls, targets = [], []
+    if canaries:
+        routes = route(traffic_buckets(columns['customer_id'], traffic['split']), canaries)
+        for i, canary in enumerate(canaries):
+            rows = np.flatnonzero(valid & (routes == i))
+            if len(rows) == 0:
+                continue
+            canary_features, canary_valid, _ = canary.features.transform(take(columns, rows))
+            if not canary_valid.all():
+                candidate_fallbacks.labels(version=str(canary.version), reason='unknown_category').inc(
+                    int((~canary_valid).sum()))
+            if canary_valid.any():
+                production_rows[rows[canary_valid]] = False
+                calls.append(_score_canary(canary, canary_features[canary_valid]))
+                targets.append((rows[canary_valid], canary.version))
+    
+    if production_rows.any():
+        if single and batcher is not None:
+            # Coalesced with concurrent /predict calls
+            calls.append(_submit_cached(features))
+        else:
+            calls.append(_score_cached(features[production_rows]))
+        targets.append((np.flatnonzero(production_rows), model_version))
+    
+    # Without canaries there is one call; awaiting it directly skips creating a task
+    results = [await calls[0]] if len(calls) == 1 else await asyncio.gather(*calls)
+    fallback_rows = []
+    for (rows, version), result in zip(targets, results):
+        if result is None:
+            fallback_rows.append(rows)
+            continue
+        probs[rows] = result
+        for row in rows:
+            versions[row] = version
+    if fallback_rows:
+        rows = np.concatenate(fallback_rows)
+        probs[rows] = await _score_cached(features[rows])
+    
+    if shadows:
+        _start_shadows(columns, np.flatnonzero(valid), probs[valid])
+    return probs, versions
+
+async def _score_canary(canary: CandidateModel, features: np.ndarray) -> Optional[np.ndarray]:
+    """A canary's probabilities, or None when production should score the rows instead"""
+    try:
+        return await canary.score(features)
+    except QueueFullError:
+        reason = 'queue_full'
+    except Exception as e:
+        print(f"✗ Canary v{canary.version} failed, scoring on production: {e}")
+        reason = 'error'
+    candidate_fallbacks.labels(version=str(canary.version), reason=reason).inc(len(features))
+    return None
+
+def _start_shadows(columns: dict, rows: np.ndarray, served: np.ndarray):
+    subset = take(columns, rows)
+    for shadow in shadows:
+        task = asyncio.create_task(_score_shadow(shadow, subset, served))
+        shadow_tasks.add(task)
+        task.add_done_callback(shadow_tasks.discard)
+
+async def _score_shadow(shadow: CandidateModel, columns: dict, served: np.ndarray):
+    """Score a copy of served rows with a shadow model and record how it differs"""
+    try:
+        features, valid, _ = shadow.features.transform(columns)
+        if valid.any():
+            observe_disagreement(shadow.version, await shadow.score(features[valid]), served[valid])
+    except QueueFullError:
+        shadow_dropped.labels(version=str(shadow.version)).inc(len(served))
+    except Exception as e:
+        print(f"✗ Shadow scoring with v{shadow.version} failed: {e}")
+
+async def _submit_cached(features: np.ndarray) -> float:
+    if prediction_cache is None:
+        return await batcher.submit(features[0])
+    version = _cache_version()
+    probs, missing = prediction_cache.get_many(version, features)
+    if missing[0]:
+        probs[0] = await batcher.submit(features[0])
+        prediction_cache.put_many(version, features, probs)
+    return probs[0]
+
 @app.post("/predict", response_model=PredictionResponse)
+@track_prediction_metrics
 async def predict_churn(customer: CustomerFeatures):
     """Predict churn for a single customer"""
+    profiling.mark('parse')
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
     try:
-        # Encode categorical features
-        contract_encoded = contract_encoder.transform([customer.contract_type])[0]
-        payment_encoded = payment_encoder.transform([customer.payment_method])[0]
-        
-        # Prepare features in correct order
-        features = np.array([[
-            customer.account_age_days,
-            customer.monthly_charges,
-            customer.total_charges,
-            customer.support_tickets,
-            customer.monthly_usage_gb,
-            customer.num_services,
-            contract_encoded,
-            payment_encoded
-        ]])
+        columns = _customer_columns([customer])
+        features, valid, errors = _build_feature_matrix(columns)
+        if not valid[0]:
+            raise errors[0]
         
-        # Predict
-        churn_prob = model.predict_proba(features)[0][1]
-        churn_pred = bool(churn_prob >= 0.5)
-        
-        # Risk level
-        if churn_prob < 0.3:
-            risk_level = "low"
-        elif churn_prob < 0.7:
-            risk_level = "medium"
-        else:
-            risk_level = "high"
+        churn_probs, versions = await _score_valid(columns, features, valid, single=True)
+        profiling.mark('inference')
         
-        return PredictionResponse(
-            customer_id=customer.customer_id,
-            churn_probability=round(float(churn_prob), 4),
-            churn_prediction=churn_pred,
-            risk_level=risk_level,
-            timestamp=datetime.now().isoformat()
-        )
+        response = _make_response(customer.customer_id, churn_probs[0], datetime.now().isoformat())
+        profiling.mark('serialize')
+        if prediction_logger is not None:
+            await _log_predictions([(customer, response, versions[0])])
+            profiling.mark('logging')
+        return response
     
+    except UnknownCategoryError as e:
+        raise _unknown_category(e)
+    except QueueFullError:
+        raise _overloaded()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-@app.post("/predict/batch")
-async def predict_batch(request: BatchPredictionRequest):
-    """Predict churn for multiple customers"""
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
+async def _predict_customers(customers: List[CustomerFeatures]) -> dict:
+    """Score validated customers as one batch; rows that cannot be encoded
+    are reported individually without failing the rest of the batch."""
+    timestamp = datetime.now().isoformat()
     predictions = []
-    for customer in request.customers:
+    
+    if customers:
+        columns = _customer_columns(customers)
+        features, valid, errors = _build_feature_matrix(columns)
+        
+        churn_probs = np.zeros(len(customers))
+        versions = [None] * len(customers)
+        if valid.any():
+            try:
+                churn_probs, versions = await _score_valid(columns, features, valid)
+            except QueueFullError:
+                raise _overloaded()
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+        profiling.mark('inference')
+        
+        for customer, ok, prob, error in zip(customers, valid, churn_probs, errors):
+            if ok:
+                predictions.append(_make_response(customer.customer_id, prob, timestamp))
+            else:
+                predictions.append({
+                    "customer_id": customer.customer_id,
+                    "error": f"Prediction failed: {error}"
+                })
+        profiling.mark('serialize')
+        
+        if prediction_logger is not None:
+            await _log_predictions(
+                (customer, pred, version)
+                for customer, pred, version, ok in zip(customers, predictions, versions, valid) if ok
+            )
+            profiling.mark('logging')
+    
+    return {
+        "predictions": predictions,
+        "total": len(predictions),
+        "timestamp": timestamp
+    }
+
+async def _predict_columns(data) -> dict:
+    """Validate and score a ``{column: [values...]}`` batch without
+    building per-row models; predictions are returned column-oriented."""
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": "Expected an object of columns", "type": "dict_type"}])
+    
+    columns, validation_errors = customer_columns.parse(data)
+    if validation_errors:
+        raise HTTPException(status_code=422, detail=validation_errors)
+    
+    n = len(columns['customer_id'])
+    profiling.mark('parse')
+    profiling.set_batch_size(n)
+    timestamp = datetime.now().isoformat()
+    features, valid, errors = _build_feature_matrix(columns)
+    
+    churn_probs = np.zeros(n)
+    versions = [None] * n
+    if valid.any():
         try:
-            pred = await predict_churn(customer)
-            predictions.append(pred)
+            churn_probs, versions = await _score_valid(columns, features, valid)
+        except QueueFullError:
+            raise _overloaded()
         except Exception as e:
-            predictions.append({
-                "customer_id": customer.customer_id,
-                "error": str(e)
-            })
+            raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    profiling.mark('inference')
+    
+    risk_levels = np.where(churn_probs < 0.3, "low", np.where(churn_probs < 0.7, "medium", "high"))
+    predictions = {
+        "customer_id": data['customer_id'],
+        "churn_probability": [round(p, 4) if ok else None for p, ok in zip(churn_probs.tolist(), valid)],
+        "churn_prediction": [p >= 0.5 if ok else None for p, ok in zip(churn_probs.tolist(), valid)],
+        "risk_level": [r if ok else None for r, ok in zip(risk_levels.tolist(), valid)],
+        "error": [f"Prediction failed: {e}" if e else None for e in errors]
+    }
+    profiling.mark('serialize')
+    
+    if prediction_logger is not None:
+        names = [spec.name for spec in customer_columns.columns]
+        await _log_predictions(
+            (dict(zip(names, row)), {
+                'churn_prediction': predictions['churn_prediction'][i],
+                'churn_probability': predictions['churn_probability'][i],
+                'risk_level': predictions['risk_level'][i]
+            }, versions[i])
+            for i, row in enumerate(zip(*(data[name] for name in names))) if valid[i]
+        )
+        profiling.mark('logging')
     
     return {
         "predictions": predictions,
-        "total": len(predictions),
-        "timestamp": datetime.now().isoformat()
+        "total": n,
+        "timestamp": timestamp
     }
 
+def _batch_request_body() -> dict:
+    # The body is parsed by hand to support several formats, so FastAPI
+    # can't derive its schema; CustomerFeatures is in components via /predict
+    schema = BatchPredictionRequest.model_json_schema(ref_template='#/components/schemas/{model}')
+    schema.pop('$defs', None)
+    binary = {'schema': {'type': 'string', 'format': 'binary'}}
+    return {
+        'required': True,
+        'content': {
+            payloads.JSON: {'schema': schema},
+            payloads.MSGPACK: {'schema': schema},
+            payloads.ARROW: binary,
+            payloads.ARROW_FILE: binary,
+        }
+    }
+
+@app.post("/predict/batch", openapi_extra={'requestBody': _batch_request_body()})
+async def predict_batch(request: Request):
+    """Predict churn for multiple customers.
+
+    The whole batch is encoded into one feature matrix and scored with a
+    single predict_proba call. Rows that cannot be encoded are reported
+    individually without failing the rest of the batch.
+
+    Bodies may be JSON or msgpack (``{"customers": [...]}``) or an Arrow
+    IPC stream or file with one row per customer, optionally sent with
+    ``Content-Encoding: gzip``. The response format follows the Accept
+    header (JSON, msgpack or Arrow).
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    body_format = payloads.request_format(request)
+    accept = payloads.response_format(request)
+    body = await payloads.read_body(request)
+    
+    if body_format in payloads.ARROW_TYPES:
+        result = await _predict_columns(payloads.arrow_columns(body, body_format))
+        # Same per-row fields as the JSON and msgpack path
+        predictions = result['predictions']
+        predictions['timestamp'] = [result['timestamp'] if e is None else None for e in predictions['error']]
+    else:
+        data = payloads.loads(body, body_format)
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": "Expected an object", "type": "dict_type"}])
+        try:
+            batch = BatchPredictionRequest(**data)
+        except ValidationError as e:
+            raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+        profiling.mark('parse')
+        profiling.set_batch_size(len(batch.customers))
+        result = await _predict_customers(batch.customers)
+    
+    response = payloads.encode(result, accept)
+    profiling.mark('serialize')
+    return response
+
+@app.post("/predict/columnar")
+async def predict_columnar(request: Request):
+    """Predict churn for a column-oriented batch.
+
+    The body is ``{"customer_id": [...], "account_age_days": [...], ...}``
+    as JSON, or one customer object per line as NDJSON
+    (``Content-Type: application/x-ndjson``). Columns are checked with
+    vectorized comparisons against the CustomerFeatures bounds and fed
+    straight into the feature matrix, without building a Pydantic object
+    per customer. Results come back column-oriented as well; rows with an
+    unknown category get a null probability and an error message.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    body = await payloads.read_body(request)
+    try:
+        if request.headers.get('content-type', '').startswith('application/x-ndjson'):
+            data = parse_ndjson(body)
+        else:
+            data = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": f"Invalid JSON: {e}", "type": "json_invalid"}])
+    
+    return await _predict_columns(data)
+
 @app.get("/model/info")
 async def model_info():
     """Get model metadata"""
@@ -169,44 +745,36 @@ async def model_info():
     
     return {
         "model_type": type(model).__name__,
+        "model_version": model_version,
+        "model_path": model_path,
         "n_features": model.n_features_in_,
         "n_estimators": getattr(model, 'n_estimators', None),
-        "feature_names": [
-            "account_age_days", "monthly_charges", "total_charges",
-            "support_tickets", "monthly_usage_gb", "num_services",
-            "contract_type_encoded", "payment_method_encoded"
-        ]
+        "feature_names": feature_pipeline.feature_names,
+        "traffic_split": traffic['split'] if traffic else None,
+        "candidates": [c.describe() for c in canaries + shadows]
     }
 
-from fastapi import FastAPI, HTTPException, Response
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-from api.metrics import (
-    track_prediction_metrics,
-    active_model_version,
-    data_drift_score
-)
-
-# ... existing imports ...
-
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-@app.post("/predict", response_model=PredictionResponse)
-@track_prediction_metrics  # Add decorator
-async def predict_churn(customer: CustomerFeatures):
-    # ... existing code ...
-    pass
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample every thread's stack for ``seconds`` and return the stacks in
+    the folded format of flamegraph.pl and speedscope.
 
-# Set model version on startup
-@app.on_event("startup")
-async def load_model():
-    global model, contract_encoder, payment_encoder
-    # ... existing code ...
-    
-    # Set model version metric
-    model_files = [f for f in os.listdir('models') if f.startswith('churn_model_') and f.endswith('.pkl')]
-    if model_files:
-        version = len(model_files)
-        active_model_version.set(version)
\ No newline at end of file
+    Requests keep being served while sampling, so profile under load to
+    see where their time goes. Only threads of this process are sampled,
+    not ``INFERENCE_EXECUTOR=process`` workers.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not 0 < seconds <= PROFILER_MAX_SECONDS or interval_ms < 1:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {PROFILER_MAX_SECONDS:g}] and interval_ms at least 1")
+    if profiler_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    async with profiler_lock:
+        counts = await asyncio.to_thread(profiling.sample_stacks, seconds, interval_ms / 1000)
+    return profiling.collapse(counts)
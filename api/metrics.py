@@ -15,6 +15,16 @@ prediction_latency = Histogram(
     buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
 )
 
+inference_queue_depth = Gauge(
+    'churn_inference_queue_depth',
+    'Inference calls queued or running in the worker pool'
+)
+
+inference_queue_wait = Gauge(
+    'churn_inference_queue_wait_seconds',
+    'Time the most recent inference call waited for a worker'
+)
+
 model_confidence = Histogram(
     'churn_prediction_confidence',
     'Distribution of prediction confidence scores',
@@ -37,16 +47,24 @@ data_drift_score = Gauge(
     'Data drift detection score (0-1)'
 )
 
+# Per-stage breakdown of prediction requests (see api/profiling.py)
+prediction_stage_latency = Histogram(
+    'churn_prediction_stage_seconds',
+    'Time spent in each stage of a prediction request',
+    ['endpoint', 'stage', 'batch_size'],
+    buckets=[0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
 def track_prediction_metrics(func):
     """Decorator to track prediction metrics"""
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
             result = await func(*args, **kwargs)
             
             # Track latency
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             prediction_latency.observe(latency)
             
             # Track prediction
@@ -58,4 +76,94 @@ def track_prediction_metrics(func):
             api_errors.labels(endpoint=func.__name__, error_type=type(e).__name__).inc()
             raise
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+# Micro-batching (p99 via histogram_quantile, throughput via rate())
+microbatch_size = Histogram(
+    'churn_microbatch_size',
+    'Number of requests coalesced into one model call',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256]
+)
+
+microbatch_latency = Histogram(
+    'churn_microbatch_latency_seconds',
+    'Time from enqueue to result for micro-batched predictions',
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+microbatch_rows = Counter(
+    'churn_microbatch_rows_total',
+    'Total rows scored through the micro-batcher'
+)
+
+# Prediction logging
+prediction_log_written = Counter(
+    'churn_prediction_log_written_total',
+    'Prediction log records written to disk'
+)
+
+prediction_log_dropped = Counter(
+    'churn_prediction_log_dropped_total',
+    'Prediction log records dropped because the buffer was full or the write failed'
+)
+
+# Prediction cache (hit ratio via rate() of hits over hits + misses)
+prediction_cache_hits = Counter(
+    'churn_prediction_cache_hits_total',
+    'Rows served from the prediction cache'
+)
+
+prediction_cache_misses = Counter(
+    'churn_prediction_cache_misses_total',
+    'Rows not found in the prediction cache'
+)
+
+prediction_cache_evictions = Counter(
+    'churn_prediction_cache_evictions_total',
+    'Prediction cache entries evicted',
+    ['reason']
+)
+
+prediction_cache_size = Gauge(
+    'churn_prediction_cache_entries',
+    'Entries currently held in the prediction cache'
+)
+
+# Multi-model serving (production, canary and shadow models)
+model_inference_latency = Histogram(
+    'churn_model_inference_seconds',
+    'Time from submitting rows to a model until its probabilities are back',
+    ['version', 'role'],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+model_predictions = Counter(
+    'churn_model_predictions_total',
+    'Rows scored by each model',
+    ['version', 'role']
+)
+
+shadow_disagreement = Histogram(
+    'churn_shadow_disagreement',
+    'Absolute difference between a shadow model\'s churn probability and the served one',
+    ['version'],
+    buckets=[0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0]
+)
+
+shadow_label_flips = Counter(
+    'churn_shadow_label_flips_total',
+    'Rows where a shadow model\'s churn prediction differs from the served one',
+    ['version']
+)
+
+candidate_fallbacks = Counter(
+    'churn_candidate_fallback_total',
+    'Canary rows scored by production instead, because the canary could not encode them, was overloaded or failed',
+    ['version', 'reason']
+)
+
+shadow_dropped = Counter(
+    'churn_shadow_dropped_total',
+    'Rows not shadow-scored because the shadow model\'s queue was full',
+    ['version']
+)
@@ -0,0 +1,145 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+import joblib
+import numpy as np
+
+from compiled_model import CompiledForest, compiled_path_for
+from features import FeaturePipeline
+from model_registry import ModelRegistry
+
+class LoadedModel:
+    """A model together with the feature pipeline it is served with"""
+
+    def __init__(self, model, contract_table, payment_table, path: str, version: Optional[int] = None,
+                 features: Optional[FeaturePipeline] = None):
+        self.model = model
+        self.contract_table = contract_table
+        self.payment_table = payment_table
+        self.path = path
+        self.version = version
+        self.features = features or FeaturePipeline(contract_table, payment_table)
+
+def find_model_path(models_dir: str = 'models', registry_path: str = 'models/registry.json'):
+    """Path and version of the model to serve.
+
+    The registry's production model wins; otherwise the newest
+    churn_model_*.pkl in ``models_dir`` is used (version unknown).
+    """
+    production = ModelRegistry(registry_path).get_production_model()
+    if production is not None:
+        return production['path'], production['version']
+
+    model_files = [f for f in os.listdir(models_dir) if f.startswith('churn_model_') and f.endswith('.pkl')]
+    if not model_files:
+        return None, None
+    return os.path.join(models_dir, sorted(model_files)[-1]), None
+
+def load_artifacts(
+    model_path: str,
+    version: Optional[int] = None,
+    use_compiled: bool = True,
+    mmap: bool = True
+) -> LoadedModel:
+    """Load a model, preferring its compiled export, plus its feature pipeline.
+
+    With ``mmap`` the compiled arrays are mapped read-only, so every API
+    worker on a host shares the same physical pages.
+    """
+    features = FeaturePipeline.for_model(model_path)
+    compiled_path = compiled_path_for(model_path)
+    if use_compiled and os.path.isdir(compiled_path):
+        model = CompiledForest.load(compiled_path, mmap_mode='r' if mmap else None)
+        model_path = compiled_path
+    else:
+        model = joblib.load(model_path)
+
+    return LoadedModel(model, features.contract_table, features.payment_table, model_path, version, features)
+
+def warm_up(loaded: LoadedModel, n_rows: int = 64):
+    """Score a synthetic batch so first real requests don't pay cold-start costs"""
+    rng = np.random.default_rng(0)
+    features = loaded.features
+    columns = {
+        'account_age_days': rng.integers(1, 3650, n_rows),
+        'monthly_charges': rng.uniform(0, 200, n_rows),
+        'total_charges': rng.uniform(0, 10000, n_rows),
+        'support_tickets': rng.integers(0, 10, n_rows),
+        'monthly_usage_gb': rng.uniform(0, 500, n_rows),
+        'num_services': rng.integers(1, 10, n_rows),
+        'contract_type': rng.choice(features.contract_table.classes, n_rows),
+        'payment_method': rng.choice(features.payment_table.classes, n_rows),
+    }
+    loaded.model.predict_proba(features.transform(columns)[0])
+
+class RegistryWatcher:
+    """Poll the model registry file and report production model and traffic changes"""
+
+    def __init__(
+        self,
+        registry_path: str,
+        on_change: Callable[[dict], Awaitable[None]],
+        interval: float = 5.0,
+        current_version: Optional[int] = None,
+        on_traffic_change: Optional[Callable[[dict], Awaitable[None]]] = None,
+        current_traffic: Optional[dict] = None
+    ):
+        self.registry_path = registry_path
+        self.on_change = on_change
+        self.interval = interval
+        self.current_version = current_version
+        self.on_traffic_change = on_traffic_change
+        self.current_traffic = current_traffic
+        self._mtime = self._read_mtime()
+        self._task = None
+
+    def _read_mtime(self):
+        try:
+            return os.stat(self.registry_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def check(self) -> bool:
+        """Poll once; returns True if a new production model or traffic split was handed off"""
+        mtime = self._read_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+
+        registry = ModelRegistry(self.registry_path)
+        production = registry.get_production_model()
+        traffic = registry.get_traffic() if self.on_traffic_change is not None else None
+        changed = False
+
+        # mtime is only recorded once the new models are live, so a failed
+        # load is retried on the next poll
+        if production is not None and production['version'] != self.current_version:
+            await self.on_change(production)
+            self.current_version = production['version']
+            changed = True
+        if traffic is not None and traffic != self.current_traffic:
+            await self.on_traffic_change(traffic)
+            self.current_traffic = traffic
+            changed = True
+        self._mtime = mtime
+        return changed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                print(f"✗ Model reload failed: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,142 @@
+import gzip
+import json
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import msgpack
+except ImportError:  # msgpack bodies are optional
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow bodies are optional
+    pa = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+ARROW = 'application/vnd.apache.arrow.stream'
+# Arrow IPC file format: the stream plus a footer, framed by ARROW1 magic
+ARROW_FILE = 'application/vnd.apache.arrow.file'
+ARROW_TYPES = (ARROW, ARROW_FILE)
+
+# Alternative names clients send for the same formats
+_ALIASES = {
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+}
+
+def _media_type(header: str) -> str:
+    media_type = (header or '').split(';')[0].strip().lower()
+    return _ALIASES.get(media_type, media_type)
+
+def _check_available(media_type: str, status_code: int):
+    if (media_type == MSGPACK and msgpack is None) or (media_type in ARROW_TYPES and pa is None):
+        raise HTTPException(status_code=status_code, detail=f"{media_type} is not available on this server")
+
+def request_format(request: Request) -> str:
+    """Format of the request body; 415 for formats the API can't read"""
+    media_type = _media_type(request.headers.get('content-type')) or JSON
+    if media_type not in (JSON, MSGPACK) + ARROW_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type: {media_type}")
+    _check_available(media_type, 415)
+    return media_type
+
+def response_format(request: Request) -> str:
+    """First acceptable response format in the Accept header; JSON by default"""
+    for part in (request.headers.get('accept') or '').split(','):
+        media_type = _media_type(part)
+        if media_type in (MSGPACK,) + ARROW_TYPES:
+            _check_available(media_type, 406)
+            return media_type
+        if media_type in (JSON, '*/*', 'application/*'):
+            return JSON
+    return JSON
+
+async def read_body(request: Request) -> bytes:
+    """Raw body, decompressed when sent with ``Content-Encoding: gzip``"""
+    body = await request.body()
+    encoding = (request.headers.get('content-encoding') or '').strip().lower()
+    if encoding == 'gzip':
+        try:
+            return gzip.decompress(body)
+        except (OSError, EOFError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    if encoding not in ('', 'identity'):
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    return body
+
+def loads(body: bytes, media_type: str):
+    """Decode a JSON or msgpack body"""
+    try:
+        if media_type == MSGPACK:
+            return msgpack.unpackb(body, raw=False)
+        return json.loads(body)
+    # msgpack raises TypeError for maps with unhashable keys
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": f"Invalid body: {e}", "type": "value_error"}])
+
+def arrow_columns(body: bytes, media_type: str = ARROW) -> dict:
+    """Decode an Arrow IPC stream or file into ``{column: [values...]}``"""
+    try:
+        if media_type == ARROW_FILE:
+            table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise HTTPException(status_code=422, detail=[{"loc": ["body"], "msg": f"Invalid Arrow body: {e}", "type": "value_error"}])
+    return table.to_pydict()
+
+# Every field a prediction can have; rows that failed only have customer_id and error
+PREDICTION_FIELDS = ['customer_id', 'churn_probability', 'churn_prediction', 'risk_level', 'timestamp', 'error']
+
+def _prediction_schema():
+    return pa.schema([
+        ('customer_id', pa.int64()),
+        ('churn_probability', pa.float64()),
+        ('churn_prediction', pa.bool_()),
+        ('risk_level', pa.string()),
+        ('timestamp', pa.string()),
+        ('error', pa.string()),
+    ])
+
+def columns_to_rows(columns: dict) -> list:
+    """Row-oriented predictions, leaving out fields that are null for a row"""
+    names = list(columns)
+    return [
+        {name: value for name, value in zip(names, values) if value is not None}
+        for values in zip(*columns.values())
+    ]
+
+def encode(payload: dict, media_type: str):
+    """Serialize a batch response ``{"predictions": rows or columns, ...}``.
+
+    Arrow responses carry the predictions as a table and the remaining
+    fields as schema metadata; JSON and msgpack get row-oriented
+    predictions.
+    """
+    predictions = payload['predictions']
+    if media_type in ARROW_TYPES:
+        if not isinstance(predictions, dict):
+            rows = jsonable_encoder(predictions)
+            predictions = {name: [row.get(name) for row in rows] for name in PREDICTION_FIELDS}
+        # A fixed schema, so a batch has every column whichever rows failed
+        n = len(predictions['customer_id'])
+        table = pa.table(
+            {name: predictions.get(name, [None] * n) for name in PREDICTION_FIELDS},
+            schema=_prediction_schema()
+        )
+        meta = {k: json.dumps(v) for k, v in payload.items() if k != 'predictions'}
+        table = table.replace_schema_metadata(meta)
+        sink = pa.BufferOutputStream()
+        new_writer = pa.ipc.new_file if media_type == ARROW_FILE else pa.ipc.new_stream
+        with new_writer(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), media_type=media_type)
+
+    if isinstance(predictions, dict):
+        payload = {**payload, 'predictions': columns_to_rows(predictions)}
+    if media_type == MSGPACK:
+        return Response(msgpack.packb(jsonable_encoder(payload)), media_type=MSGPACK)
+    return payload
@@ -0,0 +1,124 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from api.metrics import prediction_stage_latency
+
+_current_timer = contextvars.ContextVar('stage_timer', default=None)
+
+# Batch sizes are bucketed so the label has few values
+BATCH_SIZE_LABELS = [(1, '1'), (10, '2-10'), (100, '11-100'), (1000, '101-1000')]
+
+def batch_size_label(n: int) -> str:
+    for upper, label in BATCH_SIZE_LABELS:
+        if n <= upper:
+            return label
+    return '1001+'
+
+class StageTimer:
+    """Time spent in each stage of one prediction request.
+
+    Stages are consecutive: ``mark(stage)`` ends ``stage`` at the current
+    time and it is taken to have started where the previous stage ended,
+    so the stages add up to the request's time in the API. Marking the same
+    stage again adds to it.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.batch_size = 1
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def observe(self):
+        batch_size = batch_size_label(self.batch_size)
+        for stage, seconds in self.stages.items():
+            prediction_stage_latency.labels(
+                endpoint=self.endpoint, stage=stage, batch_size=batch_size
+            ).observe(seconds)
+
+def mark(stage: str):
+    """End ``stage`` of the current request, if it is being timed"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.mark(stage)
+
+def set_batch_size(n: int):
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.batch_size = n
+
+class StageTimingMiddleware:
+    """ASGI middleware that times the stages of requests to ``paths``.
+
+    The handler marks its own stages; everything before its first mark
+    (reading and validating the body) is ``parse`` and everything after its
+    last mark until the response starts (serializing and compressing the
+    body) is ``serialize``. Only successful responses are recorded.
+    """
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer(scope['path'])
+
+        async def send_timed(message):
+            if message['type'] == 'http.response.start':
+                timer.mark('serialize')
+                if message['status'] < 400:
+                    timer.observe()
+            await send(message)
+
+        token = _current_timer.set(timer)
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _current_timer.reset(token)
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter:
+    """Sample the stacks of every thread in this process for ``seconds``.
+
+    Returns a count per stack, outermost frame first, with the thread name
+    as the root. The sampling thread itself is left out.
+    """
+    own_id = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    counts = Counter()
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f'thread-{thread_id}'))
+            counts[tuple(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+def collapse(counts: Counter) -> str:
+    """Stacks in the folded format read by flamegraph.pl and speedscope"""
+    return ''.join(
+        f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n"
+        for stack, count in counts.most_common()
+    )
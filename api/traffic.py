@@ -0,0 +1,89 @@
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from api.executor import InferenceExecutor
+from api.metrics import model_inference_latency, model_predictions, shadow_disagreement, shadow_label_flips
+from api.model_loader import LoadedModel
+
+# Traffic is split in basis points, so canary shares can be as small as 0.01%
+BUCKETS = 10_000
+
+# Fibonacci hashing spreads consecutive customer ids evenly over the buckets
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+def traffic_buckets(customer_ids, split: str = 'customer_id', rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Bucket in ``[0, BUCKETS)`` for each row.
+
+    With the ``customer_id`` split a customer always lands in the same
+    bucket, so they see the same model on every request; ``random`` draws
+    a bucket per row.
+    """
+    if split == 'random':
+        return (rng or np.random.default_rng()).integers(0, BUCKETS, len(customer_ids))
+    ids = np.asarray(customer_ids, dtype=np.int64).astype(np.uint64)
+    return ((ids * _HASH_MULTIPLIER >> np.uint64(32)) % np.uint64(BUCKETS)).astype(np.int64)
+
+def route(buckets: np.ndarray, canaries: List['CandidateModel']) -> np.ndarray:
+    """Index of the canary serving each row, or -1 for production.
+
+    Canaries own consecutive bucket ranges starting at 0, so raising a
+    canary's share only moves more customers onto it.
+    """
+    routes = np.full(len(buckets), -1)
+    start = 0
+    for i, canary in enumerate(canaries):
+        end = start + round(canary.percent * BUCKETS / 100)
+        routes[(buckets >= start) & (buckets < end)] = i
+        start = end
+    return routes
+
+def take(columns: dict, rows: np.ndarray) -> dict:
+    """The given rows of a ``{column: values}`` batch"""
+    return {name: np.asarray(values)[rows] for name, values in columns.items()}
+
+class CandidateModel:
+    """A registry version served next to the production model.
+
+    A ``canary`` answers ``percent`` of production traffic; a ``shadow``
+    scores a copy of it without its predictions being returned. Each has
+    its own worker pool, so a slow or overloaded candidate can't hold up
+    production inference.
+    """
+
+    def __init__(self, loaded: LoadedModel, role: str, percent: float = 0.0, executor: InferenceExecutor = None):
+        self.loaded = loaded
+        self.role = role
+        self.percent = percent
+        self.executor = executor
+
+    @property
+    def version(self) -> int:
+        return self.loaded.version
+
+    @property
+    def features(self):
+        return self.loaded.features
+
+    def describe(self) -> dict:
+        return {'version': self.version, 'role': self.role, 'percent': self.percent, 'path': self.loaded.path}
+
+    async def score(self, features: np.ndarray) -> np.ndarray:
+        start = time.perf_counter()
+        probs = await self.executor.score(features)
+        observe_inference(self.version, self.role, len(features), time.perf_counter() - start)
+        return probs
+
+def observe_inference(version, role: str, rows: int, seconds: float):
+    labels = {'version': str(version) if version is not None else 'unversioned', 'role': role}
+    model_inference_latency.labels(**labels).observe(seconds)
+    model_predictions.labels(**labels).inc(rows)
+
+def observe_disagreement(version, shadow_probs: np.ndarray, served_probs: np.ndarray):
+    """Record how far a shadow's probabilities are from the ones served"""
+    version = str(version)
+    for diff in np.abs(shadow_probs - served_probs):
+        shadow_disagreement.labels(version=version).observe(diff)
+    flips = int(((shadow_probs >= 0.5) != (served_probs >= 0.5)).sum())
+    shadow_label_flips.labels(version=version).inc(flips)
@@ -1,40 +1,226 @@
+import gzip
+import json
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Dict, Optional
+
+import pandas as pd
 import requests
-from typing import List, Dict, Optional
+from requests.adapters import HTTPAdapter
+
+try:
+    import msgpack
+except ImportError:  # only needed for fmt='msgpack'
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # only needed for fmt='arrow'
+    pa = None
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Responses worth retrying: rate limited, or the server/proxy is briefly unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+CUSTOMER_FIELDS = [
+    'customer_id', 'account_age_days', 'monthly_charges', 'total_charges', 'support_tickets',
+    'contract_type', 'payment_method', 'monthly_usage_gb', 'num_services'
+]
+PREDICTION_FIELDS = ['customer_id', 'churn_probability', 'churn_prediction', 'risk_level', 'timestamp', 'error']
+
+def _failed_rows(chunk: pd.DataFrame, message: str) -> pd.DataFrame:
+    """Prediction records for rows that couldn't be scored"""
+    failed = pd.DataFrame({'customer_id': chunk['customer_id'].to_numpy(), 'error': message})
+    return failed.reindex(columns=PREDICTION_FIELDS)
+
+def _error_message(error: requests.RequestException) -> str:
+    response = getattr(error, 'response', None)
+    if response is None:
+        return f"Request failed: {error}"
+    try:
+        detail = response.json()['detail']
+    except (ValueError, KeyError, TypeError):
+        detail = response.text[:200]
+    if isinstance(detail, list) and detail and isinstance(detail[0], dict):
+        # FastAPI validation errors: report the first field and why
+        field = next((part for part in reversed(detail[0].get('loc', [])) if isinstance(part, str)), '?')
+        detail = f"{field}: {detail[0].get('msg')}"
+    return f"Request failed ({response.status_code}): {detail}"
 
 class ChurnPredictionClient:
     """Python client for Churn Prediction API"""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", timeout: float = 30.0,
+                 max_retries: int = 4, backoff: float = 0.5, pool_size: int = 8):
         self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
         self.session = requests.Session()
+        # One pooled connection per concurrent chunk in score_dataframe
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def _post(self, path: str, **kwargs):
+        """POST with a timeout, retrying 429/5xx and connection errors with backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                response.raise_for_status()
+                return response
+            time.sleep(self._retry_delay(attempt, response.headers.get('Retry-After')))
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        # Honour the server's Retry-After, otherwise exponential backoff with jitter
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
     
     def health_check(self) -> Dict:
         """Check API health"""
-        response = self.session.get(f"{self.base_url}/health")
+        response = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
         response.raise_for_status()
         return response.json()
     
     def predict(self, customer_data: Dict) -> Dict:
         """Predict churn for single customer"""
-        response = self.session.post(
-            f"{self.base_url}/predict",
-            json=customer_data
-        )
-        response.raise_for_status()
-        return response.json()
+        return self._post("/predict", json=customer_data).json()
     
-    def predict_batch(self, customers: List[Dict]) -> Dict:
-        """Predict churn for multiple customers"""
-        response = self.session.post(
-            f"{self.base_url}/predict/batch",
-            json={"customers": customers}
-        )
-        response.raise_for_status()
+    def predict_batch(self, customers: List[Dict], fmt: str = 'json', compress: bool = False) -> Dict:
+        """Predict churn for multiple customers.
+        
+        ``fmt`` picks the wire format for both request and response:
+        'json', 'msgpack' (no repeated key text per value) or 'arrow'
+        (columnar, typed). ``compress`` gzips the request body. The result
+        has the same shape whatever the format.
+        """
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"Unknown format: {fmt}")
+        
+        body = self._encode_customers(customers, fmt)
+        headers = {'Content-Type': MEDIA_TYPES[fmt], 'Accept': MEDIA_TYPES[fmt]}
+        if compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        
+        return self._decode_batch(self._post("/predict/batch", data=body, headers=headers))
+    
+    def score_dataframe(self, df: pd.DataFrame, output_path: Optional[str] = None, chunk_size: int = 1000,
+                        concurrency: int = 4, fmt: Optional[str] = None, compress: bool = True):
+        """Score a DataFrame of customers in concurrent chunks.
+        
+        Rows are sent ``chunk_size`` at a time with at most ``concurrency``
+        requests in flight; each request retries transient failures. Rows
+        of a chunk that still fails, or that fail validation, get an
+        ``error`` instead of ending the job. Results come back in input
+        order. With ``output_path`` they are appended to
+        a CSV as each chunk completes and a summary is returned, otherwise
+        a DataFrame of predictions is returned.
+        """
+        chunks = (df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size))
+        return self._score_chunks(chunks, output_path, concurrency, fmt, compress)
+    
+    def score_csv(self, input_path: str, output_path: str, chunk_size: int = 1000,
+                  concurrency: int = 4, fmt: Optional[str] = None, compress: bool = True) -> Dict:
+        """Score a CSV of customers into a CSV of predictions, streaming both files"""
+        chunks = pd.read_csv(input_path, usecols=CUSTOMER_FIELDS, chunksize=chunk_size)
+        return self._score_chunks(chunks, output_path, concurrency, fmt, compress)
+    
+    def _score_chunks(self, chunks: Iterable[pd.DataFrame], output_path: Optional[str],
+                      concurrency: int, fmt: Optional[str], compress: bool):
+        fmt = fmt or ('arrow' if pa is not None else 'json')
+        summary = {'rows': 0, 'errors': 0, 'chunks': 0, 'seconds': 0.0}
+        frames = []
+        start = time.perf_counter()
+        
+        def score(chunk):
+            customers = chunk[CUSTOMER_FIELDS].to_dict('records')
+            try:
+                result = self.predict_batch(customers, fmt=fmt, compress=compress)
+            except requests.HTTPError as e:
+                # A 422 means some row failed validation: halve the chunk
+                # until the invalid rows are on their own
+                if e.response.status_code == 422 and len(chunk) > 1:
+                    half = len(chunk) // 2
+                    return pd.concat([score(chunk.iloc[:half]), score(chunk.iloc[half:])], ignore_index=True)
+                return _failed_rows(chunk, _error_message(e))
+            except requests.RequestException as e:
+                return _failed_rows(chunk, _error_message(e))
+            return pd.DataFrame(result['predictions']).reindex(columns=PREDICTION_FIELDS)
+        
+        def collect(predictions):
+            summary['rows'] += len(predictions)
+            summary['errors'] += int(predictions['error'].notna().sum())
+            summary['chunks'] += 1
+            if output_path is None:
+                frames.append(predictions)
+            else:
+                predictions.to_csv(output_path, mode='w' if summary['chunks'] == 1 else 'a',
+                                   header=summary['chunks'] == 1, index=False)
+        
+        # Futures are drained oldest first, so output keeps input order and at
+        # most 2 * concurrency chunks are held in memory
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(score, chunk))
+                if len(pending) >= 2 * concurrency:
+                    collect(pending.popleft().result())
+            while pending:
+                collect(pending.popleft().result())
+        
+        summary['seconds'] = time.perf_counter() - start
+        if output_path is None:
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PREDICTION_FIELDS)
+        return summary
+    
+    @staticmethod
+    def _encode_customers(customers: List[Dict], fmt: str) -> bytes:
+        if fmt == 'msgpack':
+            return msgpack.packb({"customers": customers})
+        if fmt == 'arrow':
+            table = pa.Table.from_pylist(customers)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        return json.dumps({"customers": customers}).encode()
+    
+    @staticmethod
+    def _decode_batch(response) -> Dict:
+        content_type = response.headers.get('content-type', '')
+        if content_type.startswith(MEDIA_TYPES['msgpack']):
+            return msgpack.unpackb(response.content, raw=False)
+        if content_type.startswith(MEDIA_TYPES['arrow']):
+            table = pa.ipc.open_stream(response.content).read_all()
+            result = {k.decode(): json.loads(v) for k, v in (table.schema.metadata or {}).items()}
+            result['predictions'] = [
+                {k: v for k, v in row.items() if v is not None}
+                for row in table.to_pylist()
+            ]
+            return result
         return response.json()
     
     def get_model_info(self) -> Dict:
         """Get model metadata"""
-        response = self.session.get(f"{self.base_url}/model/info")
+        response = self.session.get(f"{self.base_url}/model/info", timeout=self.timeout)
         response.raise_for_status()
         return response.json()
 
@@ -0,0 +1,151 @@
+import json
+import os
+
+import numpy as np
+
+class CompiledForest:
+    """Random forest packed into flat NumPy arrays for fast batch scoring.
+
+    All trees share one set of node arrays (feature, threshold, left,
+    right, value) with each tree's nodes stored contiguously. Leaves point
+    to themselves, so a batch can be pushed through every tree in lockstep,
+    one level per step, without any per-tree or per-row Python.
+
+    The saved form is a directory of plain .npy files, so it can be
+    memory-mapped read-only and shared by every worker process on a host.
+    """
+
+    # Rows scored per step; keeps the (rows, trees) working set cache-sized
+    chunk_size = 1024
+
+    _arrays = ('feature', 'threshold', 'children', 'value', 'roots', 'classes')
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        # Interleaved (left, right) pairs so a step is one gather: 2 * node + go_right
+        self.children = children
+        self.left = children[0::2]
+        self.right = children[1::2]
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_estimators = len(roots)
+        self.n_features_in_ = int(n_features)
+        self._source = None
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'CompiledForest':
+        """Pack a fitted RandomForestClassifier"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            nodes = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so extra steps are no-ops
+            left = np.where(is_leaf, nodes, tree.children_left) + offset
+            right = np.where(is_leaf, nodes, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Per-node class distribution, as used by tree.predict_proba
+            value = tree.value[:, 0, :]
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1
+
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value / totals)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1).ravel().astype(np.int32),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+            n_features=model.n_features_in_
+        )
+
+    def save(self, path: str):
+        """Write the packed arrays as an uncompressed .npy bundle directory"""
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'children': self.children,
+            'value': self.value,
+            'roots': self.roots,
+            'classes': self.classes_,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'max_depth': self.max_depth, 'n_features': self.n_features_in_}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = None) -> 'CompiledForest':
+        """Load a bundle; with ``mmap_mode='r'`` the arrays are mapped, not read"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in cls._arrays
+        }
+        forest = cls(
+            max_depth=meta['max_depth'],
+            n_features=meta['n_features'],
+            **arrays
+        )
+        forest._source = (path, mmap_mode)
+        return forest
+
+    def __reduce_ex__(self, protocol):
+        # A mapped forest is re-mapped (not copied) when sent to worker processes
+        if self._source is not None and self._source[1] is not None:
+            return (type(self).load, self._source)
+        return super().__reduce_ex__(protocol)
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.int32) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_estimators))
+
+        for _ in range(self.max_depth):
+            go_right = flat[row_offset + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + go_right]
+
+        return self.value[node].mean(axis=1)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, matching RandomForestClassifier.predict_proba"""
+        # sklearn trees compare float32 inputs against the stored thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}")
+
+        if len(X) <= self.chunk_size:
+            return self._predict_chunk(X)
+        return np.concatenate([
+            self._predict_chunk(X[start:start + self.chunk_size])
+            for start in range(0, len(X), self.chunk_size)
+        ])
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def compiled_path_for(model_path: str) -> str:
+    """Location of the compiled artifact exported next to a model pickle"""
+    return os.path.splitext(model_path)[0] + '.compiled'
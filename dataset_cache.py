@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Typed copies of raw CSVs; empty disables the cache and every read parses the CSV
+CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', 'data/processed')
+
+# Cached copies kept; the least recently used are removed beyond this
+CACHE_MAX_ENTRIES = int(os.environ.get('DATASET_CACHE_MAX_ENTRIES', '8'))
+
+# A cached copy is named {source name}.{16 hex digits of its content hash}.arrow
+_ENTRY = re.compile(r'(?P<name>.+)\.[0-9a-f]{16}\.arrow')
+
+# Stored as dictionary codes rather than repeated strings
+CATEGORICAL_COLUMNS = ['contract_type', 'payment_method']
+
+# Column types are inferred from the first block, so make it a large one
+BLOCK_SIZE = 1 << 24
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_hash(path: str, cache_dir: str = None) -> str:
+    """Content hash of ``path``, re-read only when its size or mtime changed"""
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return file_hash(path)
+    stat = os.stat(path)
+    signature = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    memo_path = os.path.join(cache_dir, f'{_name(path)}.source.json')
+    if os.path.exists(memo_path):
+        with open(memo_path) as f:
+            memo = json.load(f)
+        if memo['signature'] == signature:
+            return memo['sha256']
+
+    sha256 = file_hash(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = _temp_path(cache_dir, _name(path))
+    with open(tmp_path, 'w') as f:
+        json.dump({'signature': signature, 'sha256': sha256}, f)
+    os.replace(tmp_path, memo_path)
+    return sha256
+
+def _temp_path(cache_dir: str, name: str) -> str:
+    # A unique temporary name, so processes caching the same file don't collide
+    fd, path = tempfile.mkstemp(prefix=f'{name}.', suffix='.tmp', dir=cache_dir)
+    os.close(fd)
+    return path
+
+def _name(path: str) -> str:
+    # Files with the same name in different directories get separate entries
+    path_hash = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f'{os.path.splitext(os.path.basename(path))[0]}-{path_hash}'
+
+def cache_path(source: str, cache_dir: str = None) -> str:
+    """Where the cached copy of ``source``'s current contents lives"""
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    return os.path.join(cache_dir, f'{_name(source)}.{source_hash(source, cache_dir)[:16]}.arrow')
+
+def _column_types(source: str) -> dict:
+    # Pin every column to the type inferred from the first block, so later
+    # blocks can't disagree. Dates stay strings, as pandas would read them.
+    schema = pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE)).schema
+    types = {}
+    for field in schema:
+        if field.name in CATEGORICAL_COLUMNS:
+            types[field.name] = pa.dictionary(pa.int32(), pa.string())
+        elif pa.types.is_temporal(field.type):
+            types[field.name] = pa.string()
+        else:
+            types[field.name] = field.type
+    return types
+
+def materialize(source: str, cache_dir: str = None) -> str:
+    """Convert a CSV into a typed Arrow IPC file once and return its path.
+
+    The cache is keyed on a hash of the CSV, so an edited file is converted
+    again; copies of earlier versions of the same file are removed.
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    path = cache_path(source, cache_dir)
+    if os.path.exists(path):
+        # The modification time records use, for least-recently-used eviction
+        os.utime(path)
+        return path
+
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+        # Empty fields are missing values, as in pandas
+        convert_options=pa_csv.ConvertOptions(column_types=_column_types(source), strings_can_be_null=True)
+    )
+    tmp_path = _temp_path(cache_dir, _name(source))
+    try:
+        # The stream format allows each batch its own dictionary
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_stream(sink, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    for name in os.listdir(cache_dir):
+        entry = _ENTRY.fullmatch(name)
+        stale = os.path.join(cache_dir, name)
+        if entry and entry['name'] == _name(source) and stale != path:
+            os.remove(stale)
+    print(f"✓ Cached {source} as {path}")
+    evict(cache_dir)
+    return path
+
+def evict(cache_dir: str = None, max_entries: int = None, pattern: re.Pattern = _ENTRY):
+    """Remove the least recently used files beyond ``max_entries``.
+
+    Files are those whose name fully matches ``pattern``, a regex with a
+    ``name`` group: by default the cached copies of CSVs, whose memo files
+    go with them.
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = pattern.fullmatch(name)
+        if entry:
+            path = os.path.join(cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path, entry['name']))
+            except FileNotFoundError:  # evicted by another process
+                pass
+    entries.sort(reverse=True)
+    for _, path, name in entries[max_entries:]:
+        # Readers that already mapped the file keep their copy until they close it
+        memos = [os.path.join(cache_dir, f'{name}.source.json')] if pattern is _ENTRY else []
+        for stale in [path] + memos:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+def read_table(source: str, columns: Optional[List[str]] = None, cache_dir: str = None) -> Optional[pa.Table]:
+    """Memory-mapped Arrow table of a CSV's cached copy.
+
+    Returns None when caching is disabled or the CSV can't be typed
+    consistently, in which case callers read the CSV directly.
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return None
+    try:
+        path = materialize(source, cache_dir)
+    except pa.ArrowInvalid as e:
+        print(f"⚠ Not caching {source}: {e}")
+        return None
+    table = pa.ipc.open_stream(pa.memory_map(path, 'r')).read_all()
+    return table.select(columns) if columns is not None else table
+
+def read_dataframe(source: str, columns: Optional[List[str]] = None, cache_dir: str = None,
+                   dtype: dict = None) -> pd.DataFrame:
+    """A CSV as a DataFrame, read through the cache; categoricals come back as ``category``.
+
+    ``dtype`` is used when the CSV has to be read directly.
+    """
+    table = read_table(source, columns, cache_dir)
+    if table is None:
+        return pd.read_csv(source, usecols=columns, dtype=dtype)
+    return table.to_pandas()
+
+def iter_batches(source: str, columns: Optional[List[str]] = None, batch_size: int = 1_000_000,
+                 cache_dir: str = None, dtype: dict = None) -> Iterator[pd.DataFrame]:
+    """A CSV as DataFrames of ``batch_size`` rows, read through the cache.
+
+    ``dtype`` is used when the CSV has to be read directly.
+    """
+    table = read_table(source, columns, cache_dir)
+    if table is None:
+        yield from pd.read_csv(source, usecols=columns, chunksize=batch_size, dtype=dtype)
+        return
+    for start in range(0, table.num_rows, batch_size):
+        yield table.slice(start, batch_size).to_pandas()
@@ -0,0 +1,235 @@
+import os
+from types import MappingProxyType
+from typing import Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Raw numeric inputs, in model column order; the two category codes follow
+NUMERIC_FEATURES = ['account_age_days', 'monthly_charges', 'total_charges',
+                    'support_tickets', 'monthly_usage_gb', 'num_services']
+CATEGORICAL_FEATURES = ['contract_type', 'payment_method']
+
+class UnknownCategoryError(ValueError):
+    """Raised when a categorical value was not seen during training"""
+
+    def __init__(self, field: str, value, allowed: Sequence[str]):
+        self.field = field
+        self.value = value
+        self.allowed = list(allowed)
+        super().__init__(
+            f"Unknown {field} {value!r}; allowed values: {', '.join(self.allowed)}"
+        )
+
+class CategoryTable:
+    """Frozen category -> code lookup equivalent to a fitted LabelEncoder.
+
+    Single values are encoded with one dict lookup; columns are encoded
+    with a vectorized binary search over the (sorted) classes.
+    """
+
+    def __init__(self, field: str, classes: Sequence[str]):
+        self.field = field
+        self.classes = tuple(sorted(str(c) for c in classes))
+        self.codes = MappingProxyType({c: i for i, c in enumerate(self.classes)})
+        self._sorted = np.array(self.classes)
+
+    def __reduce__(self):
+        # The lookup dict is a read-only proxy, which can't be pickled; rebuild it
+        return (CategoryTable, (self.field, self.classes))
+
+    @classmethod
+    def from_encoder(cls, field: str, encoder) -> 'CategoryTable':
+        return cls(field, encoder.classes_)
+
+    @classmethod
+    def load(cls, field: str, encoder_path: str) -> 'CategoryTable':
+        """Build the table from a pickled LabelEncoder"""
+        return cls.from_encoder(field, joblib.load(encoder_path))
+
+    def encode(self, value: str) -> int:
+        try:
+            return self.codes[value]
+        except KeyError:
+            raise UnknownCategoryError(self.field, value, self.classes) from None
+
+    def encode_many(self, values: Sequence[str]):
+        """Encode a column of values, returning codes and a known-value mask.
+
+        Unknown values get code -1 instead of raising so callers can report
+        them per row.
+        """
+        values = np.asarray(values, dtype=str)
+        if values.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+
+        codes = np.searchsorted(self._sorted, values)
+        codes = np.minimum(codes, len(self._sorted) - 1)
+        known = self._sorted[codes] == values
+        return np.where(known, codes, -1), known
+
+
+def charges_per_tenure_day(columns: dict) -> np.ndarray:
+    return columns['total_charges'] / np.maximum(columns['account_age_days'], 1)
+
+def tickets_per_month(columns: dict) -> np.ndarray:
+    return columns['support_tickets'] / np.maximum(columns['account_age_days'] / 30, 1)
+
+# Optional features computed from the raw inputs, appended after the base columns
+DERIVED_FEATURES = {
+    'charges_per_tenure_day': charges_per_tenure_day,
+    'tickets_per_month': tickets_per_month,
+}
+
+# Latest fitted pipeline in a models directory, next to the encoders
+FEATURES_FILE = 'feature_pipeline.pkl'
+
+def features_path_for(model_path: str) -> str:
+    """Where the feature pipeline of a saved model is stored"""
+    return os.path.splitext(model_path)[0] + '.features.pkl'
+
+class FeaturePipeline:
+    """Raw customer columns -> float32 model input, shared by training and serving.
+
+    Input is anything indexable by column name: a DataFrame, a dict of
+    columns or a NumPy record array. Every step is a whole-column NumPy
+    operation. Columns are the six numeric inputs, the two category codes,
+    then any ``derived`` features (names from ``DERIVED_FEATURES``).
+    """
+
+    def __init__(self, contract_table: CategoryTable, payment_table: CategoryTable, derived: Sequence[str] = ()):
+        unknown = [name for name in derived if name not in DERIVED_FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown derived features: {', '.join(unknown)}")
+        self.contract_table = contract_table
+        self.payment_table = payment_table
+        self.derived = tuple(derived)
+
+    @property
+    def feature_names(self) -> list:
+        return NUMERIC_FEATURES + [f'{c}_encoded' for c in CATEGORICAL_FEATURES] + list(self.derived)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    @classmethod
+    def from_encoders(cls, le_contract, le_payment, derived: Sequence[str] = ()) -> 'FeaturePipeline':
+        return cls(
+            CategoryTable.from_encoder('contract_type', le_contract),
+            CategoryTable.from_encoder('payment_method', le_payment),
+            derived
+        )
+
+    def label_encoders(self):
+        """(contract, payment) LabelEncoders equivalent to the category tables"""
+        from sklearn.preprocessing import LabelEncoder
+
+        encoders = []
+        for table in (self.contract_table, self.payment_table):
+            encoder = LabelEncoder()
+            encoder.classes_ = np.asarray(table.classes, dtype=object)
+            encoders.append(encoder)
+        return tuple(encoders)
+
+    def transform(self, data):
+        """Build the model input for a batch of customers.
+
+        Returns the ``(n, n_features)`` float32 matrix, a mask of rows whose
+        categories could be encoded and, per row, the UnknownCategoryError
+        of rows that could not (None otherwise).
+        """
+        codes, valid, errors = self.encode(data)
+        return self.build(data, codes), valid, errors
+
+    def encode(self, data):
+        """The categorical half of ``transform``: codes per categorical
+        column, the mask of rows that could be encoded and their errors"""
+        contract_codes, contract_ok = _encode(self.contract_table, data['contract_type'])
+        payment_codes, payment_ok = _encode(self.payment_table, data['payment_method'])
+
+        valid = contract_ok & payment_ok
+        errors = [None] * len(valid)
+        for i in np.flatnonzero(~valid):
+            if not contract_ok[i]:
+                errors[i] = UnknownCategoryError('contract_type', _value(data['contract_type'], i), self.contract_table.classes)
+            else:
+                errors[i] = UnknownCategoryError('payment_method', _value(data['payment_method'], i), self.payment_table.classes)
+        return {'contract_type': contract_codes, 'payment_method': payment_codes}, valid, errors
+
+    def build(self, data, codes) -> np.ndarray:
+        """The feature matrix from the numeric columns and codes from ``encode``"""
+        columns = {name: np.asarray(data[name], dtype=np.float32) for name in NUMERIC_FEATURES}
+        X = np.empty((len(codes['contract_type']), self.n_features), dtype=np.float32)
+        for i, name in enumerate(NUMERIC_FEATURES):
+            X[:, i] = columns[name]
+        X[:, 6] = codes['contract_type']
+        X[:, 7] = codes['payment_method']
+        for i, name in enumerate(self.derived, start=8):
+            X[:, i] = DERIVED_FEATURES[name](columns)
+        return X
+
+    def save(self, path: str):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: str) -> 'FeaturePipeline':
+        return joblib.load(path)
+
+    @classmethod
+    def from_encoder_files(cls, models_dir: str) -> 'FeaturePipeline':
+        """Base features encoded with the LabelEncoders pickled in ``models_dir``"""
+        return cls(
+            CategoryTable.load('contract_type', os.path.join(models_dir, 'contract_encoder.pkl')),
+            CategoryTable.load('payment_method', os.path.join(models_dir, 'payment_encoder.pkl'))
+        )
+
+    @classmethod
+    def from_dir(cls, models_dir: str) -> 'FeaturePipeline':
+        """The most recently fitted pipeline in ``models_dir``, or one built from its encoders"""
+        path = os.path.join(models_dir, FEATURES_FILE)
+        if os.path.exists(path):
+            return cls.load(path)
+        return cls.from_encoder_files(models_dir)
+
+    @classmethod
+    def for_model(cls, model_path: str) -> 'FeaturePipeline':
+        """The pipeline saved with a model.
+
+        Models saved before pipelines were persisted fall back to the
+        encoders stored in the model's directory.
+        """
+        path = features_path_for(model_path)
+        if os.path.exists(path):
+            return cls.load(path)
+        return cls.from_encoder_files(os.path.dirname(model_path) or '.')
+
+# Up to this many values are looked up one by one in the table's dict;
+# factorizing only pays off for longer columns
+SMALL_ENCODE = 16
+
+def _lookup(table: CategoryTable, values):
+    codes = np.array([table.codes.get(v, -1) if isinstance(v, str) else -1 for v in values], dtype=np.int64)
+    return codes, codes >= 0
+
+def _encode(table: CategoryTable, values):
+    """Codes and known-value mask, encoding each distinct value once"""
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        index, uniques = values.codes, values.categories
+    elif len(values) <= SMALL_ENCODE:
+        return _lookup(table, values)
+    else:
+        # Hashing is much cheaper than converting every value to a fixed-width string
+        index, uniques = pd.factorize(np.asarray(values, dtype=object))
+    if len(uniques) <= SMALL_ENCODE:
+        codes, known = _lookup(table, uniques)
+    else:
+        codes, known = table.encode_many(np.asarray(uniques, dtype=object))
+    # Missing values have index -1 and map to the appended "unknown" slot
+    return np.append(codes, -1)[index], np.append(known, False)[index]
+
+def _value(values, i: int):
+    return values.iloc[i] if isinstance(values, pd.Series) else values[i]
@@ -1,37 +1,199 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 
-def generate_data(n_customers=50000, output_path='data/raw/customer_data.csv'):
-    """Generate synthetic customer churn data"""
-    np.random.seed(42)
+CONTRACT_TYPES = ['Month-to-Month', 'One Year', 'Two Year']
+CONTRACT_PROBS = [0.5, 0.3, 0.2]
+PAYMENT_METHODS = ['Credit Card', 'Bank Transfer', 'Electronic Check']
+PAYMENT_PROBS = [0.4, 0.3, 0.3]
+
+def _drifted_contract_probs(drift: float) -> np.ndarray:
+    # Drift moves customers from longer contracts to month-to-month
+    probs = np.array(CONTRACT_PROBS)
+    probs[0] += (1 - probs[0]) * 0.6 * drift
+    probs[1:] *= (1 - probs[0]) / probs[1:].sum()
+    return probs
+
+def generate_chunk(chunk_index: int, n_rows: int, start_id: int = 1, seed: int = 42, drift: float = 0.0) -> pd.DataFrame:
+    """One chunk of synthetic customers.
 
+    Each chunk has its own generator seeded from ``(seed, chunk_index)``, so
+    a chunk's rows are the same however the dataset is chunked into files
+    or processes. Categoricals are drawn as integer codes and only mapped
+    to labels through ``pd.Categorical``.
+
+    ``drift`` (0 = none, 1 = strong) shifts the inputs away from the
+    reference distribution: higher monthly charges (still within 20-150),
+    more support tickets, heavier usage and more month-to-month contracts.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
     data = {
-        'customer_id': range(1, n_customers + 1),
-        'account_age_days': np.random.randint(30, 1825, n_customers),
-        'monthly_charges': np.random.uniform(20, 150, n_customers),
-        'total_charges': np.random.uniform(100, 8000, n_customers),
-        'support_tickets': np.random.poisson(2, n_customers),
-        'contract_type': np.random.choice(['Month-to-Month', 'One Year', 'Two Year'], n_customers, p=[0.5, 0.3, 0.2]),
-        'payment_method': np.random.choice(['Credit Card', 'Bank Transfer', 'Electronic Check'], n_customers, p=[0.4, 0.3, 0.3]),
-        'monthly_usage_gb': np.random.uniform(5, 500, n_customers),
-        'num_services': np.random.randint(1, 6, n_customers),
+        'customer_id': np.arange(start_id, start_id + n_rows, dtype=np.int64),
+        'account_age_days': rng.integers(30, 1825, n_rows),
+        'monthly_charges': rng.uniform(20 + 60 * drift, 150, n_rows),
+        'total_charges': rng.uniform(100, 8000, n_rows),
+        'support_tickets': rng.poisson(2 * (1 + drift), n_rows),
+        'contract_type': rng.choice(len(CONTRACT_TYPES), n_rows, p=_drifted_contract_probs(drift)),
+        'payment_method': rng.choice(len(PAYMENT_METHODS), n_rows, p=PAYMENT_PROBS),
+        'monthly_usage_gb': rng.uniform(5, 500 * (1 + drift), n_rows),
+        'num_services': rng.integers(1, 6, n_rows),
     }
+    return _to_frame(data, rng)
 
-    # Create churn target
+def _to_frame(data: dict, rng) -> pd.DataFrame:
+    """Draw the churn target and map category codes to labels"""
     churn_probability = (
-        0.1 + 
+        0.1 +
         (data['monthly_charges'] / 150) * 0.2 +
         (data['support_tickets'] / 10) * 0.3 +
-        (np.array(data['contract_type']) == 'Month-to-Month') * 0.25
+        (data['contract_type'] == 0) * 0.25
     )
     churn_probability = np.clip(churn_probability, 0, 0.8)
-    data['churned'] = np.random.binomial(1, churn_probability)
+    data['churned'] = rng.binomial(1, churn_probability)
+
+    data['contract_type'] = pd.Categorical.from_codes(data['contract_type'].astype(np.int8), CONTRACT_TYPES)
+    data['payment_method'] = pd.Categorical.from_codes(data['payment_method'].astype(np.int8), PAYMENT_METHODS)
+    return pd.DataFrame(data)
+
+def _chunk_bounds(n_rows: int, chunk_size: int):
+    return [(i, start, min(chunk_size, n_rows - start)) for i, start in enumerate(range(0, n_rows, chunk_size))]
+
+def _render_chunk(fmt: str, index: int, start: int, n_rows: int, seed: int, drift: float, header: bool):
+    """Generate a chunk in a worker and return it ready to write"""
+    chunk = generate_chunk(index, n_rows, start + 1, seed, drift)
+    if fmt == 'parquet':
+        import pyarrow as pa
+        return pa.Table.from_pandas(chunk, preserve_index=False)
+    return chunk.to_csv(index=False, header=header).encode()
+
+def _write_chunks(output_path: str, fmt: str, chunks: list, seed: int, drift: float, pool=None, max_pending: int = 1) -> int:
+    """Write chunks to one file in order, rendering up to ``max_pending`` ahead in ``pool``"""
+    writer = None
+    pending = deque()
+    rows = 0
+
+    def write(rendered):
+        nonlocal writer
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, rendered.schema)
+            writer.write_table(rendered)
+        else:
+            writer.write(rendered)
+
+    if fmt == 'csv':
+        writer = open(output_path, 'wb')
+    try:
+        for index, start, n in chunks:
+            args = (fmt, index, start, n, seed, drift, index == chunks[0][0])
+            pending.append(pool.submit(_render_chunk, *args) if pool is not None else _render_chunk(*args))
+            rows += n
+            if len(pending) >= max_pending:
+                rendered = pending.popleft()
+                write(rendered.result() if pool is not None else rendered)
+        while pending:
+            rendered = pending.popleft()
+            write(rendered.result() if pool is not None else rendered)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def generate_dataset(
+    n_rows: int,
+    output_path: str,
+    chunk_size: int = 1_000_000,
+    seed: int = 42,
+    fmt: str = None,
+    shards: int = 1,
+    workers: int = None,
+    drift: float = 0.0
+) -> dict:
+    """Stream a synthetic dataset of any size to disk.
+
+    Rows are generated ``chunk_size`` at a time across ``workers``
+    processes, so memory stays bounded by a few chunks. ``fmt`` is 'csv' or
+    'parquet' (by default taken from the file extension). With ``shards``
+    > 1, ``output_path`` is a directory of ``part-NNNNN`` files, each
+    written by its own process; otherwise chunks are written to one file
+    in order.
+    """
+    fmt = fmt or ('parquet' if output_path.endswith('.parquet') else 'csv')
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunk_bounds(n_rows, chunk_size)
+
+    if shards > 1:
+        os.makedirs(output_path, exist_ok=True)
+        per_shard = -(-len(chunks) // shards)
+        paths = []
+        with ProcessPoolExecutor(max_workers=min(workers, shards)) as pool:
+            futures = []
+            for shard in range(shards):
+                shard_chunks = chunks[shard * per_shard:(shard + 1) * per_shard]
+                if not shard_chunks:
+                    break
+                path = os.path.join(output_path, f'part-{shard:05d}.{fmt}')
+                futures.append(pool.submit(_write_chunks, path, fmt, shard_chunks, seed, drift))
+                paths.append(path)
+            rows = sum(f.result() for f in futures)
+    else:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        paths = [output_path]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = _write_chunks(output_path, fmt, chunks, seed, drift, pool, max_pending=2 * workers)
+        else:
+            rows = _write_chunks(output_path, fmt, chunks, seed, drift)
+
+    print(f"Generated {rows} records in {len(paths)} {fmt} file(s) at {output_path}")
+    return {'rows': rows, 'paths': paths, 'format': fmt}
+
+def generate_data(n_customers=50000, output_path='data/raw/customer_data.csv', seed=42):
+    """Generate synthetic customer churn data in memory and save it as CSV.
+
+    Draws from a single legacy ``RandomState`` stream, so a seed gives the
+    same dataset this function has always produced. Use
+    ``generate_dataset`` for large or drifted datasets.
+    """
+    rng = np.random.RandomState(seed)
+    data = {
+        'customer_id': np.arange(1, n_customers + 1, dtype=np.int64),
+        'account_age_days': rng.randint(30, 1825, n_customers),
+        'monthly_charges': rng.uniform(20, 150, n_customers),
+        'total_charges': rng.uniform(100, 8000, n_customers),
+        'support_tickets': rng.poisson(2, n_customers),
+        'contract_type': rng.choice(len(CONTRACT_TYPES), n_customers, p=CONTRACT_PROBS),
+        'payment_method': rng.choice(len(PAYMENT_METHODS), n_customers, p=PAYMENT_PROBS),
+        'monthly_usage_gb': rng.uniform(5, 500, n_customers),
+        'num_services': rng.randint(1, 6, n_customers),
+    }
+    df = _to_frame(data, rng)
+    for col in ['contract_type', 'payment_method']:
+        df[col] = df[col].astype(object)
 
-    df = pd.DataFrame(data)
     df.to_csv(output_path, index=False)
     print(f"Generated {len(df)} records. Churn rate: {df['churned'].mean():.2%}")
     return df
 
 if __name__ == "__main__":
-    generate_data()
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--output', default='data/raw/customer_data.csv')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=['csv', 'parquet'], help='Default: from the file extension')
+    parser.add_argument('--shards', type=int, default=1, help='Write a directory of this many files')
+    parser.add_argument('--workers', type=int, help='Generator processes (default: all cores)')
+    parser.add_argument('--drift', type=float, default=0.0, help='Input drift strength, 0-1')
+    args = parser.parse_args()
+
+    generate_dataset(
+        args.rows, args.output, chunk_size=args.chunk_size, seed=args.seed, fmt=args.format,
+        shards=args.shards, workers=args.workers, drift=args.drift
+    )
@@ -1,5 +1,3 @@
-import mlflow
-import joblib
 from datetime import datetime
 import json
 import os
@@ -15,6 +13,16 @@ class ModelRegistry:
                 return json.load(f)
         return {'models': [], 'production': None}
     
+    def _get(self, version):
+        model = next((m for m in self.registry['models'] if m['version'] == version), None)
+        if not model:
+            raise ValueError(f"Model version {version} not found")
+        return model
+    
+    def _traffic(self):
+        # Registries written before traffic splitting have no traffic section
+        return self.registry.setdefault('traffic', {'split': 'customer_id', 'canary': [], 'shadow': []})
+    
     def _save_registry(self):
         os.makedirs(os.path.dirname(self.registry_path), exist_ok=True)
         with open(self.registry_path, 'w') as f:
@@ -42,10 +50,8 @@ class ModelRegistry:
     
     def promote_to_production(self, version):
         """Promote a model version to production"""
-        model = next((m for m in self.registry['models'] if m['version'] == version), None)
-        
-        if not model:
-            raise ValueError(f"Model version {version} not found")
+        model = self._get(version)
+        self._remove_from_traffic(version)
         
         # Demote current production model
         if self.registry['production']:
@@ -68,14 +74,108 @@ class ModelRegistry:
         return next(m for m in self.registry['models'] 
                    if m['version'] == self.registry['production'])
     
+    def start_canary(self, version, percent):
+        """Serve ``percent`` of production traffic with a model version"""
+        model = self._get(version)
+        if version == self.registry['production']:
+            raise ValueError(f"Model v{version} is already in production")
+        traffic = self._traffic()
+        total = sum(c['percent'] for c in traffic['canary'] if c['version'] != version) + percent
+        if percent <= 0 or total > 100:
+            raise ValueError(f"Canary traffic must be above 0% and at most 100% in total, got {total}%")
+    
+        self._remove_from_traffic(version)
+        traffic['canary'].append({'version': version, 'percent': percent})
+        model['status'] = 'canary'
+        self._save_registry()
+        print(f"✓ Serving {percent}% of traffic with v{version}")
+    
+    def start_shadow(self, version):
+        """Score a copy of all traffic with a model version without serving its predictions"""
+        model = self._get(version)
+        if version == self.registry['production']:
+            raise ValueError(f"Model v{version} is already in production")
+        self._remove_from_traffic(version)
+        
+        self._traffic()['shadow'].append(version)
+        model['status'] = 'shadow'
+        self._save_registry()
+        print(f"✓ Shadowing traffic with v{version}")
+    
+    def stop_traffic(self, version):
+        """Take a model version out of canary or shadow serving"""
+        model = self._get(version)
+        self._remove_from_traffic(version)
+        if model['status'] in ('canary', 'shadow'):
+            model['status'] = 'staging'
+        self._save_registry()
+        print(f"✓ Stopped traffic to v{version}")
+    
+    def set_traffic_split(self, split):
+        """Route canary traffic by a hash of ``customer_id`` or per request at ``random``"""
+        if split not in ('customer_id', 'random'):
+            raise ValueError(f"Unknown traffic split: {split}")
+        self._traffic()['split'] = split
+        self._save_registry()
+    
+    def _remove_from_traffic(self, version):
+        traffic = self._traffic()
+        traffic['canary'] = [c for c in traffic['canary'] if c['version'] != version]
+        traffic['shadow'] = [v for v in traffic['shadow'] if v != version]
+    
+    def get_traffic(self):
+        """Canary and shadow models with their paths, and how canary traffic is split"""
+        traffic = self.registry.get('traffic', {})
+        return {
+            'split': traffic.get('split', 'customer_id'),
+            'canary': [
+                {'version': c['version'], 'path': self._get(c['version'])['path'], 'percent': c['percent']}
+                for c in traffic.get('canary', [])
+            ],
+            'shadow': [
+                {'version': v, 'path': self._get(v)['path']} for v in traffic.get('shadow', [])
+            ],
+        }
+    
     def list_models(self):
         """List all registered models"""
         print("\n=== Model Registry ===")
         for model in self.registry['models']:
             prod_marker = " [PRODUCTION]" if model['version'] == self.registry['production'] else ""
             print(f"v{model['version']}{prod_marker} - F1: {model['metrics']['f1']:.4f} - {model['status']}")
+        
+        traffic = self.get_traffic()
+        for canary in traffic['canary']:
+            print(f"Canary: v{canary['version']} on {canary['percent']}% of traffic (split by {traffic['split']})")
+        for shadow in traffic['shadow']:
+            print(f"Shadow: v{shadow['version']}")
 
 # Usage example
 if __name__ == "__main__":
-    registry = ModelRegistry()
-    registry.list_models()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--registry', default='models/registry.json')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list')
+    commands.add_parser('promote').add_argument('version', type=int)
+    canary = commands.add_parser('canary', help='Serve a share of traffic with a version')
+    canary.add_argument('version', type=int)
+    canary.add_argument('percent', type=float)
+    commands.add_parser('shadow', help='Score a copy of traffic with a version').add_argument('version', type=int)
+    commands.add_parser('stop', help='End canary or shadow serving of a version').add_argument('version', type=int)
+    commands.add_parser('split').add_argument('split', choices=['customer_id', 'random'])
+    args = parser.parse_args()
+    
+    registry = ModelRegistry(args.registry)
+    if args.command == 'promote':
+        registry.promote_to_production(args.version)
+    elif args.command == 'canary':
+        registry.start_canary(args.version, args.percent)
+    elif args.command == 'shadow':
+        registry.start_shadow(args.version)
+    elif args.command == 'stop':
+        registry.stop_traffic(args.version)
+    elif args.command == 'split':
+        registry.set_traffic_split(args.split)
+    registry.list_models()
@@ -1,76 +1,424 @@
 import pandas as pd
 import json
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
 import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet logging is optional
+    pa = None
+    pq = None
+
+# Typed columns of a prediction log record, matching CustomerFeatures
+PREDICTION_LOG_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('customer_id', pa.int64()),
+    ('account_age_days', pa.int32()),
+    ('monthly_charges', pa.float64()),
+    ('total_charges', pa.float64()),
+    ('support_tickets', pa.int32()),
+    ('contract_type', pa.string()),
+    ('payment_method', pa.string()),
+    ('monthly_usage_gb', pa.float64()),
+    ('num_services', pa.int32()),
+    ('prediction', pa.bool_()),
+    ('probability', pa.float64()),
+    ('risk_level', pa.string()),
+    # Registry version that served the prediction (canary or production)
+    ('model_version', pa.int64()),
+]) if pa is not None else None
+
+def _partition_dir(log_path: str, date) -> str:
+    return os.path.join(log_path, f"date={date}")
+
+def _read_jsonl(filename: str, columns: Optional[List[str]]) -> pd.DataFrame:
+    data = []
+    with open(filename, 'r') as f:
+        for line in f:
+            data.append(json.loads(line))
+    df = pd.DataFrame(data)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+def _read_jsonl_from(filename: str, offset: int, columns: Optional[List[str]]):
+    """Complete lines appended to a JSONL file after byte ``offset``, and the offset after them"""
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    # A line still being written is left for the next read
+    end = data.rfind(b'\n') + 1
+    df = pd.DataFrame([json.loads(line) for line in data[:end].splitlines() if line])
+    if columns is not None and len(df):
+        df = df[[c for c in columns if c in df.columns]]
+    return df, offset + end
 
 class PredictionLogger:
     """Log predictions for drift monitoring"""
-    
+
     def __init__(self, log_path: str = 'data/predictions/'):
         self.log_path = log_path
         os.makedirs(log_path, exist_ok=True)
         self.current_date = datetime.now().date()
         self.current_batch = []
-    
-    def log_prediction(self, customer_data: dict, prediction: dict):
-        """Log a single prediction"""
-        log_entry = {
-            'timestamp': datetime.now().isoformat(),
+        # Parquet parts are immutable once written, so each is read only once
+        self._part_cache = {}
+
+    @staticmethod
+    def _make_entry(customer_data, prediction, timestamp: float = None, model_version: int = None) -> dict:
+        """Build a log record; inputs may be dicts or pydantic models"""
+        customer_data = dict(customer_data)
+        prediction = dict(prediction)
+        ts = datetime.fromtimestamp(timestamp) if timestamp is not None else datetime.now()
+        return {
+            'timestamp': ts.isoformat(),
             'customer_id': customer_data['customer_id'],
             **{k: v for k, v in customer_data.items() if k != 'customer_id'},
             'prediction': prediction['churn_prediction'],
             'probability': prediction['churn_probability'],
-            'risk_level': prediction['risk_level']
+            'risk_level': prediction['risk_level'],
+            'model_version': model_version
         }
-        
-        self.current_batch.append(log_entry)
-        
+
+    def _write_entries(self, entries: list):
+        """Append entries to the daily file(s) they belong to"""
+        by_date = {}
+        for entry in entries:
+            by_date.setdefault(entry['timestamp'][:10], []).append(entry)
+
+        for date, day_entries in by_date.items():
+            filename = f"{self.log_path}/predictions_{date}.jsonl"
+            with open(filename, 'a') as f:
+                f.write(''.join(json.dumps(entry) + '\n' for entry in day_entries))
+
+    def log_prediction(self, customer_data: dict, prediction: dict, model_version: int = None):
+        """Log a single prediction"""
+        self.current_batch.append(self._make_entry(customer_data, prediction, model_version=model_version))
+
         # Flush to disk every 100 predictions
         if len(self.current_batch) >= 100:
             self.flush()
-    
+
     def flush(self):
         """Write batch to disk"""
         if not self.current_batch:
             return
-        
-        filename = f"{self.log_path}/predictions_{self.current_date}.jsonl"
-        with open(filename, 'a') as f:
-            for entry in self.current_batch:
-                f.write(json.dumps(entry) + '\n')
-        
+
+        self._write_entries(self.current_batch)
         self.current_batch = []
-    
-    def get_daily_predictions(self, date=None) -> pd.DataFrame:
-        """Load predictions for a specific date"""
+
+    def get_daily_predictions(self, date=None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load predictions for a specific date.
+
+        Reads the JSONL file and/or the Parquet partition for that day.
+        ``columns`` limits the result to the given columns; for Parquet only
+        those columns are read from disk.
+        """
         if date is None:
             date = datetime.now().date()
-        
+
+        frames = []
+        partition = _partition_dir(self.log_path, date)
+        if pq is not None and os.path.isdir(partition):
+            frames.append(self._read_partition(partition, columns))
+
+        filename = f"{self.log_path}/predictions_{date}.jsonl"
+        if os.path.exists(filename):
+            frames.append(_read_jsonl(filename, columns))
+
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def read_new_predictions(self, cursor: dict, date=None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Predictions for ``date`` that weren't returned before with ``cursor``.
+
+        ``cursor`` (a dict, updated in place) records which Parquet parts
+        and how many bytes of the JSONL file have been read. Parts are only
+        published whole and JSONL is only appended to, so every row is
+        returned exactly once, whatever order parts are published in.
+        """
+        if date is None:
+            date = datetime.now().date()
+        read_parts = cursor.setdefault('parts', set())
+
+        frames = []
+        partition = _partition_dir(self.log_path, date)
+        if pq is not None and os.path.isdir(partition):
+            new_parts = sorted(
+                f for f in os.listdir(partition)
+                if f.endswith('.parquet') and not f.startswith('_') and f not in read_parts
+            )
+            tables = [_read_part(os.path.join(partition, part), columns) for part in new_parts]
+            read_parts.update(new_parts)
+            if tables:
+                frames.append(pa.concat_tables(tables).to_pandas())
+
         filename = f"{self.log_path}/predictions_{date}.jsonl"
-        if not os.path.exists(filename):
+        if os.path.exists(filename):
+            df, cursor['jsonl_offset'] = _read_jsonl_from(filename, cursor.get('jsonl_offset', 0), columns)
+            frames.append(df)
+
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def _read_partition(self, partition: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        # Files still being written start with '_' and are skipped
+        parts = sorted(f for f in os.listdir(partition) if f.endswith('.parquet') and not f.startswith('_'))
+        key_columns = tuple(columns) if columns is not None else None
+
+        # Only the most recently read day is kept cached
+        for key in [k for k in self._part_cache if os.path.dirname(k[0]) != partition]:
+            del self._part_cache[key]
+
+        tables = []
+        for part in parts:
+            key = (os.path.join(partition, part), key_columns)
+            if key not in self._part_cache:
+                self._part_cache[key] = _read_part(key[0], columns)
+            tables.append(self._part_cache[key])
+
+        if not tables:
             return pd.DataFrame()
-        
-        data = []
-        with open(filename, 'r') as f:
-            for line in f:
-                data.append(json.loads(line))
-        
-        return pd.DataFrame(data)
-
-# Usage in API - update api/main.py
-from monitoring.collect_predictions import PredictionLogger
-
-prediction_logger = PredictionLogger()
-
-@app.post("/predict", response_model=PredictionResponse)
-@track_prediction_metrics
-async def predict_churn(customer: CustomerFeatures):
-    # ... existing prediction code ...
-    
-    # Log prediction
-    prediction_logger.log_prediction(
-        customer_data=customer.dict(),
-        prediction=result.dict()
-    )
-    
-    return result
\ No newline at end of file
+        return pa.concat_tables(tables).to_pandas()
+
+class AsyncPredictionLogger(PredictionLogger):
+    """PredictionLogger that keeps disk I/O off the request path.
+
+    ``log_prediction`` only appends the raw inputs to a bounded in-memory
+    buffer. A writer thread wakes every ``batch_size`` records or
+    ``flush_interval`` seconds, builds and serializes the records in one
+    go and appends them to the daily file.
+
+    When the buffer is full, ``overflow='drop'`` discards the new record
+    and ``overflow='block'`` makes the caller wait for the writer (so
+    async callers should log from a worker thread).
+
+    ``on_written`` and ``on_dropped`` are called with the number of
+    records written or dropped, e.g. to update metrics.
+    """
+
+    def __init__(
+        self,
+        log_path: str = 'data/predictions/',
+        max_queue: int = 10000,
+        overflow: str = 'drop',
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        on_written: Callable[[int], None] = None,
+        on_dropped: Callable[[int], None] = None
+    ):
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        super().__init__(log_path)
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_written = on_written or (lambda n: None)
+        self.on_dropped = on_dropped or (lambda n: None)
+
+        self.written = 0
+        self.dropped = 0
+        self._buffer = deque()
+        self._enqueued = 0
+        self._processed = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._writer = threading.Thread(target=self._run, name='prediction-logger', daemon=True)
+        self._writer.start()
+
+    def log_prediction(self, customer_data, prediction, model_version: int = None) -> bool:
+        """Queue a prediction for writing; returns False if it was dropped"""
+        return self.log_predictions([(customer_data, prediction, model_version)]) == 1
+
+    def log_predictions(self, records) -> int:
+        """Queue several (customer_data, prediction) pairs under one lock.
+
+        A record may carry the serving model's version as a third item.
+        Returns the number of records accepted.
+        """
+        now = time.time()
+        accepted = 0
+        with self._cond:
+            for customer_data, prediction, *model_version in records:
+                if len(self._buffer) >= self.max_queue:
+                    if self.overflow == 'drop' or self._closed:
+                        self.dropped += 1
+                        self.on_dropped(1)
+                        continue
+                    self._flush_requested = True
+                    self._cond.notify_all()
+                    self._cond.wait_for(lambda: len(self._buffer) < self.max_queue or self._closed)
+                    if self._closed:
+                        self.dropped += 1
+                        self.on_dropped(1)
+                        continue
+                self._buffer.append((now, customer_data, prediction, model_version[0] if model_version else None))
+                self._enqueued += 1
+                accepted += 1
+
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return accepted
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every record queued so far has been written"""
+        with self._cond:
+            target = self._enqueued
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._processed >= target, timeout)
+
+    def close(self, timeout: float = None):
+        """Write out everything still buffered and stop the writer thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join(timeout)
+
+    def _sync(self):
+        """Make everything written so far visible to readers"""
+
+    def _tick(self):
+        """Called by the writer every time it wakes up, even with nothing to write"""
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._buffer) >= self.batch_size or self._closed
+                    or self._flush_requested,
+                    self.flush_interval
+                )
+                records = list(self._buffer)
+                self._buffer.clear()
+                flush_requested = self._flush_requested
+                self._flush_requested = False
+                closed = self._closed
+                # Room freed up for blocked producers
+                self._cond.notify_all()
+
+            if records:
+                try:
+                    self._write_entries([self._make_entry(c, p, ts, v) for ts, c, p, v in records])
+                    self.written += len(records)
+                    self.on_written(len(records))
+                except Exception as e:
+                    self.dropped += len(records)
+                    self.on_dropped(len(records))
+                    print(f"✗ Failed to write {len(records)} predictions: {e}")
+
+            try:
+                if flush_requested or closed:
+                    self._sync()
+                else:
+                    self._tick()
+            except Exception as e:
+                print(f"✗ Failed to finalize prediction log: {e}")
+
+            with self._cond:
+                self._processed += len(records)
+                self._cond.notify_all()
+                if closed and not self._buffer:
+                    return
+
+class ParquetPredictionLogger(AsyncPredictionLogger):
+    """AsyncPredictionLogger that stores predictions as typed Parquet.
+
+    Each writer batch becomes a row group of a part file under
+    ``<log_path>/date=YYYY-MM-DD/``. A part is written as ``_part-*.parquet``
+    and renamed once it is closed: after ``rows_per_file`` rows, once it
+    has been open for ``max_part_seconds``, on ``flush()`` or on
+    ``close()``. Readers only ever see complete files, and a crash loses at
+    most the rows of the open part.
+    """
+
+    def __init__(self, log_path: str = 'data/predictions/', rows_per_file: int = 100000,
+                 max_part_seconds: float = 60.0, **kwargs):
+        if pq is None:
+            raise ImportError("pyarrow is required for Parquet prediction logs")
+        self.rows_per_file = rows_per_file
+        self.max_part_seconds = max_part_seconds
+        self._part = None
+        self._part_seq = 0
+        super().__init__(log_path, **kwargs)
+
+    def _write_entries(self, entries: list):
+        by_date = {}
+        for entry in entries:
+            by_date.setdefault(entry['timestamp'][:10], []).append(entry)
+
+        for date, day_entries in by_date.items():
+            self.write_table(date, entries_to_table(day_entries))
+
+    def write_table(self, date: str, table):
+        """Append an Arrow table as a row group of the open part for ``date``"""
+        if self._part is not None and self._part['date'] != date:
+            self.publish_part()
+
+        if self._part is None:
+            partition = _partition_dir(self.log_path, date)
+            os.makedirs(partition, exist_ok=True)
+            self._part_seq += 1
+            name = f"part-{datetime.now().strftime('%H%M%S%f')}-{os.getpid()}-{self._part_seq:05d}.parquet"
+            tmp_path = os.path.join(partition, f"_{name}")
+            self._part = {
+                'date': date,
+                'tmp_path': tmp_path,
+                'path': os.path.join(partition, name),
+                'writer': pq.ParquetWriter(tmp_path, PREDICTION_LOG_SCHEMA),
+                'rows': 0,
+                'opened': time.monotonic()
+            }
+
+        self._part['writer'].write_table(table)
+        self._part['rows'] += table.num_rows
+        if self._part['rows'] >= self.rows_per_file:
+            self.publish_part()
+
+    def _sync(self):
+        self.publish_part()
+
+    def _tick(self):
+        if self._part is not None and time.monotonic() - self._part['opened'] >= self.max_part_seconds:
+            self.publish_part()
+
+    def publish_part(self):
+        """Close the open part file and publish it under its final name"""
+        if self._part is None:
+            return
+        part, self._part = self._part, None
+        part['writer'].close()
+        os.replace(part['tmp_path'], part['path'])
+
+def _read_part(path: str, columns: Optional[List[str]]):
+    """Read a part file; columns added to the schema after it was written come back null"""
+    available = set(pq.read_schema(path).names)
+    wanted = columns if columns is not None else PREDICTION_LOG_SCHEMA.names
+    table = pq.read_table(path, columns=[c for c in wanted if c in available])
+    for name in wanted:
+        if name not in available and name in PREDICTION_LOG_SCHEMA.names:
+            field = PREDICTION_LOG_SCHEMA.field(name)
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    return table.select([c for c in wanted if c in table.column_names])
+
+def entries_to_table(entries: list):
+    """Convert log records (as built by PredictionLogger) to an Arrow table"""
+    columns = {}
+    for field in PREDICTION_LOG_SCHEMA:
+        values = [entry.get(field.name) for entry in entries]
+        if field.name == 'timestamp':
+            columns[field.name] = pa.array(values, pa.string()).cast(field.type)
+        else:
+            columns[field.name] = pa.array(values, field.type)
+    return pa.table(columns, schema=PREDICTION_LOG_SCHEMA)
@@ -1,42 +1,231 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import ks_2samp
+from scipy.stats import kstwo
 from typing import Dict, List
+import hashlib
 import json
 from datetime import datetime
 import os
+import re
+
+import dataset_cache
+
+class FeatureSketch:
+    """Streaming histogram of one feature over fixed bin edges.
+
+    Bin ``i`` counts values with ``edges[i-1] < x <= edges[i]``; the first
+    and last bins catch values at or below / above the edges, whose sums
+    are kept so tail distances can still be computed exactly.
+    """
+    
+    def __init__(self, edges: np.ndarray):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.below_sum = 0.0
+        self.above_sum = 0.0
+    
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+    
+    def update(self, values) -> 'FeatureSketch':
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        bins = np.searchsorted(self.edges, values, side='left')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.below_sum += float(values[bins == 0].sum())
+        self.above_sum += float(values[bins == len(self.edges)].sum())
+        return self
+    
+    def cdf(self) -> np.ndarray:
+        """Fraction of values at or below each edge"""
+        return np.cumsum(self.counts)[:-1] / max(self.n, 1)
+
+class ReferenceProfile:
+    """Per-feature quantile histograms of the reference (training) data.
+
+    Built once from the reference CSV and persisted as JSON, so drift
+    checks compare small sketches instead of re-reading raw rows.
+    """
+    
+    def __init__(self, features: Dict[str, dict], source: dict = None):
+        self.features = features
+        self.source = source or {}
+        self._ref_sketches = {}
+        for col, f in features.items():
+            sketch = FeatureSketch(f['edges'])
+            sketch.counts = np.asarray(f['counts'], dtype=np.int64)
+            self._ref_sketches[col] = sketch
+    
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, feature_cols: List[str], n_bins: int = 200,
+                       source: dict = None) -> 'ReferenceProfile':
+        features = {}
+        for col in feature_cols:
+            if col not in df.columns:
+                continue
+            values = df[col].dropna().to_numpy(dtype=np.float64)
+            # Discrete features keep every distinct value as an edge
+            edges = np.unique(values)
+            if len(edges) > n_bins:
+                edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)))
+            sketch = FeatureSketch(edges).update(values)
+            features[col] = {'edges': edges.tolist(), 'counts': sketch.counts.tolist()}
+        return cls(features, source)
+    
+    @classmethod
+    def from_csv(cls, path: str, feature_cols: List[str], n_bins: int = 200) -> 'ReferenceProfile':
+        header = pd.read_csv(path, nrows=0).columns
+        df = dataset_cache.read_dataframe(path, columns=[c for c in feature_cols if c in header])
+        return cls.from_dataframe(df, feature_cols, n_bins, source=profile_source(path, feature_cols, n_bins))
+    
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'source': self.source, 'features': self.features}, f)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ReferenceProfile':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(data['features'], data.get('source'))
+    
+    def new_sketches(self) -> Dict[str, FeatureSketch]:
+        """Empty sketches of current traffic, binned like the reference"""
+        return {col: FeatureSketch(f['edges']) for col, f in self.features.items()}
+    
+    def compare(self, col: str, current: FeatureSketch) -> Dict:
+        """KS, PSI and Wasserstein distance between reference and current"""
+        reference = self._ref_sketches[col]
+        n_ref, n_cur = reference.n, current.n
+        ref_cdf, cur_cdf = reference.cdf(), current.cdf()
+        
+        # KS: largest CDF gap, evaluated at every bin edge
+        statistic = float(np.max(np.abs(ref_cdf - cur_cdf), initial=0.0))
+        en = n_ref * n_cur / (n_ref + n_cur)
+        p_value = float(kstwo.sf(statistic, max(int(round(en)), 1)))
+        
+        # PSI over ten reference-quantile groups of the fine bins
+        group = np.minimum((np.concatenate([[0.0], ref_cdf]) * 10).astype(int), 9)
+        ref_frac = np.clip(np.bincount(group, weights=reference.counts, minlength=10) / n_ref, 1e-4, None)
+        cur_frac = np.clip(np.bincount(group, weights=current.counts, minlength=10) / n_cur, 1e-4, None)
+        psi = float(np.sum((cur_frac - ref_frac) * np.log(cur_frac / ref_frac)))
+        
+        # Wasserstein-1: area between the CDFs, plus current mass outside
+        # the reference range (where the reference CDF is 0 or 1)
+        edges = reference.edges
+        inner = np.sum(np.abs(ref_cdf[:-1] - cur_cdf[:-1]) * np.diff(edges))
+        below = (current.counts[0] * edges[0] - current.below_sum) / n_cur
+        above = (current.above_sum - current.counts[-1] * edges[-1]) / n_cur
+        
+        return {
+            'ks_statistic': statistic,
+            'p_value': p_value,
+            'psi': psi,
+            'wasserstein': float(inner + below + above)
+        }
+
+# A persisted profile is named {reference name}.{16 hex digits of its source}.profile.json
+_PROFILE = re.compile(r'(?P<name>.+)\.[0-9a-f]{16}\.profile\.json')
+
+def profile_source(reference_data_path: str, feature_cols: List[str], n_bins: int) -> dict:
+    """What a reference profile is built from; a saved profile is reused only if this matches"""
+    return {
+        'sha256': dataset_cache.source_hash(reference_data_path),
+        'feature_cols': list(feature_cols),
+        'n_bins': n_bins
+    }
+
+def default_profile_path(reference_data_path: str, source: dict):
+    """Where the profile built from ``source`` is kept in the dataset cache, or None if caching is off"""
+    if not dataset_cache.CACHE_DIR:
+        return None
+    name = os.path.splitext(os.path.basename(reference_data_path))[0]
+    key = hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(dataset_cache.CACHE_DIR, f'{name}.{key}.profile.json')
 
 class DriftDetector:
-    """Detect data drift using statistical tests"""
+    """Detect data drift using statistical tests.
+    
+    The reference data is reduced to a persisted :class:`ReferenceProfile`
+    (rebuilt only when the reference file changes). Current traffic is
+    kept in streaming sketches that :meth:`update` extends incrementally,
+    so a drift check costs O(sketch size) rather than O(rows).
+    """
+    
+    feature_cols = [
+        'account_age_days', 'monthly_charges', 'total_charges',
+        'support_tickets', 'monthly_usage_gb', 'num_services'
+    ]
     
-    def __init__(self, reference_data_path: str, threshold: float = 0.05):
+    def __init__(self, reference_data_path: str, threshold: float = 0.05,
+                 profile_path: str = None, n_bins: int = 200):
         self.threshold = threshold
-        self.reference_data = pd.read_csv(reference_data_path)
-        self.feature_cols = [
-            'account_age_days', 'monthly_charges', 'total_charges',
-            'support_tickets', 'monthly_usage_gb', 'num_services'
-        ]
+        self.profile_path = profile_path
+        self.profile = self._load_profile(reference_data_path, n_bins)
+        self.current = self.profile.new_sketches()
         self.drift_history = []
     
-    def calculate_drift(self, current_data: pd.DataFrame) -> Dict:
-        """Calculate drift score using Kolmogorov-Smirnov test"""
-        drift_scores = {}
+    def _load_profile(self, reference_data_path: str, n_bins: int) -> ReferenceProfile:
+        source = profile_source(reference_data_path, self.feature_cols, n_bins)
+        cached = self.profile_path is None
+        if cached:
+            self.profile_path = default_profile_path(reference_data_path, source)
         
-        for col in self.feature_cols:
+        if self.profile_path is not None and os.path.exists(self.profile_path):
+            profile = ReferenceProfile.load(self.profile_path)
+            if profile.source == source:
+                if cached:
+                    os.utime(self.profile_path)
+                return profile
+        
+        profile = ReferenceProfile.from_csv(reference_data_path, self.feature_cols, n_bins)
+        if self.profile_path is not None:
+            profile.save(self.profile_path)
+            if cached:
+                dataset_cache.evict(pattern=_PROFILE)
+        return profile
+    
+    def update(self, current_data: pd.DataFrame):
+        """Add newly observed rows to the current-traffic sketches"""
+        for col, sketch in self.current.items():
             if col in current_data.columns:
-                # KS test
-                statistic, p_value = ks_2samp(
-                    self.reference_data[col].dropna(),
-                    current_data[col].dropna()
-                )
-                drift_scores[col] = {
-                    'ks_statistic': float(statistic),
-                    'p_value': float(p_value),
-                    'drift_detected': p_value < self.threshold
-                }
+                sketch.update(current_data[col].to_numpy(dtype=np.float64, na_value=np.nan))
+    
+    def reset(self):
+        """Start a new current-traffic window"""
+        self.current = self.profile.new_sketches()
+    
+    def calculate_drift(self, current_data: pd.DataFrame = None) -> Dict:
+        """Calculate drift scores (KS, PSI, Wasserstein) against the reference.
+        
+        Without ``current_data`` the incrementally updated sketches are used.
+        """
+        if current_data is None:
+            sketches = self.current
+        else:
+            sketches = {}
+            for col, sketch in self.profile.new_sketches().items():
+                if col in current_data.columns:
+                    sketches[col] = sketch.update(
+                        current_data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                    )
+        
+        drift_scores = {}
+        n_samples = 0
+        for col in self.feature_cols:
+            sketch = sketches.get(col)
+            if sketch is None or sketch.n == 0:
+                continue
+            scores = self.profile.compare(col, sketch)
+            scores['drift_detected'] = scores['p_value'] < self.threshold
+            drift_scores[col] = scores
+            n_samples = max(n_samples, sketch.n)
         
         # Overall drift score (average of KS statistics)
-        overall_drift = np.mean([s['ks_statistic'] for s in drift_scores.values()])
+        overall_drift = np.mean([s['ks_statistic'] for s in drift_scores.values()]) if drift_scores else 0.0
         
         # Count drifted features
         drifted_features = [col for col, s in drift_scores.items() if s['drift_detected']]
@@ -48,7 +237,7 @@ class DriftDetector:
             'features': drift_scores,
             'drifted_features': drifted_features,
             'drift_detected': len(drifted_features) > 0,
-            'n_samples': len(current_data)
+            'n_samples': len(current_data) if current_data is not None else n_samples
         }
         
         self.drift_history.append(result)
@@ -67,6 +256,39 @@ class DriftDetector:
             return self.drift_history[-1]['overall_drift_score']
         return 0.0
 
+class DailyTrafficWindow:
+    """Today's logged predictions, folded into a detector's sketches as they arrive.
+
+    Each :meth:`refresh` reads only the predictions logged since the last
+    one (see ``PredictionLogger.read_new_predictions``), so a check costs
+    O(new rows) rather than O(rows logged today). The window restarts
+    each day.
+    """
+    
+    def __init__(self, detector: DriftDetector, prediction_logger):
+        self.detector = detector
+        self.prediction_logger = prediction_logger
+        self.date = None
+        self.cursor = {}
+        self.rows = 0
+    
+    def refresh(self) -> int:
+        """Add newly logged predictions to the sketches; returns today's row count"""
+        today = datetime.now().date()
+        if today != self.date:
+            self.detector.reset()
+            self.date = today
+            self.cursor = {}
+            self.rows = 0
+        
+        new_data = self.prediction_logger.read_new_predictions(
+            self.cursor, today, columns=self.detector.feature_cols
+        )
+        if len(new_data):
+            self.detector.update(new_data)
+            self.rows += len(new_data)
+        return self.rows
+
 # Standalone drift detection script
 if __name__ == "__main__":
     import argparse
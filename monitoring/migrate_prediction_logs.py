@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Convert JSONL prediction logs into date-partitioned Parquet"""
+
+import argparse
+import glob
+import json
+import os
+from monitoring.collect_predictions import ParquetPredictionLogger, entries_to_table
+
+def migrate_file(logger: ParquetPredictionLogger, filename: str, chunk_size: int = 100000) -> int:
+    """Write one predictions_YYYY-MM-DD.jsonl file into its Parquet partition"""
+    date = os.path.basename(filename)[len('predictions_'):-len('.jsonl')]
+    n_rows = 0
+    chunk = []
+    with open(filename, 'r') as f:
+        for line in f:
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                logger.write_table(date, entries_to_table(chunk))
+                n_rows += len(chunk)
+                chunk = []
+    if chunk:
+        logger.write_table(date, entries_to_table(chunk))
+        n_rows += len(chunk)
+    logger.publish_part()
+    return n_rows
+
+def migrate(source: str, dest: str = None, delete: bool = False, chunk_size: int = 100000):
+    """Migrate every JSONL log in ``source`` to Parquet under ``dest``.
+
+    Migrated files are renamed to ``*.jsonl.migrated`` (or deleted) so the
+    same predictions are not read twice.
+    """
+    dest = dest or source
+    files = sorted(glob.glob(os.path.join(source, 'predictions_*.jsonl')))
+    if not files:
+        print(f"No JSONL prediction logs found in {source}")
+        return {}
+
+    # The writer thread is not used; batches are written directly
+    logger = ParquetPredictionLogger(dest)
+    logger.close()
+
+    migrated = {}
+    for filename in files:
+        n_rows = migrate_file(logger, filename, chunk_size)
+        migrated[filename] = n_rows
+        print(f"✓ {os.path.basename(filename)}: {n_rows} rows")
+        if delete:
+            os.remove(filename)
+        else:
+            os.replace(filename, filename + '.migrated')
+    return migrated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', default='data/predictions/')
+    parser.add_argument('--dest', default=None, help='Defaults to the source directory')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--delete', action='store_true', help='Remove JSONL files after migrating instead of renaming them')
+    args = parser.parse_args()
+
+    migrate(args.source, args.dest, args.delete, args.chunk_size)
@@ -3,7 +3,7 @@
 
 import time
 from datetime import datetime
-from monitoring.drift_detector import DriftDetector
+from monitoring.drift_detector import DailyTrafficWindow, DriftDetector
 from monitoring.collect_predictions import PredictionLogger
 from monitoring.alerts import AlertManager
 from api.metrics import data_drift_score
@@ -17,20 +17,20 @@ class ModelMonitor:
         self.prediction_logger = PredictionLogger()
         self.alert_manager = AlertManager()
         self.baseline_f1 = 0.75  # Set from training
+        self.traffic = DailyTrafficWindow(self.drift_detector, self.prediction_logger)
     
     def run_drift_check(self):
         """Check for data drift"""
         print(f"[{datetime.now()}] Running drift detection...")
         
-        # Get recent predictions
-        recent_data = self.prediction_logger.get_daily_predictions()
-        
-        if len(recent_data) < 100:
-            print(f"  Insufficient data ({len(recent_data)} samples)")
+        # Only predictions logged since the last check are read
+        rows = self.traffic.refresh()
+        if rows < 100:
+            print(f"  Insufficient data ({rows} samples)")
             return
         
         # Calculate drift
-        result = self.drift_detector.calculate_drift(recent_data)
+        result = self.drift_detector.calculate_drift()
         
         # Update Prometheus metric
         data_drift_score.set(result['overall_drift_score'])
@@ -53,7 +53,9 @@ class ModelMonitor:
         
         # This would compare predictions with actual outcomes
         # For now, simulate
-        recent_data = self.prediction_logger.get_daily_predictions()
+        recent_data = self.prediction_logger.get_daily_predictions(
+            columns=['customer_id', 'prediction', 'probability']
+        )
         
         if len(recent_data) < 100:
             print(f"  Insufficient data")
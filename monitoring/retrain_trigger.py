@@ -4,23 +4,52 @@ from datetime import datetime, timedelta
 import pandas as pd
 import subprocess
 import os
-from monitoring.drift_detector import DriftDetector
+from monitoring.drift_detector import DailyTrafficWindow, DriftDetector
 from monitoring.collect_predictions import PredictionLogger
+from api.model_loader import find_model_path
+from features import FeaturePipeline
+from model_registry import ModelRegistry
 
 class RetrainTrigger:
-    """Automated model retraining trigger"""
+    """Automated model retraining trigger.
+    
+    ``mode='full'`` reruns the training pipeline on the original data.
+    ``mode='incremental'`` instead adds trees to the serving model, fitted
+    on the last ``window_days`` of logged predictions joined with their
+    observed outcomes (``outcomes_path``: CSV of customer_id, churned), and
+    registers the result as a staging model. It falls back to a full
+    retrain when there is not enough labelled data.
+    """
     
     def __init__(
         self,
         drift_threshold: float = 0.15,
         min_days_between_retrains: int = 7,
-        min_new_samples: int = 1000
+        min_new_samples: int = 1000,
+        mode: str = 'full',
+        window_days: int = 30,
+        outcomes_path: str = 'data/outcomes.csv',
+        n_new_trees: int = 20,
+        min_labelled_samples: int = 500,
+        models_dir: str = 'models',
+        registry_path: str = 'models/registry.json'
     ):
+        if mode not in ('full', 'incremental'):
+            raise ValueError(f"Unknown retrain mode: {mode}")
         self.drift_threshold = drift_threshold
         self.min_days_between_retrains = min_days_between_retrains
         self.min_new_samples = min_new_samples
+        self.mode = mode
+        self.window_days = window_days
+        self.outcomes_path = outcomes_path
+        self.n_new_trees = n_new_trees
+        self.min_labelled_samples = min_labelled_samples
+        self.models_dir = models_dir
+        self.registry_path = registry_path
         self.last_retrain_date = None
         self.prediction_logger = PredictionLogger()
+        self.drift_detector = None
+        self.traffic = None
     
     def should_retrain(self) -> tuple[bool, str]:
         """Determine if model should be retrained"""
@@ -31,20 +60,85 @@ class RetrainTrigger:
             if days_since_retrain < self.min_days_between_retrains:
                 return False, f"Last retrain was {days_since_retrain} days ago (min: {self.min_days_between_retrains})"
         
+        # The reference profile is built once and reused across checks, and
+        # only predictions logged since the last check are read
+        if self.drift_detector is None:
+            self.drift_detector = DriftDetector('data/raw/customer_data.csv', threshold=0.05)
+        if self.traffic is None:
+            self.traffic = DailyTrafficWindow(self.drift_detector, self.prediction_logger)
+        
         # Check 2: Sufficient new data
-        recent_data = self.prediction_logger.get_daily_predictions()
-        if len(recent_data) < self.min_new_samples:
-            return False, f"Only {len(recent_data)} new samples (min: {self.min_new_samples})"
+        rows = self.traffic.refresh()
+        if rows < self.min_new_samples:
+            return False, f"Only {rows} new samples (min: {self.min_new_samples})"
         
         # Check 3: Data drift
-        detector = DriftDetector('data/raw/customer_data.csv', threshold=0.05)
-        drift_result = detector.calculate_drift(recent_data)
+        drift_result = self.drift_detector.calculate_drift()
         
         if drift_result['overall_drift_score'] > self.drift_threshold:
             return True, f"Data drift detected: {drift_result['overall_drift_score']:.4f} > {self.drift_threshold}"
         
         return False, f"No drift detected: {drift_result['overall_drift_score']:.4f}"
     
+    def load_labelled_window(self) -> pd.DataFrame:
+        """Logged predictions from the last ``window_days`` days with outcomes"""
+        if not os.path.exists(self.outcomes_path):
+            return pd.DataFrame()
+        
+        columns = ['customer_id'] + DriftDetector.feature_cols + ['contract_type', 'payment_method']
+        today = datetime.now().date()
+        frames = [
+            self.prediction_logger.get_daily_predictions(today - timedelta(days=d), columns=columns)
+            for d in reversed(range(self.window_days))
+        ]
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame()
+        
+        # Latest features per customer, labelled with the observed outcome
+        predictions = pd.concat(frames, ignore_index=True).drop_duplicates('customer_id', keep='last')
+        outcomes = pd.read_csv(self.outcomes_path, usecols=['customer_id', 'churned'])
+        outcomes = outcomes.drop_duplicates('customer_id', keep='last')
+        return predictions.merge(outcomes, on='customer_id', how='inner')
+    
+    def incremental_retrain(self):
+        """Warm-start the serving model on recent labelled data.
+        
+        Returns the registered version, or None if there was not enough
+        labelled data (or no model) to build on.
+        """
+        from train_pipeline import warm_start_train
+        
+        base_path, base_version = find_model_path(self.models_dir, self.registry_path)
+        if base_path is None:
+            print("  No trained model to extend")
+            return None
+        
+        data = self.load_labelled_window()
+        if len(data) < self.min_labelled_samples or data['churned'].nunique() < 2:
+            print(f"  Only {len(data)} labelled samples (min: {self.min_labelled_samples})")
+            return None
+        
+        # Build features exactly as the base model was trained with
+        features = FeaturePipeline.for_model(base_path)
+        X, known, _ = features.transform(data)
+        X = pd.DataFrame(X[known], columns=features.feature_names)
+        y = data.loc[known, 'churned'].astype(int).to_numpy()
+        
+        _, metrics, model_path = warm_start_train(
+            base_path, X, y, n_new_trees=self.n_new_trees, models_dir=self.models_dir, features=features
+        )
+        return ModelRegistry(self.registry_path).register_model(
+            model_path, metrics,
+            metadata={
+                'n_samples': len(y),
+                'mode': 'incremental',
+                'base_path': base_path,
+                'base_version': base_version,
+                'window_days': self.window_days
+            }
+        )
+    
     def trigger_retrain(self):
         """Execute retraining pipeline"""
         print(f"\n{'='*60}")
@@ -57,8 +151,15 @@ class RetrainTrigger:
         if should_retrain:
             print("\nStarting retraining pipeline...")
             try:
+                version = None
+                if self.mode == 'incremental':
+                    version = self.incremental_retrain()
+                    if version is None:
+                        print("  Falling back to full retrain")
+                
                 # Run training pipeline
-                subprocess.run(['python', 'train_pipeline.py'], check=True)
+                if version is None:
+                    subprocess.run(['python', 'train_pipeline.py', '--register'], check=True)
                 
                 # Update last retrain date
                 self.last_retrain_date = datetime.now().date()
@@ -101,10 +202,19 @@ class RetrainTrigger:
             time.sleep(60)
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['full', 'incremental'], default='full')
+    parser.add_argument('--outcomes', default='data/outcomes.csv')
+    args = parser.parse_args()
+    
     trigger = RetrainTrigger(
         drift_threshold=0.15,
         min_days_between_retrains=7,
-        min_new_samples=1000
+        min_new_samples=1000,
+        mode=args.mode,
+        outcomes_path=args.outcomes
     )
     
     # Run immediate check
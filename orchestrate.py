@@ -1,18 +1,83 @@
+import time
+from datetime import timedelta
+
 from prefect import flow, task
-import subprocess
+
+import dataset_cache
+import train_pipeline
+from validate_data import EXPECTATIONS_PATH, validate_csv
+
+DATA_PATH = 'data/raw/customer_data.csv'
+
+# Bump when what a cached task returns changes, so old results aren't reused
+CACHE_VERSION = 2
+
+def data_cache_key(context, parameters) -> str:
+    """Cache on the task and the content of its input files, not on the DataFrame"""
+    key = f"{context.task.name}-v{CACHE_VERSION}-{parameters['data_hash']}"
+    # Validation results also depend on the expectation suite
+    if 'expectations_hash' in parameters:
+        key += f"-{parameters['expectations_hash']}"
+    return key
+
+CACHED = dict(cache_key_fn=data_cache_key, cache_expiration=timedelta(days=7), persist_result=True)
+
+@task(**CACHED)
+def validate_data(data_path: str, data_hash: str, expectations_hash: str) -> dict:
+    result = validate_csv(data_path)
+    if not result['success']:
+        failed = [r['expectation_config']['expectation_type'] for r in result['results'] if not r['success']]
+        raise ValueError(f"Data validation failed: {', '.join(failed)}")
+    print("✓ Data validation passed")
+    return result
+
+@task(**CACHED)
+def preprocess_data(data_path: str, data_hash: str):
+    return train_pipeline.preprocess(dataset_cache.read_dataframe(data_path))
 
 @task
-def validate_data():
-    subprocess.run(['python', 'validate_data.py'], check=True)
-    
-@task
-def train_model():
-    subprocess.run(['python', 'train_pipeline.py'], check=True)
-    
+def train_model(splits, features, tune_trials: int = 0, register: bool = False) -> dict:
+    X_train, X_test, y_train, y_test = splits
+    train_pipeline.save_features(features)
+    _, metrics = train_pipeline.train_model(
+        X_train, y_train, X_test, y_test, tune_trials=tune_trials, register=register, features=features
+    )
+    return metrics
+
+def _timed(task_fn, timings: dict, *args, **kwargs):
+    """Run a task in the flow, recording its wall time and whether it was cached"""
+    start = time.perf_counter()
+    state = task_fn(*args, return_state=True, **kwargs)
+    timings[task_fn.name] = {
+        'seconds': time.perf_counter() - start,
+        'cached': state.name == 'Cached'
+    }
+    return state.result()
+
 @flow
-def ml_pipeline():
-    validate_data()
-    train_model()
+def ml_pipeline(data_path: str = DATA_PATH, tune_trials: int = 0, register: bool = False):
+    """Validate, preprocess and train in one process.
+
+    Tasks are passed the data file's path and content hash and read it
+    through the dataset cache, so the raw data is never stored as a task
+    result. Validation and preprocessing are cached on the hash (validation
+    also on the expectation suite), so an unchanged file skips straight to
+    training.
+    """
+    timings = {}
+    start = time.perf_counter()
+    data_hash = dataset_cache.source_hash(data_path)
+    expectations_hash = dataset_cache.file_hash(EXPECTATIONS_PATH)
+    timings['hash_data'] = {'seconds': time.perf_counter() - start, 'cached': False}
+
+    _timed(validate_data, timings, data_path, data_hash, expectations_hash)
+    splits, features = _timed(preprocess_data, timings, data_path, data_hash)
+    metrics = _timed(train_model, timings, splits, features, tune_trials, register)
+
+    print("\n=== Task timings ===")
+    for name, t in timings.items():
+        print(f"{name:<18}{t['seconds']:>10.2f}s{'  (cached)' if t['cached'] else ''}")
+    return metrics
 
 if __name__ == "__main__":
     ml_pipeline()
@@ -0,0 +1,232 @@
+"""In-process benchmarks of the serving, logging, monitoring and training hot paths.
+
+Runs everything in this process (the API through FastAPI's TestClient), so
+no server is needed. Results are written as JSON and can be compared with
+a stored baseline; the run fails when a benchmark's median got slower by
+more than the tolerance.
+
+Timings are only compared with a baseline recorded on the same kind of
+machine (same ``machine`` and ``cpus`` in its ``meta``); otherwise the
+check is skipped. The committed tests/benchmark_baseline.json was recorded
+on a single-CPU x86_64 machine, so other hardware needs its own baseline
+(``--save-baseline``) before it can gate regressions.
+
+    python tests/benchmark_suite.py --output results.json
+    python tests/benchmark_suite.py --baseline tests/benchmark_baseline.json
+    python tests/benchmark_suite.py --save-baseline tests/benchmark_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+BATCH_SIZES = [1, 10, 100, 1000]
+DRIFT_SIZES = [1_000, 10_000, 100_000]
+TRAIN_SIZES = [5_000, 20_000, 50_000]
+QUICK_DRIFT_SIZES = [1_000, 10_000]
+QUICK_TRAIN_SIZES = [5_000]
+
+CUSTOMER_FIELDS = ['customer_id', 'account_age_days', 'monthly_charges', 'total_charges', 'support_tickets',
+                   'contract_type', 'payment_method', 'monthly_usage_gb', 'num_services']
+
+def measure(fn, repeat: int = 20, warmup: int = 2, rows: int = 1) -> dict:
+    """Time ``fn`` ``repeat`` times after ``warmup`` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {
+        'repeat': repeat,
+        'median_ms': median * 1000,
+        'p95_ms': (statistics.quantiles(times, n=20)[18] if repeat >= 20 else max(times)) * 1000,
+        'min_ms': min(times) * 1000,
+        'rows_per_sec': rows / median if median else None,
+    }
+
+def _make_data(workdir: str, n: int) -> pd.DataFrame:
+    from generate_data import generate_data
+    return generate_data(n, os.path.join(workdir, f'customers_{n}.csv'))
+
+def _train(df: pd.DataFrame):
+    """Preprocess and fit the forest the way train_pipeline does, without MLflow or saving"""
+    from sklearn.ensemble import RandomForestClassifier
+    import train_pipeline
+
+    (X_train, X_test, y_train, y_test), features = train_pipeline.preprocess(df)
+    model = RandomForestClassifier(**train_pipeline.MODEL_PARAMS, n_jobs=-1)
+    model.fit(X_train, y_train)
+    return model, features
+
+def bench_api(results: dict, workdir: str, reference: pd.DataFrame, repeat: int):
+    from fastapi.testclient import TestClient
+    import api.main as main
+    from api.model_loader import LoadedModel
+
+    model, features = _train(reference)
+    customers = reference[CUSTOMER_FIELDS].head(max(BATCH_SIZES)).to_dict('records')
+
+    # Serve the model trained above, not whatever is in models/
+    main.MODEL_RELOAD_INTERVAL = 0
+    main.PREDICTION_LOG_DIR = ''
+    with TestClient(main.app) as client:
+        main._swap_model(LoadedModel(model, features.contract_table, features.payment_table,
+                                     os.path.join(workdir, 'model.pkl'), features=features))
+
+        def predict():
+            assert client.post('/predict', json=customers[0]).status_code == 200
+        results['predict_single'] = measure(predict, repeat=repeat * 5)
+
+        for size in BATCH_SIZES:
+            body = {'customers': customers[:size]}
+            def predict_batch():
+                assert client.post('/predict/batch', json=body).status_code == 200
+            results[f'predict_batch_{size}'] = measure(predict_batch, repeat=repeat, rows=size)
+
+    columns = {name: reference[name].to_numpy() for name in CUSTOMER_FIELDS[1:]}
+    results['feature_pipeline'] = measure(lambda: features.transform(columns), repeat=repeat, rows=len(reference))
+
+def bench_prediction_logger(results: dict, workdir: str, reference: pd.DataFrame, repeat: int):
+    from monitoring.collect_predictions import PredictionLogger
+
+    customers = reference[CUSTOMER_FIELDS].head(1000).to_dict('records')
+    prediction = {'churn_prediction': True, 'churn_probability': 0.73, 'risk_level': 'high'}
+    log_dir = os.path.join(workdir, 'predictions')
+
+    def log():
+        logger = PredictionLogger(log_dir)
+        for customer in customers:
+            logger.log_prediction(customer, prediction)
+        logger.flush()
+    results['prediction_logger_1000'] = measure(log, repeat=repeat, rows=len(customers))
+    shutil.rmtree(log_dir, ignore_errors=True)
+
+def bench_drift(results: dict, workdir: str, reference: pd.DataFrame, sizes: list, repeat: int):
+    from monitoring.drift_detector import DriftDetector
+
+    reference_path = os.path.join(workdir, 'reference.csv')
+    reference.to_csv(reference_path, index=False)
+    detector = DriftDetector(reference_path, profile_path=os.path.join(workdir, 'reference.profile.json'))
+
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        current = reference.sample(size, replace=True, random_state=int(rng.integers(1 << 31)))
+        results[f'drift_{size}'] = measure(
+            lambda: detector.calculate_drift(current), repeat=max(3, repeat // 4), warmup=1, rows=size
+        )
+
+def bench_training(results: dict, workdir: str, sizes: list):
+    for size in sizes:
+        df = _make_data(workdir, size)
+        results[f'train_{size}'] = measure(lambda: _train(df), repeat=1, warmup=0, rows=size)
+
+def run_suite(quick: bool = False, repeat: int = 20) -> dict:
+    import dataset_cache
+
+    workdir = tempfile.mkdtemp(prefix='churn-bench-')
+    results = {}
+    # Keep the benchmark's cached CSVs out of the repo's cache
+    cache_dir = dataset_cache.CACHE_DIR
+    dataset_cache.CACHE_DIR = os.path.join(workdir, 'cache')
+    try:
+        reference = _make_data(workdir, 20_000)
+        bench_api(results, workdir, reference, repeat)
+        bench_prediction_logger(results, workdir, reference, repeat)
+        bench_drift(results, workdir, reference, QUICK_DRIFT_SIZES if quick else DRIFT_SIZES, repeat)
+        bench_training(results, workdir, QUICK_TRAIN_SIZES if quick else TRAIN_SIZES)
+    finally:
+        dataset_cache.CACHE_DIR = cache_dir
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+# Results from machines differing in any of these aren't comparable
+HARDWARE_KEYS = ['machine', 'cpus']
+
+def comparable(current: dict, baseline: dict) -> bool:
+    """Whether both results were recorded on the same kind of machine"""
+    return all(current.get('meta', {}).get(k) == baseline.get('meta', {}).get(k) for k in HARDWARE_KEYS)
+
+def _hardware(report: dict) -> str:
+    return ', '.join(f"{k}={report.get('meta', {}).get(k)}" for k in HARDWARE_KEYS)
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """Benchmarks whose median is more than ``tolerance`` slower than the baseline.
+
+    Nothing is reported when the baseline was recorded on other hardware.
+    """
+    if not comparable(current, baseline):
+        return []
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['median_ms'] / base['median_ms']
+        if ratio > 1 + tolerance:
+            regressions.append({
+                'name': name,
+                'baseline_ms': base['median_ms'],
+                'current_ms': result['median_ms'],
+                'ratio': ratio,
+            })
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Fail when slower than these results')
+    parser.add_argument('--save-baseline', help='Write results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--quick', action='store_true', help='Skip the largest drift and training sizes')
+    args = parser.parse_args()
+
+    report = run_suite(quick=args.quick, repeat=args.repeat)
+
+    print("\n=== Benchmark Results ===")
+    print(f"{'benchmark':<24}{'median ms':>12}{'p95 ms':>12}{'rows/s':>14}")
+    for name, r in report['results'].items():
+        print(f"{name:<24}{r['median_ms']:>12.2f}{r['p95_ms']:>12.2f}{r['rows_per_sec']:>14,.0f}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not comparable(report, baseline):
+            print(f"⚠ Baseline recorded on other hardware ({_hardware(baseline)}; this machine: "
+                  f"{_hardware(report)}), not comparing")
+            exit(0)
+        regressions = compare(report, baseline, args.tolerance)
+        for r in regressions:
+            print(f"✗ {r['name']}: {r['current_ms']:.2f}ms vs {r['baseline_ms']:.2f}ms baseline ({r['ratio']:.2f}x)")
+        if regressions:
+            exit(1)
+        print(f"✓ No regressions beyond {args.tolerance:.0%}")
@@ -0,0 +1,122 @@
+"""Startup time and memory per API worker for each model artifact format.
+
+Starts N worker processes per format, each loading the model the way the
+API would and scoring one batch, and keeps them alive together so that
+proportional set size (PSS) shows how much memory is really shared.
+
+    python tests/model_load_benchmark.py --model models/churn_model_XXX.pkl --workers 8
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+FORMATS = ['pickle', 'compiled', 'mmap']
+
+def _memory_kb():
+    """Resident and proportional set size of this process, in kB"""
+    memory = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                memory['rss_kb'] = int(line.split()[1])
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+    except FileNotFoundError:
+        memory['pss_kb'] = None
+    return memory
+
+def run_worker(fmt: str, model_path: str):
+    """Load the model in this process and report timings on stdout"""
+    import numpy as np
+    baseline = _memory_kb()
+
+    start = time.perf_counter()
+    if fmt == 'pickle':
+        import joblib
+        model = joblib.load(model_path)
+    else:
+        from compiled_model import CompiledForest, compiled_path_for
+        model = CompiledForest.load(
+            compiled_path_for(model_path),
+            mmap_mode='r' if fmt == 'mmap' else None
+        )
+    load_seconds = time.perf_counter() - start
+
+    # Touch every tree, as serving traffic would
+    start = time.perf_counter()
+    model.predict_proba(np.random.default_rng(0).random((256, model.n_features_in_)))
+    first_batch_seconds = time.perf_counter() - start
+
+    memory = _memory_kb()
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'first_batch_seconds': first_batch_seconds,
+        'rss_kb': memory['rss_kb'],
+        'model_rss_kb': memory['rss_kb'] - baseline['rss_kb'],
+        'pss_kb': memory['pss_kb'],
+    }), flush=True)
+
+    # Stay alive until the parent has measured every worker
+    sys.stdin.read()
+
+def run_benchmark(model_path: str, n_workers: int = 8):
+    """Start ``n_workers`` processes per format and summarize them"""
+    from compiled_model import CompiledForest, compiled_path_for
+
+    compiled_path = compiled_path_for(model_path)
+    if not os.path.isdir(compiled_path):
+        import joblib
+        CompiledForest.from_sklearn(joblib.load(model_path)).save(compiled_path)
+
+    results = {}
+    for fmt in FORMATS:
+        workers = [
+            subprocess.Popen(
+                [sys.executable, __file__, '--worker', fmt, '--model', model_path],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+            )
+            for _ in range(n_workers)
+        ]
+        reports = [json.loads(w.stdout.readline()) for w in workers]
+        for w in workers:
+            w.stdin.close()
+            w.wait()
+
+        pss = [r['pss_kb'] for r in reports if r['pss_kb'] is not None]
+        results[fmt] = {
+            'workers': n_workers,
+            'mean_load_ms': statistics.mean(r['load_seconds'] for r in reports) * 1000,
+            'mean_first_batch_ms': statistics.mean(r['first_batch_seconds'] for r in reports) * 1000,
+            'mean_model_rss_mb': statistics.mean(r['model_rss_kb'] for r in reports) / 1024,
+            'total_pss_mb': sum(pss) / 1024 if pss else None,
+        }
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', required=True, help='Path to a churn_model_*.pkl')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--worker', choices=FORMATS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.model)
+        sys.exit(0)
+
+    results = run_benchmark(args.model, args.workers)
+
+    print(f"\n=== Model Load Benchmark ({args.workers} workers) ===")
+    print(f"{'format':<10}{'load ms':>10}{'1st batch ms':>14}{'model RSS MB':>14}{'total PSS MB':>14}")
+    for fmt, r in results.items():
+        total_pss = f"{r['total_pss_mb']:.1f}" if r['total_pss_mb'] is not None else 'n/a'
+        print(f"{fmt:<10}{r['mean_load_ms']:>10.1f}{r['mean_first_batch_ms']:>14.1f}"
+              f"{r['mean_model_rss_mb']:>14.1f}{total_pss:>14}")
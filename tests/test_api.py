@@ -8,6 +8,18 @@ import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 import numpy as np
+import asyncio
+from api.batching import MicroBatcher
+from api.executor import InferenceExecutor, QueueFullError
+import api.main as main
+from api.model_loader import LoadedModel, RegistryWatcher
+from model_registry import ModelRegistry
+from sklearn.dummy import DummyClassifier
+import shutil
+import pytest
+import time
+import json
+import msgpack
 
 # Setup test client
 client = TestClient(app)
@@ -31,6 +43,12 @@ def setup_module():
     le_payment = LabelEncoder()
     le_payment.fit(['Credit Card', 'Bank Transfer', 'Electronic Check'])
     joblib.dump(le_payment, 'models/payment_encoder.pkl')
+    
+    # Run the startup handlers so the model above is loaded
+    client.__enter__()
+
+def teardown_module():
+    client.__exit__(None, None, None)
 
 def test_root_endpoint():
     response = client.get("/")
@@ -82,6 +100,25 @@ def test_predict_invalid_data():
     response = client.post("/predict", json=payload)
     assert response.status_code == 422  # Validation error
 
+def test_predict_unknown_category():
+    payload = {
+        "customer_id": 12345,
+        "account_age_days": 730,
+        "monthly_charges": 89.99,
+        "total_charges": 2159.76,
+        "support_tickets": 3,
+        "contract_type": "Month-to-Month",
+        "payment_method": "Cash",
+        "monthly_usage_gb": 150.5,
+        "num_services": 4
+    }
+    
+    response = client.post("/predict", json=payload)
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["loc"] == ["body", "payment_method"]
+    assert set(error["ctx"]["allowed_values"]) == {"Credit Card", "Bank Transfer", "Electronic Check"}
+
 def test_batch_prediction():
     payload = {
         "customers": [
@@ -116,6 +153,667 @@ def test_batch_prediction():
     assert "predictions" in data
     assert len(data["predictions"]) == 2
 
+def test_batch_prediction_matches_single():
+    customers = [
+        {
+            "customer_id": i,
+            "account_age_days": 100 + i * 37,
+            "monthly_charges": 20.0 + i * 3.5,
+            "total_charges": 500.0 + i * 120.0,
+            "support_tickets": i % 7,
+            "contract_type": ["Month-to-Month", "One Year", "Two Year"][i % 3],
+            "payment_method": ["Credit Card", "Bank Transfer", "Electronic Check"][i % 3],
+            "monthly_usage_gb": 10.0 + i * 9.0,
+            "num_services": 1 + i % 5
+        }
+        for i in range(25)
+    ]
+    
+    response = client.post("/predict/batch", json={"customers": customers})
+    assert response.status_code == 200
+    batch = response.json()["predictions"]
+    
+    for customer, pred in zip(customers, batch):
+        single = client.post("/predict", json=customer).json()
+        assert pred["customer_id"] == single["customer_id"]
+        assert pred["churn_probability"] == single["churn_probability"]
+        assert pred["risk_level"] == single["risk_level"]
+
+def test_batch_prediction_row_errors():
+    good = {
+        "customer_id": 1,
+        "account_age_days": 365,
+        "monthly_charges": 50.0,
+        "total_charges": 600.0,
+        "support_tickets": 1,
+        "contract_type": "One Year",
+        "payment_method": "Credit Card",
+        "monthly_usage_gb": 100.0,
+        "num_services": 2
+    }
+    bad = {**good, "customer_id": 2, "contract_type": "Lifetime"}
+    
+    response = client.post("/predict/batch", json={"customers": [good, bad, good]})
+    assert response.status_code == 200
+    predictions = response.json()["predictions"]
+    assert len(predictions) == 3
+    assert "churn_probability" in predictions[0]
+    assert predictions[1]["customer_id"] == 2
+    assert "contract_type" in predictions[1]["error"]
+    assert "churn_probability" in predictions[2]
+
+def _customers(n):
+    return [
+        {
+            "customer_id": i,
+            "account_age_days": 100 + i * 37,
+            "monthly_charges": 20.0 + i * 3.5,
+            "total_charges": 500.0 + i * 120.0,
+            "support_tickets": i % 7,
+            "contract_type": ["Month-to-Month", "One Year", "Two Year"][i % 3],
+            "payment_method": ["Credit Card", "Bank Transfer", "Electronic Check"][i % 3],
+            "monthly_usage_gb": 10.0 + i * 9.0,
+            "num_services": 1 + i % 5
+        }
+        for i in range(n)
+    ]
+
+def test_columnar_prediction_matches_batch():
+    customers = _customers(20)
+    customers[4]["payment_method"] = "Cash"
+    columns = {key: [c[key] for c in customers] for key in customers[0]}
+    
+    batch = client.post("/predict/batch", json={"customers": customers}).json()["predictions"]
+    
+    ndjson = "\n".join(json.dumps(c) for c in customers)
+    for response in [
+        client.post("/predict/columnar", json=columns),
+        client.post("/predict/columnar", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    ]:
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 20
+        columnar = data["predictions"]
+        assert columnar["customer_id"] == list(range(20))
+        for i, pred in enumerate(batch):
+            if i == 4:
+                assert columnar["churn_probability"][i] is None
+                assert columnar["error"][i] == pred["error"]
+                continue
+            assert columnar["churn_probability"][i] == pred["churn_probability"]
+            assert columnar["churn_prediction"][i] == pred["churn_prediction"]
+            assert columnar["risk_level"][i] == pred["risk_level"]
+            assert columnar["error"][i] is None
+
+def test_columnar_prediction_validates_bounds():
+    customers = _customers(5)
+    columns = {key: [c[key] for c in customers] for key in customers[0]}
+    columns["account_age_days"][2] = 0
+    columns["num_services"][3] = 2.5
+    columns["monthly_charges"][1] = 501.0
+    del columns["total_charges"]
+    
+    response = client.post("/predict/columnar", json=columns)
+    assert response.status_code == 422
+    errors = {(tuple(e["loc"]), e["type"]) for e in response.json()["detail"]}
+    assert errors == {
+        (("body", "account_age_days", 2), "greater_than_equal"),
+        (("body", "monthly_charges", 1), "less_than_equal"),
+        (("body", "num_services", 3), "int_from_float"),
+        (("body", "total_charges"), "missing"),
+    }
+    
+    # Bounds come from the same Field(ge=, le=) constraints as /predict
+    single = client.post("/predict", json={**customers[0], "account_age_days": 0})
+    assert single.status_code == 422
+    
+    response = client.post("/predict/columnar", json={**columns, "customer_id": [1, 2]})
+    assert response.status_code == 422
+
+def _without_timestamps(predictions):
+    return [{k: v for k, v in p.items() if k != "timestamp"} for p in predictions]
+
+def test_batch_content_negotiation():
+    from api_client import ChurnPredictionClient
+    
+    customers = _customers(12)
+    customers[5]["contract_type"] = "Lifetime"
+    api = ChurnPredictionClient("http://testserver")
+    api.session = client
+    
+    expected = client.post("/predict/batch", json={"customers": customers}).json()
+    assert "error" in expected["predictions"][5]
+    
+    for fmt in ["json", "msgpack", "arrow"]:
+        for compress in [False, True]:
+            result = api.predict_batch(customers, fmt=fmt, compress=compress)
+            assert result["total"] == 12
+            assert _without_timestamps(result["predictions"]) == _without_timestamps(expected["predictions"])
+            assert all("timestamp" in p for i, p in enumerate(result["predictions"]) if i != 5)
+    
+    # Arrow responses to JSON bodies keep every column whichever rows failed
+    import pyarrow as pa
+    for batch in ([customers[5], customers[0]], [customers[0], customers[5]]):
+        response = client.post("/predict/batch", json={"customers": batch},
+                               headers={"Accept": "application/vnd.apache.arrow.stream"})
+        rows = pa.ipc.open_stream(response.content).read_all().to_pylist()
+        failed, ok = (rows[0], rows[1]) if batch[0] is customers[5] else (rows[1], rows[0])
+        assert "contract_type" in failed["error"] and failed["churn_probability"] is None
+        assert ok["error"] is None and ok["timestamp"] is not None
+        assert ok["churn_probability"] == expected["predictions"][0]["churn_probability"]
+        assert ok["risk_level"] == expected["predictions"][0]["risk_level"]
+    
+    # Responses can also be negotiated independently of the request format
+    response = client.post("/predict/batch", json={"customers": customers},
+                           headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    
+    response = client.post("/predict/batch", content=b"customers", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 415
+    
+    bad = [{**customers[0], "account_age_days": 0}]
+    response = client.post("/predict/batch", content=msgpack.packb({"customers": bad}),
+                           headers={"Content-Type": "application/msgpack"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "customers", 0, "account_age_days"]
+    
+    # Maps with unhashable keys are invalid bodies, not server errors
+    response = client.post("/predict/batch", content=b"\x81\x90\x01",
+                           headers={"Content-Type": "application/msgpack"})
+    assert response.status_code == 422
+    
+    # Arrow file format (with footer) in and out
+    table = pa.Table.from_pylist(customers)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/predict/batch", content=sink.getvalue().to_pybytes(),
+                           headers={"Content-Type": "application/vnd.apache.arrow.file",
+                                    "Accept": "application/vnd.apache.arrow.file"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.file"
+    rows = pa.ipc.open_file(pa.py_buffer(response.content)).read_all().to_pylist()
+    assert [r["churn_probability"] for r in rows] == [p.get("churn_probability") for p in expected["predictions"]]
+
+def test_batch_openapi_schema():
+    spec = client.get("/openapi.json").json()
+    body = spec["paths"]["/predict/batch"]["post"]["requestBody"]["content"]
+    schema = body["application/json"]["schema"]
+    assert schema["properties"]["customers"]["items"]["$ref"] == "#/components/schemas/CustomerFeatures"
+    assert "CustomerFeatures" in spec["components"]["schemas"]
+    assert set(body) >= {"application/msgpack", "application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file"}
+
+def test_score_dataframe_in_order_with_retries(monkeypatch, tmp_path):
+    import pandas as pd
+    from api_client import ChurnPredictionClient
+    
+    df = pd.DataFrame(_customers(40) * 5)
+    df["customer_id"] = range(len(df))
+    df.loc[77, "contract_type"] = "Lifetime"
+    api = ChurnPredictionClient("http://testserver", backoff=0)
+    api.session = client
+    
+    # The first two chunks hit a full inference queue and must be retried
+    calls = {"n": 0}
+    score_features = main._score_features
+    
+    async def flaky(features):
+        calls["n"] += 1
+        if calls["n"] <= 2:
+            raise QueueFullError()
+        return await score_features(features)
+    
+    monkeypatch.setattr(main, "_score_features", flaky)
+    monkeypatch.setattr(main, "INFERENCE_RETRY_AFTER", "0")
+    
+    result = api.score_dataframe(df, chunk_size=32, concurrency=3)
+    assert result["customer_id"].tolist() == list(range(200))
+    assert result["error"].notna().sum() == 1
+    assert result.loc[77, "error"].startswith("Prediction failed")
+    
+    expected = api.predict_batch(df.head(32).to_dict("records"))
+    assert np.allclose(result["churn_probability"].head(32),
+                       [p["churn_probability"] for p in expected["predictions"]])
+    
+    # CSV to CSV, streaming results to disk
+    df.to_csv(tmp_path / "customers.csv", index=False)
+    summary = api.score_csv(tmp_path / "customers.csv", tmp_path / "scores.csv", chunk_size=50, fmt="json")
+    assert summary["rows"] == 200 and summary["errors"] == 1 and summary["chunks"] == 4
+    scores = pd.read_csv(tmp_path / "scores.csv")
+    assert scores["customer_id"].tolist() == list(range(200))
+    assert np.allclose(scores["churn_probability"].fillna(0), result["churn_probability"].fillna(0))
+
+def _requests_session():
+    """A requests session whose calls to http://testserver go to the test app"""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    
+    class TestAppAdapter(requests.adapters.BaseAdapter):
+        def send(self, request, **kwargs):
+            r = client.request(request.method, request.url, content=request.body, headers=dict(request.headers))
+            response = requests.Response()
+            response.status_code = r.status_code
+            response._content = r.content
+            response.headers = CaseInsensitiveDict(r.headers)
+            response.url = request.url
+            response.request = request
+            return response
+        
+        def close(self):
+            pass
+    
+    session = requests.Session()
+    session.mount("http://testserver", TestAppAdapter())
+    return session
+
+def test_score_dataframe_survives_failed_chunks(monkeypatch, tmp_path):
+    import pandas as pd
+    from api_client import ChurnPredictionClient
+    
+    df = pd.DataFrame(_customers(40) * 5)
+    df["customer_id"] = range(len(df))
+    # Fails validation, so its whole chunk gets a 422
+    df.loc[150, "account_age_days"] = 0
+    api = ChurnPredictionClient("http://testserver", max_retries=0)
+    api.session = _requests_session()
+    
+    result = api.score_dataframe(df, chunk_size=32, concurrency=3)
+    assert result["customer_id"].tolist() == list(range(200))
+    assert result["error"].notna().sum() == 1
+    assert result.loc[150, "error"].startswith("Request failed (422): account_age_days")
+    assert result["churn_probability"].drop(150).notna().all()
+    
+    # A chunk still failing once retries are used up is recorded, not raised
+    calls = {"n": 0}
+    score_features = main._score_features
+    
+    async def flaky(features):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise QueueFullError()
+        return await score_features(features)
+    
+    monkeypatch.setattr(main, "_score_features", flaky)
+    monkeypatch.setattr(main, "INFERENCE_RETRY_AFTER", "0")
+    df.drop(index=150).to_csv(tmp_path / "customers.csv", index=False)
+    summary = api.score_csv(tmp_path / "customers.csv", tmp_path / "scores.csv", chunk_size=50, concurrency=1)
+    assert summary["rows"] == 199 and summary["errors"] == 50
+    scores = pd.read_csv(tmp_path / "scores.csv")
+    assert len(scores) == 199
+    assert scores["error"].dropna().str.startswith("Request failed (503)").all()
+
+def test_prediction_cache(monkeypatch):
+    from api.cache import PredictionCache
+    
+    scored = []
+    score_features = main._score_features
+    
+    async def counting(features):
+        scored.append(len(features))
+        return await score_features(features)
+    
+    monkeypatch.setattr(main, "_score_features", counting)
+    monkeypatch.setattr(main, "prediction_cache", PredictionCache(max_entries=100, ttl_seconds=60))
+    
+    customers = _customers(6)
+    first = client.post("/predict", json=customers[0]).json()
+    second = client.post("/predict", json={**customers[0], "customer_id": 999}).json()
+    assert scored == [1]
+    assert second["churn_probability"] == first["churn_probability"]
+    assert second["customer_id"] == 999
+    
+    # Batches only score the rows not seen before
+    batch = client.post("/predict/batch", json={"customers": customers}).json()
+    assert scored == [1, 5]
+    assert batch["predictions"][0]["churn_probability"] == first["churn_probability"]
+    
+    # A different model version never reuses old entries
+    monkeypatch.setattr(main, "model_version", 12345)
+    client.post("/predict", json=customers[0])
+    assert scored == [1, 5, 1]
+
+def test_prediction_cache_eviction(monkeypatch):
+    from api.cache import PredictionCache
+    
+    cache = PredictionCache(max_entries=3, ttl_seconds=60)
+    features = np.arange(20, dtype=np.float64).reshape(5, 4)
+    cache.put_many(1, features[:3], np.array([0.1, 0.2, 0.3]))
+    cache.get_many(1, features[:1])  # row 0 is now most recently used
+    cache.put_many(1, features[3:4], np.array([0.4]))
+    
+    probs, missing = cache.get_many(1, features)
+    assert missing.tolist() == [False, True, False, False, True]
+    assert probs[[0, 2, 3]].tolist() == [0.1, 0.3, 0.4]
+    
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    _, missing = cache.get_many(1, features)
+    assert missing.all()
+    assert len(cache) == 0 and cache.nbytes == 0
+    
+    small = PredictionCache(max_entries=100, max_bytes=1000)
+    small.put_many(1, np.arange(40, dtype=np.float64).reshape(10, 4), np.zeros(10))
+    assert 0 < len(small) < 10 and small.nbytes <= 1000
+
+def test_micro_batcher_coalesces_requests():
+    calls = []
+    
+    async def score(features):
+        calls.append(len(features))
+        return features[:, 0] / 100
+    
+    async def run():
+        batcher = MicroBatcher(score, max_batch_size=8, max_wait_ms=20)
+        await batcher.start()
+        try:
+            rows = [np.array([float(i), 0.0]) for i in range(20)]
+            return await asyncio.gather(*(batcher.submit(row) for row in rows))
+        finally:
+            await batcher.stop()
+    
+    results = asyncio.run(run())
+    
+    assert results == [i / 100 for i in range(20)]
+    assert sum(calls) == 20
+    assert max(calls) <= 8
+    assert len(calls) < 20
+
+class SlowModel:
+    def predict_proba(self, features):
+        time.sleep(0.2)
+        return np.tile([0.4, 0.6], (len(features), 1))
+
+def test_inference_executor_backpressure():
+    async def run():
+        executor = InferenceExecutor(kind='thread', max_workers=1, max_queue=0)
+        executor.set_model(SlowModel())
+        try:
+            first = asyncio.ensure_future(executor.score(np.zeros((1, 8))))
+            await asyncio.sleep(0.01)
+            with pytest.raises(QueueFullError):
+                await executor.score(np.zeros((1, 8)))
+            return await first
+        finally:
+            executor.shutdown()
+    
+    probs = asyncio.run(run())
+    assert list(probs) == [0.6]
+
+def test_predict_returns_503_when_queue_full(monkeypatch):
+    async def full(features):
+        raise QueueFullError("full")
+    monkeypatch.setattr(main.executor, "score", full)
+    
+    payload = {
+        "customer_id": 1,
+        "account_age_days": 365,
+        "monthly_charges": 50.0,
+        "total_charges": 600.0,
+        "support_tickets": 1,
+        "contract_type": "One Year",
+        "payment_method": "Credit Card",
+        "monthly_usage_gb": 100.0,
+        "num_services": 2
+    }
+    
+    response = client.post("/predict", json=payload)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    
+    response = client.post("/predict/batch", json={"customers": [payload]})
+    assert response.status_code == 503
+
+def test_stage_timing_metrics():
+    from prometheus_client import REGISTRY
+
+    payload = {
+        "customer_id": 1,
+        "account_age_days": 365,
+        "monthly_charges": 50.0,
+        "total_charges": 600.0,
+        "support_tickets": 1,
+        "contract_type": "One Year",
+        "payment_method": "Credit Card",
+        "monthly_usage_gb": 100.0,
+        "num_services": 2
+    }
+
+    def count(endpoint, stage, batch_size):
+        return REGISTRY.get_sample_value(
+            'churn_prediction_stage_seconds_count',
+            {'endpoint': endpoint, 'stage': stage, 'batch_size': batch_size}
+        ) or 0
+
+    stages = ['parse', 'encode', 'features', 'inference', 'serialize']
+    before = {stage: count('/predict/batch', stage, '11-100') for stage in stages}
+    single_before = count('/predict', 'inference', '1')
+    latency_before = REGISTRY.get_sample_value('churn_prediction_latency_seconds_count')
+
+    assert client.post("/predict/batch", json={"customers": [payload] * 20}).status_code == 200
+    assert client.post("/predict", json=payload).status_code == 200
+    # Failed requests are not recorded
+    assert client.post("/predict", json={**payload, "contract_type": "Lifetime"}).status_code == 422
+
+    for stage in stages:
+        assert count('/predict/batch', stage, '11-100') == before[stage] + 1
+    assert count('/predict', 'inference', '1') == single_before + 1
+    assert REGISTRY.get_sample_value('churn_prediction_latency_seconds_count') == latency_before + 1
+    assert 'churn_prediction_stage_seconds_bucket' in client.get("/metrics").text
+
+def test_profile_endpoint(monkeypatch):
+    assert client.get("/debug/profile?seconds=0.1").status_code == 404
+
+    monkeypatch.setattr(main, "PROFILER_ENABLED", True)
+    assert client.get("/debug/profile?seconds=1000").status_code == 422
+
+    response = client.get("/debug/profile?seconds=0.2&interval_ms=5")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+        assert ';' in stack
+
+def test_serves_model_with_derived_features():
+    from features import FeaturePipeline
+    from sklearn.ensemble import RandomForestClassifier
+    
+    previous = LoadedModel(main.model, main.contract_table, main.payment_table,
+                           main.model_path, main.model_version, main.feature_pipeline)
+    features = FeaturePipeline(main.contract_table, main.payment_table, ['tickets_per_month'])
+    customers = _customers(40)
+    X, _, _ = features.transform({k: [c[k] for c in customers] for k in customers[0]})
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, np.arange(40) % 2)
+    main._swap_model(LoadedModel(model, features.contract_table, features.payment_table,
+                                 'models/derived.pkl', features=features))
+    
+    try:
+        info = client.get("/model/info").json()
+        assert info["n_features"] == 9
+        assert info["feature_names"][-1] == "tickets_per_month"
+        
+        expected = model.predict_proba(X)[:, 1]
+        single = client.post("/predict", json=customers[3]).json()
+        assert single["churn_probability"] == pytest.approx(expected[3], abs=1e-4)
+        batch = client.post("/predict/batch", json={"customers": customers}).json()
+        assert [p["churn_probability"] for p in batch["predictions"]] == pytest.approx(expected, abs=1e-4)
+    finally:
+        main._swap_model(previous)
+
+def test_hot_reload_from_registry(tmp_path):
+    previous = LoadedModel(main.model, main.contract_table, main.payment_table,
+                           main.model_path, main.model_version, main.feature_pipeline)
+    
+    registry_path = str(tmp_path / 'registry.json')
+    watcher = RegistryWatcher(registry_path, main.reload_model)
+    
+    # Publish a new production model that always predicts churn
+    new_model = DummyClassifier(strategy='constant', constant=1)
+    new_model.fit(np.zeros((4, 8)), [0, 1, 0, 1])
+    model_path = str(tmp_path / 'churn_model_new.pkl')
+    joblib.dump(new_model, model_path)
+    shutil.copy('models/contract_encoder.pkl', tmp_path)
+    shutil.copy('models/payment_encoder.pkl', tmp_path)
+    
+    registry = ModelRegistry(registry_path)
+    version = registry.register_model(model_path, {'f1': 0.9})
+    registry.promote_to_production(version)
+    
+    try:
+        assert asyncio.run(watcher.check())
+        assert not asyncio.run(watcher.check())
+        
+        payload = {
+            "customer_id": 7,
+            "account_age_days": 365,
+            "monthly_charges": 50.0,
+            "total_charges": 600.0,
+            "support_tickets": 1,
+            "contract_type": "One Year",
+            "payment_method": "Credit Card",
+            "monthly_usage_gb": 100.0,
+            "num_services": 2
+        }
+        response = client.post("/predict", json=payload)
+        assert response.status_code == 200
+        assert response.json()["churn_probability"] == 1.0
+        assert main.model_version == version
+    finally:
+        main._swap_model(previous)
+
+def test_canary_and_shadow_traffic(tmp_path, monkeypatch):
+    from prometheus_client import REGISTRY
+    from api.traffic import traffic_buckets
+
+    shutil.copy('models/contract_encoder.pkl', tmp_path)
+    shutil.copy('models/payment_encoder.pkl', tmp_path)
+    registry_path = str(tmp_path / 'registry.json')
+    watcher = RegistryWatcher(registry_path, main.reload_model, on_traffic_change=main.reload_traffic)
+    registry = ModelRegistry(registry_path)
+    versions = {}
+    for name, constant in [('canary', 1), ('shadow', 0)]:
+        candidate = DummyClassifier(strategy='constant', constant=constant)
+        candidate.fit(np.zeros((4, 8)), [0, 1, 0, 1])
+        path = str(tmp_path / f'churn_model_{name}.pkl')
+        joblib.dump(candidate, path)
+        versions[name] = registry.register_model(path, {'f1': 0.9})
+
+    registry.start_canary(versions['canary'], 30)
+    registry.start_shadow(versions['shadow'])
+    with pytest.raises(ValueError):
+        registry.start_canary(versions['shadow'], 80)
+
+    customers = [{
+        "customer_id": i,
+        "account_age_days": 365,
+        "monthly_charges": 50.0,
+        "total_charges": 600.0,
+        "support_tickets": i % 5,
+        "contract_type": "One Year",
+        "payment_method": "Credit Card",
+        "monthly_usage_gb": 100.0,
+        "num_services": 2
+    } for i in range(1, 201)]
+    flips = lambda: REGISTRY.get_sample_value(
+        'churn_shadow_label_flips_total', {'version': str(versions['shadow'])}) or 0
+    flips_before = flips()
+
+    try:
+        assert asyncio.run(watcher.check())
+        roles = {c["version"]: c["role"] for c in client.get("/model/info").json()["candidates"]}
+        assert roles == {versions['canary']: 'canary', versions['shadow']: 'shadow'}
+
+        response = client.post("/predict/batch", json={"customers": customers})
+        probs = np.array([p["churn_probability"] for p in response.json()["predictions"]])
+
+        # The same 30% of customers go to the canary, on every request
+        on_canary = traffic_buckets(np.arange(1, 201)) < 3000
+        assert 30 < on_canary.sum() < 90
+        assert (probs[on_canary] == 1.0).all()
+        columns = main._customer_columns([main.CustomerFeatures(**c) for c in customers])
+        expected = main.model.predict_proba(main._build_feature_matrix(columns)[0])[:, 1]
+        assert probs[~on_canary] == pytest.approx(expected[~on_canary], abs=1e-4)
+        single = client.post("/predict", json=customers[int(np.flatnonzero(on_canary)[0])]).json()
+        assert single["churn_probability"] == 1.0
+
+        # The shadow predicts 0 for everyone, so it flips every row served as churn
+        served_churn = int((probs >= 0.5).sum()) + 1
+        deadline = time.time() + 5
+        while flips() < flips_before + served_churn and time.time() < deadline:
+            time.sleep(0.01)
+        assert flips() == flips_before + served_churn
+
+        # The prediction log records which version answered each row
+        from monitoring.collect_predictions import AsyncPredictionLogger
+        logger = AsyncPredictionLogger(str(tmp_path / 'predictions'))
+        monkeypatch.setattr(main, "prediction_logger", logger)
+        client.post("/predict/batch", json={"customers": customers})
+        logger.close()
+        logged = logger.get_daily_predictions().set_index('customer_id')['model_version']
+        assert (logged.loc[np.arange(1, 201)[on_canary]] == versions['canary']).all()
+        assert logged.loc[np.arange(1, 201)[~on_canary]].isna().all()
+        monkeypatch.setattr(main, "prediction_logger", None)
+
+        # An overloaded canary falls back to production instead of failing the request
+        async def full(features):
+            raise QueueFullError("full")
+        canary = next(c for c in main.canaries if c.version == versions['canary'])
+        monkeypatch.setattr(canary.executor, "score", full)
+        fallbacks = lambda: REGISTRY.get_sample_value(
+            'churn_candidate_fallback_total', {'version': str(versions['canary']), 'reason': 'queue_full'}) or 0
+        fallbacks_before = fallbacks()
+        response = client.post("/predict/batch", json={"customers": customers})
+        assert response.status_code == 200
+        probs = np.array([p["churn_probability"] for p in response.json()["predictions"]])
+        assert probs == pytest.approx(expected, abs=1e-4)
+        assert fallbacks() == fallbacks_before + on_canary.sum()
+
+        # Promoting the canary takes it out of the traffic split
+        registry.promote_to_production(versions['canary'])
+        assert registry.get_traffic()['canary'] == []
+    finally:
+        asyncio.run(main.reload_traffic({'split': 'customer_id', 'canary': [], 'shadow': []}))
+    assert client.get("/model/info").json()["candidates"] == []
+
+def test_blocking_prediction_log_keeps_event_loop_free(monkeypatch, tmp_path):
+    """With overflow='block', a full log queue doesn't stall other requests"""
+    import threading
+    from monitoring.collect_predictions import AsyncPredictionLogger
+    
+    release = threading.Event()
+    logger = AsyncPredictionLogger(str(tmp_path), max_queue=1, overflow='block', batch_size=1)
+    write_entries = logger._write_entries
+    monkeypatch.setattr(logger, "_write_entries", lambda entries: (release.wait(5), write_entries(entries)))
+    monkeypatch.setattr(main, "prediction_logger", logger)
+    monkeypatch.setattr(main, "PREDICTION_LOG_OVERFLOW", "block")
+    
+    customer = main.CustomerFeatures(**_customers(1)[0])
+    prediction = {'churn_prediction': True, 'churn_probability': 0.8, 'risk_level': 'high'}
+    # The writer is stuck on the first record and the second fills the queue
+    logger.log_prediction(customer.model_dump(), prediction)
+    deadline = time.time() + 5
+    while logger._buffer and time.time() < deadline:
+        time.sleep(0.01)
+    logger.log_prediction(customer.model_dump(), prediction)
+    
+    async def scenario():
+        blocked = asyncio.create_task(main._log_predictions([(customer.model_dump(), prediction, None)]))
+        start = time.perf_counter()
+        await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        assert not blocked.done()
+        release.set()
+        await asyncio.wait_for(blocked, 5)
+        return elapsed
+    
+    try:
+        assert asyncio.run(scenario()) < 1
+    finally:
+        release.set()
+        logger.close()
+    assert logger.written == 3 and logger.dropped == 0
+
 def test_model_info():
     response = client.get("/model/info")
     assert response.status_code == 200
@@ -2,11 +2,15 @@ import pytest
 import pandas as pd
 import numpy as np
 from monitoring.drift_detector import DriftDetector
-from monitoring.collect_predictions import PredictionLogger
+from monitoring.collect_predictions import PredictionLogger, AsyncPredictionLogger, ParquetPredictionLogger
+from monitoring.migrate_prediction_logs import migrate
 import os
+import threading
 
-def test_drift_detector():
+def test_drift_detector(tmp_path, monkeypatch):
     """Test drift detection"""
+    import dataset_cache
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path))
     # Create reference data
     np.random.seed(42)
     reference = pd.DataFrame({
@@ -38,8 +42,10 @@ def test_drift_detector():
     assert 'drift_detected' in result
     assert result['overall_drift_score'] >= 0
 
-def test_drift_detector_with_drift():
+def test_drift_detector_with_drift(tmp_path, monkeypatch):
     """Test drift detection with actual drift"""
+    import dataset_cache
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path))
     np.random.seed(42)
     
     # Reference data
@@ -60,6 +66,63 @@ def test_drift_detector_with_drift():
     assert result['drift_detected'] == True
     assert result['overall_drift_score'] > 0.1
 
+def test_drift_detector_streaming(tmp_path, monkeypatch):
+    """Reference profile is persisted and streaming updates match a batch check"""
+    import dataset_cache
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    rng = np.random.default_rng(0)
+    reference = pd.DataFrame({
+        'monthly_charges': rng.uniform(20, 150, 5000),
+        'support_tickets': rng.poisson(2, 5000)
+    })
+    reference_path = str(tmp_path / 'reference.csv')
+    profile_path = str(tmp_path / 'reference.profile.json')
+    reference.to_csv(reference_path, index=False)
+
+    detector = DriftDetector(reference_path, profile_path=profile_path)
+    assert os.path.exists(profile_path)
+
+    current = pd.DataFrame({
+        'monthly_charges': rng.uniform(60, 200, 1000),
+        'support_tickets': rng.poisson(3, 1000)
+    })
+
+    # Later detectors load the saved profile instead of the CSV
+    reloaded = DriftDetector(reference_path, profile_path=profile_path)
+    assert reloaded.profile.source == detector.profile.source
+    for start in range(0, len(current), 300):
+        reloaded.update(current.iloc[start:start + 300])
+
+    batch = detector.calculate_drift(current)
+    streamed = reloaded.calculate_drift()
+
+    assert streamed['n_samples'] == len(current)
+    assert streamed['drifted_features'] == ['monthly_charges', 'support_tickets']
+    for col in ['monthly_charges', 'support_tickets']:
+        for stat in ['ks_statistic', 'p_value', 'psi', 'wasserstein']:
+            assert streamed['features'][col][stat] == pytest.approx(batch['features'][col][stat])
+        assert batch['features'][col]['psi'] > 0.1
+        assert batch['features'][col]['wasserstein'] > 0
+
+    reloaded.reset()
+    assert reloaded.calculate_drift()['features'] == {}
+    
+    # Default profiles live in the dataset cache, keyed on the data, bins and columns
+    cached = DriftDetector(reference_path)
+    assert os.path.dirname(cached.profile_path) == str(tmp_path / 'cache')
+    assert DriftDetector(reference_path).profile_path == cached.profile_path
+    coarse = DriftDetector(reference_path, n_bins=10)
+    assert coarse.profile_path != cached.profile_path
+    assert len(coarse.profile.features['monthly_charges']['edges']) <= 11
+    other_dir = tmp_path / 'other'
+    other_dir.mkdir()
+    reference.head(100).to_csv(other_dir / 'reference.csv', index=False)
+    other = DriftDetector(str(other_dir / 'reference.csv'))
+    assert other.profile_path != cached.profile_path and os.path.exists(cached.profile_path)
+    
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', '')
+    assert DriftDetector(reference_path).profile_path is None
+
 def test_prediction_logger():
     """Test prediction logging"""
     logger = PredictionLogger(log_path='data/test_predictions/')
@@ -80,4 +143,271 @@ def test_prediction_logger():
     logger.flush()
     
     # Verify log file exists
-    assert os.path.exists('data/test_predictions/')
\ No newline at end of file
+    assert os.path.exists('data/test_predictions/')
+
+def test_async_prediction_logger(tmp_path):
+    """Background writer persists every queued prediction"""
+    logger = AsyncPredictionLogger(log_path=str(tmp_path), batch_size=50, flush_interval=0.05)
+    
+    for i in range(250):
+        logger.log_prediction(
+            {'customer_id': i, 'monthly_charges': 50.0},
+            {'churn_prediction': False, 'churn_probability': 0.2, 'risk_level': 'low'}
+        )
+    assert logger.flush(timeout=5)
+    logger.close()
+    
+    df = logger.get_daily_predictions()
+    assert len(df) == 250
+    assert sorted(df['customer_id']) == list(range(250))
+    assert logger.written == 250
+    assert logger.dropped == 0
+
+def test_async_prediction_logger_drops_on_overflow(tmp_path):
+    """With the drop policy a full buffer rejects records instead of blocking"""
+    counts = {'written': 0, 'dropped': 0}
+    logger = AsyncPredictionLogger(
+        log_path=str(tmp_path), max_queue=5, overflow='drop', batch_size=1000,
+        on_written=lambda n: counts.update(written=counts['written'] + n),
+        on_dropped=lambda n: counts.update(dropped=counts['dropped'] + n)
+    )
+    
+    # Hold the writer so the buffer fills up
+    gate = threading.Event()
+    write = logger._write_entries
+    logger._write_entries = lambda entries: (gate.wait(), write(entries))
+    
+    prediction = {'churn_prediction': True, 'churn_probability': 0.9, 'risk_level': 'high'}
+    accepted = [logger.log_prediction({'customer_id': i}, prediction) for i in range(8)]
+    
+    assert accepted == [True] * 5 + [False] * 3
+    assert logger.dropped == 3
+    
+    gate.set()
+    logger.close()
+    assert logger.written == 5
+    assert counts == {'written': 5, 'dropped': 3}
+
+def _customer(i):
+    return {
+        'customer_id': i,
+        'account_age_days': 100 + i,
+        'monthly_charges': 50.0 + i,
+        'total_charges': 600.0,
+        'support_tickets': i % 4,
+        'contract_type': 'One Year',
+        'payment_method': 'Credit Card',
+        'monthly_usage_gb': 100.0,
+        'num_services': 2
+    }
+
+def test_parquet_prediction_logger(tmp_path):
+    """Parquet logs are typed, partitioned by date and support projection"""
+    logger = ParquetPredictionLogger(log_path=str(tmp_path), batch_size=40, flush_interval=0.05)
+    prediction = {'churn_prediction': True, 'churn_probability': 0.8, 'risk_level': 'high'}
+    
+    for i in range(100):
+        logger.log_prediction(_customer(i), prediction)
+    assert logger.flush(timeout=5)
+    
+    partitions = os.listdir(tmp_path)
+    assert partitions == [f"date={pd.Timestamp.now().date()}"]
+    
+    df = logger.get_daily_predictions(columns=DriftDetector.feature_cols)
+    assert list(df.columns) == DriftDetector.feature_cols
+    assert len(df) == 100
+    assert df['account_age_days'].dtype == np.int32
+    
+    # Later writes land in a new part and are picked up on the next read
+    for i in range(100, 150):
+        logger.log_prediction(_customer(i), prediction)
+    logger.close()
+    
+    df = logger.get_daily_predictions()
+    assert len(df) == 150
+    assert df['prediction'].all()
+    assert str(df['timestamp'].dtype).startswith('datetime64')
+
+def test_parquet_parts_published_by_age(tmp_path):
+    """Open parts become readable after max_part_seconds without flush() or close()"""
+    import time
+    logger = ParquetPredictionLogger(log_path=str(tmp_path), flush_interval=0.05, max_part_seconds=0.2)
+    prediction = {'churn_prediction': True, 'churn_probability': 0.8, 'risk_level': 'high'}
+    for i in range(10):
+        logger.log_prediction(_customer(i), prediction)
+    
+    deadline = time.time() + 5
+    while len(logger.get_daily_predictions()) < 10 and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(logger.get_daily_predictions()) == 10
+    logger.close()
+
+def test_parquet_log_model_version(tmp_path):
+    """Served model versions are logged; parts written before the column existed read as null"""
+    import pyarrow.parquet as pq
+    from monitoring.collect_predictions import entries_to_table
+    
+    prediction = {'churn_prediction': True, 'churn_probability': 0.8, 'risk_level': 'high'}
+    partition = tmp_path / f"date={pd.Timestamp.now().date()}"
+    partition.mkdir()
+    old = entries_to_table([PredictionLogger._make_entry(_customer(0), prediction)]).drop(['model_version'])
+    pq.write_table(old, partition / 'part-000000000000-0-00001.parquet')
+    
+    logger = ParquetPredictionLogger(log_path=str(tmp_path))
+    logger.log_predictions([(_customer(1), prediction, 3), (_customer(2), prediction)])
+    logger.close()
+    
+    df = logger.get_daily_predictions().set_index('customer_id')
+    assert df.loc[1, 'model_version'] == 3
+    assert pd.isna(df.loc[0, 'model_version']) and pd.isna(df.loc[2, 'model_version'])
+    assert list(logger.get_daily_predictions(columns=['customer_id', 'model_version'])['customer_id']) == [0, 1, 2]
+
+def test_read_new_predictions(tmp_path):
+    """Each logged row is read once, whatever order parts are published in"""
+    import pyarrow.parquet as pq
+    from monitoring.collect_predictions import entries_to_table
+    
+    prediction = {'churn_prediction': True, 'churn_probability': 0.8, 'risk_level': 'high'}
+    date = pd.Timestamp.now().date()
+    partition = tmp_path / f"date={date}"
+    partition.mkdir()
+    
+    def write_part(name, ids):
+        table = entries_to_table([PredictionLogger._make_entry(_customer(i), prediction) for i in ids])
+        pq.write_table(table, partition / name)
+    
+    logger = PredictionLogger(log_path=str(tmp_path))
+    cursor = {}
+    write_part('part-b.parquet', range(0, 5))
+    for i in range(5, 8):
+        logger.log_prediction(_customer(i), prediction)
+    logger.flush()
+    df = logger.read_new_predictions(cursor, date)
+    assert sorted(df['customer_id']) == list(range(0, 8))
+    
+    # A part sorting before one already read, more JSONL and a line still being written
+    write_part('part-a.parquet', range(8, 12))
+    for i in range(12, 14):
+        logger.log_prediction(_customer(i), prediction)
+    logger.flush()
+    jsonl = tmp_path / f"predictions_{date}.jsonl"
+    with open(jsonl, 'a') as f:
+        f.write('{"customer_id": 14, "account_a')
+    df = logger.read_new_predictions(cursor, date, columns=['customer_id'])
+    assert list(df.columns) == ['customer_id']
+    assert sorted(df['customer_id']) == list(range(8, 14))
+    
+    with open(jsonl, 'a') as f:
+        f.write('ge_days": 30}\n')
+    df = logger.read_new_predictions(cursor, date)
+    assert list(df['customer_id']) == [14]
+    assert len(logger.read_new_predictions(cursor, date)) == 0
+
+def test_retrain_trigger_reads_predictions_incrementally(tmp_path, monkeypatch):
+    """Each retrain check only reads predictions logged since the last one"""
+    import dataset_cache
+    from monitoring.retrain_trigger import RetrainTrigger
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    
+    reference_path = str(tmp_path / 'reference.csv')
+    pd.DataFrame([_customer(i) for i in range(500)]).to_csv(reference_path, index=False)
+    logger = PredictionLogger(log_path=str(tmp_path / 'predictions'))
+    prediction = {'churn_prediction': True, 'churn_probability': 0.8, 'risk_level': 'high'}
+    
+    trigger = RetrainTrigger(min_new_samples=150)
+    trigger.prediction_logger = logger
+    trigger.drift_detector = DriftDetector(reference_path)
+    monkeypatch.setattr(logger, 'get_daily_predictions', lambda *a, **k: pytest.fail("read the whole day"))
+    
+    for i in range(100):
+        logger.log_prediction(_customer(i), prediction)
+    logger.flush()
+    assert trigger.should_retrain() == (False, "Only 100 new samples (min: 150)")
+    
+    for i in range(100, 200):
+        logger.log_prediction(_customer(i * 7), prediction)
+    logger.flush()
+    retrain, reason = trigger.should_retrain()
+    assert trigger.traffic.rows == 200
+    
+    rows = pd.DataFrame([_customer(i) for i in range(100)] + [_customer(i * 7) for i in range(100, 200)])
+    expected = DriftDetector(reference_path).calculate_drift(rows)['overall_drift_score']
+    assert trigger.drift_detector.drift_history[-1]['overall_drift_score'] == pytest.approx(expected)
+    assert retrain == (expected > trigger.drift_threshold)
+
+def test_migrate_jsonl_to_parquet(tmp_path):
+    """Existing JSONL logs convert to the same rows in Parquet"""
+    jsonl_logger = PredictionLogger(log_path=str(tmp_path))
+    prediction = {'churn_prediction': False, 'churn_probability': 0.1, 'risk_level': 'low'}
+    for i in range(30):
+        jsonl_logger.log_prediction(_customer(i), prediction)
+    jsonl_logger.flush()
+    expected = jsonl_logger.get_daily_predictions()
+    
+    migrated = migrate(str(tmp_path))
+    assert list(migrated.values()) == [30]
+    
+    df = PredictionLogger(log_path=str(tmp_path)).get_daily_predictions()
+    assert len(df) == 30
+    assert list(df['customer_id']) == list(expected['customer_id'])
+    assert np.allclose(df['monthly_charges'], expected['monthly_charges'])
+
+def test_incremental_retrain(tmp_path):
+    """Incremental mode adds trees fitted on logged predictions with outcomes"""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+    from model_registry import ModelRegistry
+    from monitoring.retrain_trigger import RetrainTrigger
+    from train_pipeline import FEATURE_COLS
+    
+    rng = np.random.RandomState(0)
+    contracts = ['Month-to-Month', 'One Year', 'Two Year']
+    payments = ['Bank Transfer', 'Credit Card', 'Electronic Check']
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    joblib.dump(LabelEncoder().fit(contracts), models_dir / 'contract_encoder.pkl')
+    joblib.dump(LabelEncoder().fit(payments), models_dir / 'payment_encoder.pkl')
+    
+    X = pd.DataFrame(rng.rand(300, 8) * [1000, 100, 5000, 5, 300, 5, 3, 3], columns=FEATURE_COLS).round()
+    base = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=42)
+    base.fit(X, rng.randint(0, 2, 300))
+    base_path = str(models_dir / 'churn_model_base.pkl')
+    joblib.dump(base, base_path)
+    
+    # Today's logged predictions plus their observed outcomes
+    logger = PredictionLogger(log_path=str(tmp_path / 'predictions'))
+    prediction = {'churn_prediction': False, 'churn_probability': 0.2, 'risk_level': 'low'}
+    customers = [dict(_customer(i), contract_type=contracts[i % 3]) for i in range(600)]
+    customers[0]['payment_method'] = 'Cash'  # unknown to the encoder, skipped
+    for customer in customers:
+        logger.log_prediction(customer, prediction)
+    logger.flush()
+    outcomes_path = str(tmp_path / 'outcomes.csv')
+    pd.DataFrame({
+        'customer_id': range(600),
+        'churned': [int(c['contract_type'] == 'Month-to-Month') for c in customers]
+    }).to_csv(outcomes_path, index=False)
+    
+    registry_path = str(models_dir / 'registry.json')
+    trigger = RetrainTrigger(
+        mode='incremental', outcomes_path=outcomes_path, n_new_trees=30,
+        min_labelled_samples=100, models_dir=str(models_dir), registry_path=registry_path
+    )
+    trigger.prediction_logger = logger
+    assert len(trigger.load_labelled_window()) == 600
+    
+    version = trigger.incremental_retrain()
+    
+    entry = ModelRegistry(registry_path).registry['models'][version - 1]
+    assert entry['status'] == 'staging'
+    assert entry['metadata']['mode'] == 'incremental'
+    assert entry['metadata']['base_path'] == base_path
+    assert entry['metadata']['n_samples'] == 599
+    
+    model = joblib.load(entry['path'])
+    assert model.n_estimators == 40
+    assert all(a is b or np.array_equal(a.tree_.threshold, b.tree_.threshold)
+               for a, b in zip(model.estimators_[:10], base.estimators_))
+    # The new trees learn the outcome pattern the noisy base model lacks
+    assert entry['metrics']['f1'] > 0.8
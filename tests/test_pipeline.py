@@ -27,7 +27,30 @@ def test_data_generation():
     if os.path.exists(test_path):
         os.remove(test_path)
 
-def test_preprocessing():
+def test_chunked_generation_is_reproducible(tmp_path):
+    """Chunks come out the same sequentially, in parallel and sharded"""
+    from generate_data import generate_dataset, generate_chunk
+    
+    generate_dataset(2500, str(tmp_path / 'seq.csv'), chunk_size=600, workers=1)
+    generate_dataset(2500, str(tmp_path / 'par.csv'), chunk_size=600, workers=2)
+    result = generate_dataset(2500, str(tmp_path / 'shards'), chunk_size=600, shards=2, fmt='parquet')
+    
+    seq = pd.read_csv(tmp_path / 'seq.csv')
+    assert seq['customer_id'].tolist() == list(range(1, 2501))
+    assert seq.equals(pd.read_csv(tmp_path / 'par.csv'))
+    sharded = pd.concat([pd.read_parquet(p) for p in result['paths']], ignore_index=True)
+    assert len(result['paths']) == 2
+    assert np.allclose(sharded['monthly_charges'], seq['monthly_charges'])
+    assert (sharded['contract_type'].astype(str) == seq['contract_type']).all()
+    
+    reference = generate_chunk(0, 20000)
+    drifted = generate_chunk(0, 20000, drift=0.5)
+    assert drifted['monthly_charges'].between(20, 150).all()
+    assert drifted['monthly_charges'].mean() > reference['monthly_charges'].mean() + 10
+    assert drifted['support_tickets'].mean() > reference['support_tickets'].mean()
+    assert (drifted['contract_type'] == 'Month-to-Month').mean() > 0.6
+
+def test_preprocessing(tmp_path):
     """Test data preprocessing"""
     from generate_data import generate_data
     import train_pipeline
@@ -38,14 +61,47 @@ def test_preprocessing():
     
     # Test preprocessing
     try:
-        X_train, X_test, y_train, y_test = train_pipeline.load_and_preprocess()
+        X_train, X_test, y_train, y_test = train_pipeline.load_and_preprocess(models_dir=str(tmp_path))
         assert len(X_train) > 0
         assert len(X_test) > 0
         assert X_train.shape[1] == 8  # 8 features
     except Exception as e:
         pytest.fail(f"Preprocessing failed: {e}")
 
-def test_model_performance():
+@pytest.mark.parametrize('cache_dir', ['cache', ''])
+def test_chunked_preprocessing_matches_single_chunk(tmp_path, monkeypatch, cache_dir):
+    """Several chunks give the same matrix, splits and features as one chunk"""
+    import dataset_cache
+    from generate_data import generate_data
+    import train_pipeline
+    
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path / cache_dir) if cache_dir else '')
+    source = str(tmp_path / 'customers.csv')
+    df = generate_data(n_customers=500, output_path=source)
+    
+    single = train_pipeline.load_and_preprocess(source, chunksize=1_000_000, models_dir=str(tmp_path / 'single'))
+    timings = {}
+    chunked = train_pipeline.load_and_preprocess(source, chunksize=64, timings=timings, models_dir=str(tmp_path / 'chunked'))
+    assert len(list(train_pipeline._read_chunks(source, 64))) == 8
+    assert {'scan', 'encode', 'split'} <= set(timings)
+    
+    for a, b in zip(single, chunked):
+        if isinstance(a, pd.DataFrame):
+            pd.testing.assert_frame_equal(a, b)
+        else:
+            pd.testing.assert_series_equal(a, b)
+    
+    # The same as preprocessing the whole frame in memory
+    (X_train, X_test, y_train, y_test), _ = train_pipeline.preprocess(df)
+    pd.testing.assert_frame_equal(X_train, chunked[0])
+    pd.testing.assert_series_equal(y_test, chunked[3])
+    
+    from features import FEATURES_FILE, FeaturePipeline
+    saved = [FeaturePipeline.load(str(tmp_path / d / FEATURES_FILE)) for d in ('single', 'chunked')]
+    assert saved[0].contract_table.classes == saved[1].contract_table.classes
+    assert saved[0].payment_table.classes == saved[1].payment_table.classes
+
+def test_model_performance(tmp_path):
     """Test model achieves minimum performance"""
     from generate_data import generate_data
     import train_pipeline
@@ -58,7 +114,7 @@ def test_model_performance():
     os.makedirs('models', exist_ok=True)
     generate_data(n_customers=1000, output_path='data/raw/customer_data.csv')
     
-    X_train, X_test, y_train, y_test = train_pipeline.load_and_preprocess()
+    X_train, X_test, y_train, y_test = train_pipeline.load_and_preprocess(models_dir=str(tmp_path))
     
     # Train without MLflow
     from sklearn.ensemble import RandomForestClassifier
@@ -74,3 +130,237 @@ def test_model_performance():
     # Minimum acceptable performance
     assert f1 > 0.4, f"F1 score {f1:.4f} below threshold"
     assert accuracy > 0.5, f"Accuracy {accuracy:.4f} below threshold"
+
+def test_compiled_model_matches_sklearn(tmp_path):
+    """Compiled flat-array forest reproduces sklearn probabilities"""
+    from sklearn.ensemble import RandomForestClassifier
+    from compiled_model import CompiledForest
+    
+    rng = np.random.RandomState(0)
+    X = rng.rand(2000, 8)
+    y = (X[:, 0] + X[:, 6] * 0.5 + rng.rand(2000) * 0.3 > 0.9).astype(int)
+    model = RandomForestClassifier(n_estimators=30, max_depth=8, random_state=42)
+    model.fit(X, y)
+    
+    compiled = CompiledForest.from_sklearn(model)
+    path = str(tmp_path / 'model.compiled')
+    compiled.save(path)
+    loaded = CompiledForest.load(path, mmap_mode='r')
+    assert isinstance(loaded.threshold, np.memmap)
+    
+    # Mapped forests are re-mapped rather than copied when pickled
+    import pickle
+    unpickled = pickle.loads(pickle.dumps(loaded))
+    assert isinstance(unpickled.value, np.memmap)
+    
+    # Single rows, small batches and a batch larger than one chunk
+    for n in [1, 7, 3000]:
+        X_new = rng.rand(n, 8) * 1.2 - 0.1
+        expected = model.predict_proba(X_new)
+        np.testing.assert_allclose(compiled.predict_proba(X_new), expected, atol=1e-12)
+        np.testing.assert_allclose(loaded.predict_proba(X_new), expected, atol=1e-12)
+        np.testing.assert_array_equal(loaded.predict(X_new), model.predict(X_new))
+    
+    assert loaded.n_features_in_ == 8
+    assert loaded.n_estimators == 30
+
+def test_category_table_matches_label_encoder():
+    """Lookup tables give the same codes as the fitted LabelEncoder"""
+    from sklearn.preprocessing import LabelEncoder
+    from features import CategoryTable, UnknownCategoryError
+    
+    encoder = LabelEncoder().fit(['Month-to-Month', 'One Year', 'Two Year'])
+    table = CategoryTable.from_encoder('contract_type', encoder)
+    values = ['Two Year', 'Month-to-Month', 'One Year', 'Two Year']
+    
+    assert [table.encode(v) for v in values] == list(encoder.transform(values))
+    
+    codes, known = table.encode_many(values + ['Lifetime'])
+    assert list(codes[:4]) == list(encoder.transform(values))
+    assert list(known) == [True, True, True, True, False]
+    assert codes[4] == -1
+    
+    with pytest.raises(UnknownCategoryError) as exc:
+        table.encode('Lifetime')
+    assert exc.value.allowed == ['Month-to-Month', 'One Year', 'Two Year']
+
+def test_successive_halving_search():
+    """Tuning keeps the best trials and gives them more rows each rung"""
+    from tuning import successive_halving, SEARCH_SPACE
+    
+    rng = np.random.RandomState(0)
+    X = rng.rand(1500, 8)
+    y = (X[:, 0] + X[:, 6] * 0.5 + rng.rand(1500) * 0.3 > 0.9).astype(int)
+    
+    trials = []
+    best = successive_halving(X, y, n_trials=6, eta=3, min_rows=200, n_workers=2, on_trial=trials.append)
+    
+    # 6 trials on 200 rows, the best 2 on 600, the winner on 1200
+    assert [t['rung'] for t in trials] == [0] * 6 + [1] * 2 + [2]
+    assert [t['n_rows'] for t in trials] == [200] * 6 + [600] * 2 + [1200]
+    assert best is trials[-1]
+    rung_1 = {t['trial_id'] for t in trials if t['rung'] == 1}
+    assert best['trial_id'] in rung_1
+    assert sorted(t['f1'] for t in trials[:6])[-2:] == sorted(t['f1'] for t in trials[:6] if t['trial_id'] in rung_1)
+    assert all(best['params'][name] in values for name, values in SEARCH_SPACE.items())
+
+def test_native_validation(tmp_path, monkeypatch):
+    """Native rule engine reports violations the way GX does, also when streaming"""
+    import dataset_cache
+    from generate_data import generate_data
+    from validate_data import load_expectations, validate, validate_chunks, validate_csv
+    
+    df = generate_data(n_customers=300, output_path=str(tmp_path / 'clean.csv'))
+    expectations = load_expectations()
+    result = validate(df, expectations)
+    # Every value rule passes; only the 10k minimum row count fails
+    assert [r['success'] for r in result['results']] == [True, True, True, False]
+    assert result['results'][3]['result']['observed_value'] == 300
+    
+    df.loc[[3, 5], 'monthly_charges'] = [250.0, -1.0]
+    df.loc[7, 'contract_type'] = 'Lifetime'
+    df.loc[8, 'contract_type'] = None
+    df['customer_id'] = df['customer_id'].astype(float)
+    df.loc[9, 'customer_id'] = None
+    path = str(tmp_path / 'dirty.csv')
+    df.to_csv(path, index=False)
+    
+    whole = validate(df, expectations)
+    streamed = validate_chunks((df.iloc[i:i + 70] for i in range(0, len(df), 70)), expectations)
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    from_csv = validate_csv(path, expectations, chunksize=70)
+    # Without the cache the CSV is read with each rule's dtype
+    monkeypatch.setattr(dataset_cache, 'CACHE_DIR', '')
+    from_text = validate_csv(path, expectations, chunksize=70)
+    
+    for result in [whole, streamed, from_csv, from_text]:
+        assert not result['success']
+        assert result['statistics']['unsuccessful_expectations'] == 4
+        between, not_null, in_set, _ = [r['result'] for r in result['results']]
+        assert between['unexpected_count'] == 2
+        assert between['partial_unexpected_list'] == [250.0, -1.0]
+        assert not_null['unexpected_count'] == 1
+        assert in_set['unexpected_count'] == 1
+        assert in_set['missing_count'] == 1
+        assert in_set['partial_unexpected_list'] == ['Lifetime']
+
+def test_benchmark_baseline_comparison():
+    from tests.benchmark_suite import compare, measure
+    
+    result = measure(lambda: sum(range(1000)), repeat=5, rows=1000)
+    assert result['repeat'] == 5 and result['min_ms'] <= result['median_ms'] <= result['p95_ms']
+    
+    meta = {'machine': 'x86_64', 'cpus': 1}
+    baseline = {'meta': meta, 'results': {'predict_single': {'median_ms': 10.0}, 'drift_1000': {'median_ms': 4.0}}}
+    current = {'meta': meta, 'results': {
+        'predict_single': {'median_ms': 11.0},
+        'drift_1000': {'median_ms': 6.0},
+        'train_5000': {'median_ms': 900.0}  # not in the baseline
+    }}
+    regressions = compare(current, baseline, tolerance=0.25)
+    assert [r['name'] for r in regressions] == ['drift_1000']
+    assert regressions[0]['ratio'] == pytest.approx(1.5)
+    
+    # Baselines from other hardware aren't compared
+    assert compare({**current, 'meta': {'machine': 'x86_64', 'cpus': 8}}, baseline) == []
+
+def test_dataset_cache(tmp_path, monkeypatch):
+    """CSV is converted once, re-converted when it changes, and read back exactly"""
+    import dataset_cache
+    from generate_data import generate_data
+    
+    source = str(tmp_path / 'customers.csv')
+    cache_dir = str(tmp_path / 'cache')
+    generate_data(n_customers=500, output_path=source)
+    
+    path = dataset_cache.materialize(source, cache_dir)
+    assert dataset_cache.materialize(source, cache_dir) == path
+    
+    cached = dataset_cache.read_dataframe(source, cache_dir=cache_dir)
+    expected = pd.read_csv(source, float_precision='round_trip')
+    assert cached['contract_type'].dtype == 'category'
+    pd.testing.assert_frame_equal(cached.astype({'contract_type': object, 'payment_method': object}), expected)
+    
+    batches = list(dataset_cache.iter_batches(source, ['customer_id', 'monthly_charges'], 200, cache_dir))
+    assert [len(b) for b in batches] == [200, 200, 100]
+    assert list(batches[0].columns) == ['customer_id', 'monthly_charges']
+    
+    # A changed file gets a new cache entry and the old one is removed
+    expected.head(100).to_csv(source, index=False)
+    new_path = dataset_cache.materialize(source, cache_dir)
+    assert new_path != path and not os.path.exists(path)
+    assert len(dataset_cache.read_dataframe(source, cache_dir=cache_dir)) == 100
+    
+    # Columns whose type changes after the first block fall back to the CSV
+    monkeypatch.setattr(dataset_cache, 'BLOCK_SIZE', 256)
+    mixed = str(tmp_path / 'mixed.csv')
+    pd.DataFrame({'a': [1] * 100 + ['x'], 'b': range(101)}).to_csv(mixed, index=False)
+    df = dataset_cache.read_dataframe(mixed, cache_dir=cache_dir, dtype={'b': 'int32'})
+    assert len(df) == 101 and df['a'].iloc[-1] == 'x'
+    assert df['b'].dtype == np.int32
+    assert not [f for f in os.listdir(cache_dir) if f.startswith('mixed') and 'arrow' in f]
+    
+    # Files with the same name elsewhere, or sharing a name prefix, keep their own entries
+    other_dir = tmp_path / 'other'
+    other_dir.mkdir()
+    other = str(other_dir / 'customers.csv')
+    prefixed = str(tmp_path / 'customers.v2.csv')
+    expected.head(50).to_csv(other, index=False)
+    expected.head(20).to_csv(prefixed, index=False)
+    other_path = dataset_cache.materialize(other, cache_dir)
+    prefixed_path = dataset_cache.materialize(prefixed, cache_dir)
+    assert len({new_path, other_path, prefixed_path}) == 3
+    assert all(os.path.exists(p) for p in (new_path, other_path, prefixed_path))
+    assert len(dataset_cache.read_dataframe(source, cache_dir=cache_dir)) == 100
+    assert len(dataset_cache.read_dataframe(other, cache_dir=cache_dir)) == 50
+    assert not [f for f in os.listdir(cache_dir) if f.endswith('.tmp')]
+    
+    # Beyond the entry limit the least recently used copies are removed
+    dataset_cache.evict(cache_dir, max_entries=5)
+    assert all(os.path.exists(p) for p in (new_path, other_path, prefixed_path))
+    os.utime(other_path, (0, 0))
+    dataset_cache.materialize(source, cache_dir)
+    dataset_cache.evict(cache_dir, max_entries=2)
+    assert os.path.exists(new_path) and os.path.exists(prefixed_path) and not os.path.exists(other_path)
+    assert not os.path.exists(os.path.join(cache_dir, os.path.basename(other_path).split('.')[0] + '.source.json'))
+    assert len(dataset_cache.read_dataframe(other, cache_dir=cache_dir)) == 50
+
+def test_feature_pipeline_train_serve_parity(tmp_path):
+    """Serving rebuilds exactly the rows the model was trained on, derived features included"""
+    from generate_data import generate_data
+    from features import FeaturePipeline, UnknownCategoryError
+    import train_pipeline
+    
+    df = generate_data(n_customers=400, output_path=str(tmp_path / 'customers.csv'))
+    derived = ['charges_per_tenure_day', 'tickets_per_month']
+    (X_train, X_test, y_train, y_test), features = train_pipeline.preprocess(df, derived=derived)
+    assert X_train.shape[1] == 10 and X_train.dtypes.eq(np.float32).all()
+    assert list(X_train.columns) == train_pipeline.FEATURE_COLS + derived
+    
+    rows = df.loc[X_test.index]
+    assert np.array_equal(features.transform(rows)[0], X_test.to_numpy())
+    # Column dicts and record arrays give the same matrix as DataFrames
+    assert np.array_equal(features.transform({k: rows[k].tolist() for k in rows})[0], X_test.to_numpy())
+    assert np.array_equal(features.transform(rows.to_records(index=False))[0], X_test.to_numpy())
+    expected = rows['total_charges'].to_numpy(np.float32) / np.maximum(rows['account_age_days'].to_numpy(np.float32), 1)
+    assert np.allclose(X_test['charges_per_tenure_day'], expected)
+    
+    # The pipeline is saved next to the model and found from its path
+    from sklearn.ensemble import RandomForestClassifier
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X_train, y_train)
+    model_path = train_pipeline.save_model(model, str(tmp_path), features=features)
+    loaded = FeaturePipeline.for_model(model_path)
+    assert loaded.feature_names == features.feature_names
+    X, valid, errors = loaded.transform(rows.assign(contract_type=['Lifetime'] + list(rows['contract_type'][1:])))
+    assert not valid[0] and valid[1:].all()
+    assert isinstance(errors[0], UnknownCategoryError) and errors[0].field == 'contract_type'
+    assert np.array_equal(X[1:], X_test.to_numpy()[1:])
+    
+    # A few rows are encoded with dict lookups, and agree with the vectorized path
+    for i in range(3):
+        one = {k: [v] for k, v in rows.iloc[i].items()}
+        assert np.array_equal(loaded.transform(one)[0], X_test.to_numpy()[i:i + 1])
+    codes, valid, errors = loaded.encode({'contract_type': ['One Year', 'Lifetime', None],
+                                          'payment_method': ['Credit Card'] * 3})
+    assert list(valid) == [True, False, False] and codes['contract_type'][0] == 1
+    assert isinstance(errors[1], UnknownCategoryError)
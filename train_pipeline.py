@@ -1,37 +1,202 @@
 import mlflow
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-from sklearn.preprocessing import LabelEncoder
 import joblib
 from datetime import datetime
 import os
+import argparse
+import resource
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+import dataset_cache
+from compiled_model import CompiledForest, compiled_path_for
+from features import (
+    CATEGORICAL_FEATURES, FEATURES_FILE, NUMERIC_FEATURES, CategoryTable, FeaturePipeline, features_path_for
+)
+from model_registry import ModelRegistry
+from tuning import successive_halving
 
-def load_and_preprocess():
-    df = pd.read_csv('data/raw/customer_data.csv')
-    
-    # Encode categoricals
-    le_contract = LabelEncoder()
-    le_payment = LabelEncoder()
-    df['contract_type_encoded'] = le_contract.fit_transform(df['contract_type'])
-    df['payment_method_encoded'] = le_payment.fit_transform(df['payment_method'])
-    
-    # Save encoders
-    os.makedirs('models', exist_ok=True)
-    joblib.dump(le_contract, 'models/contract_encoder.pkl')
-    joblib.dump(le_payment, 'models/payment_encoder.pkl')
-    
-    feature_cols = ['account_age_days', 'monthly_charges', 'total_charges', 
-                    'support_tickets', 'monthly_usage_gb', 'num_services',
-                    'contract_type_encoded', 'payment_method_encoded']
+# Explicit dtypes keep chunked reads small and skip pandas type inference
+RAW_DTYPES = {
+    'account_age_days': 'int32',
+    'monthly_charges': 'float32',
+    'total_charges': 'float32',
+    'support_tickets': 'int32',
+    'contract_type': 'category',
+    'payment_method': 'category',
+    'monthly_usage_gb': 'float32',
+    'num_services': 'int32',
+    'churned': 'int8'
+}
+
+# Model input without derived features; see features.FeaturePipeline
+FEATURE_COLS = NUMERIC_FEATURES + [f'{c}_encoded' for c in CATEGORICAL_FEATURES]
+
+# Forest parameters used unless tuning picks others
+MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'random_state': 42
+}
+
+@contextmanager
+def stage(name: str, timings: dict = None):
+    """Record wall-clock time and peak RSS (so far) for a pipeline stage"""
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if timings is not None:
+        timings[name] = {'seconds': seconds, 'peak_rss_mb': peak_rss_mb}
+    print(f"  [{name}] {seconds:.2f}s, peak RSS {peak_rss_mb:.0f} MB")
+
+def _chunk_arrays(chunk: pd.DataFrame):
+    """Raw input columns (numeric as float32, categoricals as Categoricals) and the int8 target"""
+    columns = {name: chunk[name].to_numpy(dtype=np.float32) for name in NUMERIC_FEATURES}
+    columns.update({name: pd.Categorical(chunk[name]) for name in CATEGORICAL_FEATURES})
+    return columns, chunk['churned'].to_numpy(dtype=np.int8)
+
+def _read_chunks(data_path: str, chunksize: int) -> Iterator:
+    """Stream the raw data as compact per-chunk arrays.
+
+    Chunks are sliced from the memory-mapped dataset cache and converted
+    one at a time as they are consumed.
+    """
+    batches = dataset_cache.iter_batches(
+        data_path, columns=list(RAW_DTYPES), batch_size=chunksize, dtype=RAW_DTYPES
+    )
+    return (_chunk_arrays(chunk) for chunk in batches)
+
+def _fit_table(field: str, categoricals: list) -> CategoryTable:
+    """Category table over every value of a column split across chunks"""
+    # Sorted categories are exactly what LabelEncoder.fit would produce
+    return CategoryTable(field, set().union(*(c.categories for c in categoricals)))
+
+def _scan(data_path: str, chunksize: int):
+    """Row count and category tables of the raw data, read from its categorical columns only"""
+    n_rows = 0
+    categories = {name: set() for name in CATEGORICAL_FEATURES}
+    for chunk in dataset_cache.iter_batches(
+        data_path, columns=list(CATEGORICAL_FEATURES), batch_size=chunksize, dtype=RAW_DTYPES
+    ):
+        n_rows += len(chunk)
+        for name in CATEGORICAL_FEATURES:
+            categories[name].update(pd.Categorical(chunk[name]).categories)
+    # Sorted categories are exactly what LabelEncoder.fit would produce
+    return n_rows, [CategoryTable(name, categories[name]) for name in CATEGORICAL_FEATURES]
+
+def _encode_and_split(chunks: Iterable, n_rows: int, tables: list, timings: dict = None, derived=()):
+    """Encode chunks as they arrive into one float32 matrix and split it.
+
+    ``tables`` are the category tables of the whole data, so each chunk is
+    encoded and released before the next is read. Returns the
+    (X_train, X_test, y_train, y_test) split and the FeaturePipeline.
+    """
+    with stage('encode', timings):
+        features = FeaturePipeline(*tables, derived=derived)
+        X = np.empty((n_rows, features.n_features), dtype=np.float32)
+        y = np.empty(n_rows, dtype=np.int8)
+        start = 0
+        for columns, target in chunks:
+            end = start + len(target)
+            X[start:end] = features.transform(columns)[0]
+            y[start:end] = target
+            start = end
+        if start != n_rows:
+            raise ValueError(f"Expected {n_rows} rows but read {start}; did the data change while loading?")
+        y = pd.Series(y, name='churned')
     
-    X = df[feature_cols]
-    y = df['churned']
+    with stage('split', timings):
+        X = pd.DataFrame(X, columns=features.feature_names, copy=False)
+        splits = train_test_split(X, y, test_size=0.2, random_state=42)
+    return splits, features
+
+def save_encoders(le_contract, le_payment, models_dir: str = 'models'):
+    os.makedirs(models_dir, exist_ok=True)
+    joblib.dump(le_contract, os.path.join(models_dir, 'contract_encoder.pkl'))
+    joblib.dump(le_payment, os.path.join(models_dir, 'payment_encoder.pkl'))
+
+def save_features(features: FeaturePipeline, models_dir: str = 'models'):
+    """Save a fitted feature pipeline as the latest in ``models_dir``, plus its encoders"""
+    save_encoders(*features.label_encoders(), models_dir)
+    features.save(os.path.join(models_dir, FEATURES_FILE))
+
+def load_and_preprocess(
+    data_path: str = 'data/raw/customer_data.csv',
+    chunksize: int = 1_000_000,
+    timings: dict = None,
+    derived=(),
+    models_dir: str = 'models'
+):
+    """Load, encode and split the raw customer data.
+
+    The data is streamed twice through the dataset cache (memory-mapped
+    Arrow, or the CSV itself when caching is off) in chunks of
+    ``chunksize`` rows: once for the categorical columns, to fit the
+    category tables, then in full with each chunk encoded straight into
+    one float32 feature matrix. Peak
+    memory is roughly the final matrix plus one chunk. ``derived``
+    names extra features from ``features.DERIVED_FEATURES``. The fitted
+    feature pipeline is saved in ``models_dir``.
+    """
+    with stage('scan', timings):
+        n_rows, tables = _scan(data_path, chunksize)
     
-    return train_test_split(X, y, test_size=0.2, random_state=42)
+    splits, features = _encode_and_split(_read_chunks(data_path, chunksize), n_rows, tables, timings, derived)
+    save_features(features, models_dir)
+    return splits
+
+def preprocess(df: pd.DataFrame, timings: dict = None, derived=()):
+    """Encode and split raw customer data that is already in memory.
+
+    Unlike load_and_preprocess the feature pipeline is returned, not
+    saved, as ``(splits, features)``.
+    """
+    columns, target = _chunk_arrays(df)
+    tables = [_fit_table(name, [columns[name]]) for name in CATEGORICAL_FEATURES]
+    return _encode_and_split([(columns, target)], len(df), tables, timings, derived)
+
+def _log_trial(trial: dict):
+    """Record one tuning trial as a child run of the training run"""
+    with mlflow.start_run(run_name=f"trial-{trial['trial_id']}-rung-{trial['rung']}", nested=True):
+        mlflow.log_params(trial['params'])
+        mlflow.log_metrics({
+            'f1': trial['f1'],
+            'n_rows': trial['n_rows'],
+            'fit_seconds': trial['fit_seconds'],
+            'rung': trial['rung']
+        })
+
+def train_model(
+    X_train, y_train, X_test, y_test,
+    n_jobs: int = -1,
+    max_samples=None,
+    timings: dict = None,
+    tune_trials: int = 0,
+    register: bool = False,
+    features: FeaturePipeline = None
+):
+    """Fit, evaluate and export the forest.
 
-def train_model(X_train, y_train, X_test, y_test):
+    Trees are built on ``n_jobs`` cores (-1 = all). ``max_samples`` caps
+    the bootstrap sample per tree (a count or a fraction), which bounds
+    fit time and memory on very large training sets.
+
+    With ``tune_trials`` the forest parameters are first chosen by
+    successive halving over that many sampled configurations. With
+    ``register`` the saved model is added to the model registry.
+    ``features`` is saved with the model; by default the latest pipeline
+    in models/ is.
+    """
+    if timings is None:
+        timings = {}
+    
     # Check if MLflow is configured
     use_mlflow = os.environ.get('MLFLOW_TRACKING_URI', 'sqlite:///mlflow.db') != ''
     
@@ -41,43 +206,143 @@ def train_model(X_train, y_train, X_test, y_test):
         mlflow.start_run()
     
     # Log parameters
-    params = {
-        'n_estimators': 100,
-        'max_depth': 10,
-        'min_samples_split': 5,
-        'random_state': 42
-    }
+    params = dict(MODEL_PARAMS, max_samples=max_samples)
+    
+    if tune_trials:
+        with stage('tune', timings):
+            best = successive_halving(
+                X_train, y_train,
+                n_trials=tune_trials,
+                n_workers=n_jobs if n_jobs > 0 else None,
+                on_trial=_log_trial if use_mlflow else None
+            )
+        params.update(best['params'])
+        print(f"Best trial {best['trial_id']}: F1 {best['f1']:.4f} with {best['params']}")
     
     if use_mlflow:
         mlflow.log_params(params)
     
     # Train
-    model = RandomForestClassifier(**params)
-    model.fit(X_train, y_train)
+    with stage('fit', timings):
+        model = RandomForestClassifier(**params, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
     
     # Evaluate
-    y_pred = model.predict(X_test)
-    metrics = {
-        'accuracy': accuracy_score(y_test, y_pred),
-        'precision': precision_score(y_test, y_pred),
-        'recall': recall_score(y_test, y_pred),
-        'f1': f1_score(y_test, y_pred)
-    }
-    
-    if use_mlflow:
-        mlflow.log_metrics(metrics)
+    with stage('evaluate', timings):
+        metrics = evaluate(model, X_test, y_test)
     
     # Save model
-    model_path = f"models/churn_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pkl"
-    joblib.dump(model, model_path)
+    with stage('export', timings):
+        model_path = save_model(model, features=features)
+        compiled_path = compiled_path_for(model_path)
+    
+    if register:
+        ModelRegistry().register_model(
+            model_path, metrics,
+            metadata={'n_samples': len(X_train), 'params': params, 'tuned': bool(tune_trials)}
+        )
     
     if use_mlflow:
+        mlflow.log_metrics(metrics)
+        mlflow.log_metrics({
+            f"{name}_{key}": value
+            for name, stage_timing in timings.items()
+            for key, value in stage_timing.items()
+        })
         mlflow.log_artifact(model_path)
+        mlflow.log_artifacts(compiled_path, artifact_path=os.path.basename(compiled_path))
         mlflow.end_run()
     
     print(f"Model trained. F1 Score: {metrics['f1']:.4f}")
     return model, metrics
 
+def warm_start_train(
+    base_model_path: str,
+    X_new, y_new,
+    n_new_trees: int = 20,
+    models_dir: str = 'models',
+    n_jobs: int = -1,
+    timings: dict = None,
+    features: FeaturePipeline = None
+):
+    """Extend a trained forest with trees fitted on newly labelled data.
+
+    The existing trees are kept as they are; ``n_new_trees`` more are
+    grown on 80% of the new rows with ``warm_start`` and the result is
+    evaluated on the remaining 20%. Returns the model, its metrics and
+    the path it was saved to. The base model's feature pipeline is saved
+    with the new one unless ``features`` is given.
+    """
+    with stage('fit', timings):
+        model = joblib.load(base_model_path)
+        X_fit, X_eval, y_fit, y_eval = train_test_split(
+            X_new, y_new, test_size=0.2, random_state=42, stratify=y_new
+        )
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + n_new_trees, n_jobs=n_jobs)
+        model.fit(X_fit, y_fit)
+        model.set_params(warm_start=False)
+    
+    with stage('evaluate', timings):
+        metrics = evaluate(model, X_eval, y_eval)
+    
+    with stage('export', timings):
+        model_path = save_model(model, models_dir, features or FeaturePipeline.for_model(base_model_path))
+    
+    print(f"Model extended to {model.n_estimators} trees. F1 Score: {metrics['f1']:.4f}")
+    return model, metrics, model_path
+
+def evaluate(model, X_test, y_test) -> dict:
+    y_pred = model.predict(X_test)
+    return {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred),
+        'recall': recall_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred)
+    }
+
+def save_model(model, models_dir: str = 'models', features: FeaturePipeline = None) -> str:
+    """Save a timestamped model pickle, its feature pipeline and its compiled export"""
+    model_path = os.path.join(models_dir, f"churn_model_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pkl")
+    joblib.dump(model, model_path)
+    
+    if features is None:
+        try:
+            features = FeaturePipeline.from_dir(models_dir)
+        except FileNotFoundError:
+            print("⚠ No feature pipeline found; saving model without one")
+    if features is not None:
+        features.save(features_path_for(model_path))
+    
+    # Export flat-array version for fast, memory-mapped serving
+    CompiledForest.from_sklearn(model).save(compiled_path_for(model_path))
+    return model_path
+
+def _max_samples(value: str):
+    """--max-samples accepts a row count or a fraction of the training set"""
+    return float(value) if '.' in value else int(value)
+
 if __name__ == "__main__":
-    X_train, X_test, y_train, y_test = load_and_preprocess()
-    model, metrics = train_model(X_train, y_train, X_test, y_test)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='data/raw/customer_data.csv')
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    parser.add_argument('--n-jobs', type=int, default=int(os.environ.get('TRAIN_N_JOBS', '-1')))
+    parser.add_argument('--max-samples', type=_max_samples, default=None)
+    parser.add_argument('--tune-trials', type=int, default=0,
+                        help='Tune forest parameters over this many configurations first')
+    parser.add_argument('--register', action='store_true', help='Add the trained model to the registry')
+    parser.add_argument('--derived-features', default='',
+                        help='Comma-separated extra features, e.g. charges_per_tenure_day,tickets_per_month')
+    args = parser.parse_args()
+    
+    timings = {}
+    derived = [name for name in args.derived_features.split(',') if name]
+    X_train, X_test, y_train, y_test = load_and_preprocess(args.data, args.chunksize, timings, derived)
+    model, metrics = train_model(
+        X_train, y_train, X_test, y_test,
+        n_jobs=args.n_jobs, max_samples=args.max_samples, timings=timings,
+        tune_trials=args.tune_trials, register=args.register
+    )
+    
+    print("\n=== Stage timings ===")
+    for name, t in timings.items():
+        print(f"{name:<10}{t['seconds']:>10.2f}s{t['peak_rss_mb']:>10.0f} MB peak")
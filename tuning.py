@@ -0,0 +1,115 @@
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+# Forest parameters sampled by the search
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200, 300],
+    'max_depth': [6, 8, 10, 14, 18, None],
+    'min_samples_split': [2, 5, 10, 20],
+    'min_samples_leaf': [1, 2, 5, 10],
+    'max_features': ['sqrt', 0.5, None],
+    'class_weight': [None, 'balanced', 'balanced_subsample'],
+}
+
+# Training data as seen by worker processes (set by _init_worker)
+_data = {}
+
+def sample_configs(n_trials: int, seed: int = 42) -> list:
+    """Draw ``n_trials`` distinct random configurations from SEARCH_SPACE"""
+    rng = np.random.default_rng(seed)
+    n_combinations = math.prod(len(values) for values in SEARCH_SPACE.values())
+    configs, seen = [], set()
+    while len(configs) < min(n_trials, n_combinations):
+        config = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+        key = tuple(sorted(config.items(), key=lambda item: item[0]))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+def _init_worker(data_path: str):
+    # Every worker maps the same file; pages are shared, not copied
+    _data.update(joblib.load(data_path, mmap_mode='r'))
+
+def _run_trial(trial_id: int, params: dict, n_rows: int, seed: int) -> dict:
+    """Fit on the first ``n_rows`` (pre-shuffled) rows, score F1 on validation"""
+    start = time.perf_counter()
+    model = RandomForestClassifier(**params, n_jobs=1, random_state=seed)
+    model.fit(_data['X_train'][:n_rows], _data['y_train'][:n_rows])
+    fit_seconds = time.perf_counter() - start
+    y_pred = model.predict(_data['X_val'])
+    return {
+        'trial_id': trial_id,
+        'params': params,
+        'n_rows': n_rows,
+        'f1': f1_score(_data['y_val'], y_pred),
+        'fit_seconds': fit_seconds
+    }
+
+def successive_halving(
+    X_train,
+    y_train,
+    n_trials: int = 27,
+    eta: int = 3,
+    min_rows: int = 2000,
+    val_size: float = 0.2,
+    n_workers: int = None,
+    seed: int = 42,
+    on_trial=None
+) -> dict:
+    """Search forest parameters with successive halving.
+
+    Every configuration is first trained on ``min_rows`` rows; each rung
+    keeps the best ``1/eta`` of the trials and gives them ``eta`` times
+    more rows, until one trial is left or all rows are used. Trials run in
+    a process pool that shares one memory-mapped copy of the data.
+
+    ``on_trial`` is called in this process with each finished trial and
+    its rung. Returns the best trial of the last rung.
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        np.asarray(X_train, dtype=np.float32), np.asarray(y_train),
+        test_size=val_size, random_state=seed, stratify=np.asarray(y_train)
+    )
+    configs = sample_configs(n_trials, seed)
+    n_workers = n_workers or os.cpu_count()
+
+    # Shuffled once, so the first n rows are always a random subsample
+    tmp_dir = tempfile.mkdtemp(prefix='churn-tuning-')
+    data_path = os.path.join(tmp_dir, 'data.joblib')
+    joblib.dump({'X_train': X_fit, 'y_train': y_fit, 'X_val': X_val, 'y_val': y_val}, data_path)
+    del X_fit, X_val
+
+    n_available = len(y_fit)
+    n_rows = min(min_rows, n_available)
+    trials = list(enumerate(configs))
+    rung = 0
+    try:
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(data_path,)) as pool:
+            while True:
+                futures = [pool.submit(_run_trial, i, params, n_rows, seed) for i, params in trials]
+                results = [f.result() for f in futures]
+                for result in results:
+                    result['rung'] = rung
+                    if on_trial is not None:
+                        on_trial(result)
+                results.sort(key=lambda r: r['f1'], reverse=True)
+                print(f"  rung {rung}: {len(results)} trials on {n_rows} rows, best F1 {results[0]['f1']:.4f}")
+
+                if len(results) == 1 or n_rows >= n_available:
+                    return results[0]
+                trials = [(r['trial_id'], r['params']) for r in results[:max(1, len(results) // eta)]]
+                n_rows = min(n_rows * eta, n_available)
+                rung += 1
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,26 +1,221 @@
-import great_expectations as gx
+import json
+from typing import Iterable, List
+
+import numpy as np
 import pandas as pd
 
-context = gx.get_context()
+import dataset_cache
+
+EXPECTATIONS_PATH = 'expectations.json'
+
+# Number of unexpected values kept per expectation, as in GX
+PARTIAL_UNEXPECTED_COUNT = 20
+
+def load_expectations(path: str = EXPECTATIONS_PATH) -> List[dict]:
+    """Read an expectation suite (GX JSON format) and return its expectations"""
+    with open(path, 'r') as f:
+        return json.load(f)['expectations']
+
+class ColumnMapExpectation:
+    """Per-value check on one column, accumulated over chunks.
+
+    Subclasses return a boolean mask of unexpected values for a chunk;
+    nulls are counted as missing and are never unexpected.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.column = config['kwargs']['column']
+        self.mostly = config['kwargs'].get('mostly', 1.0)
+        self.element_count = 0
+        self.missing_count = 0
+        self.unexpected_count = 0
+        self.partial_unexpected_list = []
+
+    def dtype(self):
+        """dtype to read the column with"""
+        return None
+
+    def missing(self, column: pd.Series) -> np.ndarray:
+        return column.isna().to_numpy()
+
+    def unexpected(self, column: pd.Series, missing: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def update(self, chunk: pd.DataFrame):
+        column = chunk[self.column]
+        missing = self.missing(column)
+        unexpected = self.unexpected(column, missing)
+        n_unexpected = int(np.count_nonzero(unexpected))
+
+        self.element_count += len(column)
+        self.missing_count += int(np.count_nonzero(missing))
+        self.unexpected_count += n_unexpected
+        if n_unexpected and len(self.partial_unexpected_list) < PARTIAL_UNEXPECTED_COUNT:
+            values = column[unexpected].head(PARTIAL_UNEXPECTED_COUNT - len(self.partial_unexpected_list))
+            self.partial_unexpected_list.extend(None if pd.isna(v) else v for v in values.tolist())
+
+    def result(self) -> dict:
+        nonmissing = self.element_count - self.missing_count
+        unexpected_percent = 100 * self.unexpected_count / nonmissing if nonmissing else 0.0
+        return {
+            'success': unexpected_percent <= 100 * (1 - self.mostly),
+            'expectation_config': self.config,
+            'result': {
+                'element_count': self.element_count,
+                'missing_count': self.missing_count,
+                'missing_percent': 100 * self.missing_count / self.element_count if self.element_count else None,
+                'unexpected_count': self.unexpected_count,
+                'unexpected_percent': unexpected_percent,
+                'unexpected_percent_total': (
+                    100 * self.unexpected_count / self.element_count if self.element_count else 0.0
+                ),
+                'partial_unexpected_list': self.partial_unexpected_list
+            }
+        }
+
+class ValuesBetween(ColumnMapExpectation):
+    def unexpected(self, column, missing):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        kwargs = self.config['kwargs']
+        unexpected = np.zeros(len(values), dtype=bool)
+        if kwargs.get('min_value') is not None:
+            unexpected |= values < kwargs['min_value']
+        if kwargs.get('max_value') is not None:
+            unexpected |= values > kwargs['max_value']
+        return unexpected
+
+class ValuesNotNull(ColumnMapExpectation):
+    # Nulls are what this expectation checks for, so none count as missing
+    def missing(self, column):
+        return np.zeros(len(column), dtype=bool)
+
+    def unexpected(self, column, missing):
+        return column.isna().to_numpy()
+
+class ValuesInSet(ColumnMapExpectation):
+    def dtype(self):
+        return 'category'
+
+    def unexpected(self, column, missing):
+        column = column.astype('category')
+        # Check each distinct value once, then map back through the codes
+        bad_category = ~column.cat.categories.isin(self.config['kwargs']['value_set'])
+        codes = column.cat.codes.to_numpy()
+        return ~missing & np.append(bad_category, False)[codes]
+
+class RowCountBetween:
+    column = None
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.row_count = 0
+
+    def update(self, chunk: pd.DataFrame):
+        self.row_count += len(chunk)
+
+    def result(self) -> dict:
+        kwargs = self.config['kwargs']
+        success = (
+            (kwargs.get('min_value') is None or self.row_count >= kwargs['min_value'])
+            and (kwargs.get('max_value') is None or self.row_count <= kwargs['max_value'])
+        )
+        return {
+            'success': success,
+            'expectation_config': self.config,
+            'result': {'observed_value': self.row_count}
+        }
+
+EXPECTATION_TYPES = {
+    'expect_column_values_to_be_between': ValuesBetween,
+    'expect_column_values_to_not_be_null': ValuesNotNull,
+    'expect_column_values_to_be_in_set': ValuesInSet,
+    'expect_table_row_count_to_be_between': RowCountBetween,
+}
+
+def _build(expectations: List[dict]) -> list:
+    checks = []
+    for config in expectations:
+        if config['expectation_type'] not in EXPECTATION_TYPES:
+            raise ValueError(f"Unsupported expectation: {config['expectation_type']}")
+        checks.append(EXPECTATION_TYPES[config['expectation_type']](config))
+    return checks
+
+def _summarize(checks: list) -> dict:
+    """Suite result in the layout of GX's ExpectationSuiteValidationResult"""
+    results = [check.result() for check in checks]
+    successful = sum(r['success'] for r in results)
+    return {
+        'success': successful == len(results),
+        'results': results,
+        'statistics': {
+            'evaluated_expectations': len(results),
+            'successful_expectations': successful,
+            'unsuccessful_expectations': len(results) - successful,
+            'success_percent': 100 * successful / len(results) if results else None
+        },
+        'meta': {'engine': 'native'}
+    }
+
+def validate_chunks(chunks: Iterable[pd.DataFrame], expectations: List[dict] = None) -> dict:
+    """Validate a stream of DataFrame chunks; only one chunk is held at a time"""
+    checks = _build(expectations if expectations is not None else load_expectations())
+    for chunk in chunks:
+        for check in checks:
+            check.update(chunk)
+    return _summarize(checks)
+
+def validate_csv(path: str, expectations: List[dict] = None, chunksize: int = 1_000_000) -> dict:
+    """Validate a CSV in chunks through the dataset cache, reading only the columns the rules use"""
+    checks = _build(expectations if expectations is not None else load_expectations())
+    columns = {c.column for c in checks if c.column is not None}
+    # Row counts alone still need one column to read
+    usecols = sorted(columns) if columns else list(pd.read_csv(path, nrows=0).columns[:1])
+    # Columns are read with a check's dtype only if no other check on them needs the default
+    dtypes = {}
+    for check in checks:
+        if check.column is not None:
+            dtypes.setdefault(check.column, set()).add(check.dtype())
+    dtype = {column: types.pop() for column, types in dtypes.items() if len(types) == 1 and None not in types}
+
+    for chunk in dataset_cache.iter_batches(path, columns=usecols, batch_size=chunksize, dtype=dtype):
+        for check in checks:
+            check.update(chunk)
+    return _summarize(checks)
+
+def validate(df: pd.DataFrame, expectations: List[dict] = None) -> dict:
+    """Validate an in-memory DataFrame with the native engine"""
+    return validate_chunks([df], expectations)
+
+def validate_gx(df: pd.DataFrame, expectations: List[dict] = None) -> dict:
+    """Validate with Great Expectations (slower; kept for comparison)"""
+    import great_expectations as gx
 
-# Load data
-df = pd.read_csv('data/raw/customer_data.csv')
+    context = gx.get_context()
+    validator = context.sources.pandas_default.read_dataframe(df)
+    for config in (expectations if expectations is not None else load_expectations()):
+        getattr(validator, config['expectation_type'])(**config['kwargs'])
+    return validator.validate().to_json_dict()
 
-# Create expectations
-validator = context.sources.pandas_default.read_dataframe(df)
+if __name__ == "__main__":
+    import argparse
 
-# Define rules
-validator.expect_column_values_to_be_between('monthly_charges', min_value=0, max_value=200)
-validator.expect_column_values_to_not_be_null('customer_id')
-validator.expect_column_values_to_be_in_set('contract_type', ['Month-to-Month', 'One Year', 'Two Year'])
-validator.expect_table_row_count_to_be_between(min_value=10000, max_value=100000)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='data/raw/customer_data.csv')
+    parser.add_argument('--expectations', default=EXPECTATIONS_PATH)
+    parser.add_argument('--engine', choices=['native', 'gx'], default='native')
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    args = parser.parse_args()
 
-# Run validation
-result = validator.validate()
+    expectations = load_expectations(args.expectations)
+    if args.engine == 'gx':
+        result = validate_gx(pd.read_csv(args.data), expectations)
+    else:
+        result = validate_csv(args.data, expectations, args.chunksize)
 
-if result.success:
-    print("✓ Data validation passed")
-else:
-    print("✗ Data validation failed")
-    print(result)
-    exit(1)
+    if result['success']:
+        print("✓ Data validation passed")
+    else:
+        print("✗ Data validation failed")
+        print(json.dumps(result, indent=2, default=str))
+        exit(1)